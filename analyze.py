@@ -8,10 +8,14 @@ Analyze module
 Functions to analyze tweets.
 """
 
+import heapq
+import os
 import unicodedata
 import sys
+from itertools import islice
 
-from basic_algorithms import find_top_k, find_min_count, find_salient
+from basic_algorithms import find_top_k_counts, find_min_count_counts, \
+    find_salient, find_salient_batched, merge_counts
 
 ##################### DO NOT MODIFY THIS CODE #####################
 
@@ -23,8 +27,68 @@ def keep_chr(ch):
     return unicodedata.category(ch).startswith('P') and \
         (ch not in ("#", "@", "&"))
 
-PUNCTUATION = " ".join([chr(i) for i in range(sys.maxunicode)
-                        if keep_chr(chr(i))])
+def build_punctuation():
+    '''
+    Scan every code point and combine the characters kept by keep_chr
+    into a single string.
+    '''
+    return " ".join([chr(i) for i in range(sys.maxunicode)
+                     if keep_chr(chr(i))])
+
+
+def _punctuation_cache_file():
+    '''
+    The on-disk cache for PUNCTUATION.  The file name is keyed by the
+    Unicode database version, since that determines the contents.  The
+    directory can be overridden with ANALYZE_CACHE_DIR.
+    '''
+    cache_dir = os.environ.get("ANALYZE_CACHE_DIR")
+    if cache_dir is None:
+        cache_dir = os.path.join(
+            os.environ.get("XDG_CACHE_HOME",
+                           os.path.join(os.path.expanduser("~"), ".cache")),
+            "analyze")
+    return os.path.join(cache_dir, "punctuation-{}-{}.txt".format(
+        unicodedata.unidata_version, sys.maxunicode))
+
+
+_PUNCTUATION = None
+
+def get_punctuation():
+    '''
+    Get PUNCTUATION.  Scanning every code point is slow, so the string
+    is built on first use rather than at import time, and is stored in
+    an on-disk cache that later processes read instead.
+
+    Returns: (str) the punctuation characters
+    '''
+    global _PUNCTUATION  # pylint: disable=global-statement
+    if _PUNCTUATION is None:
+        filename = _punctuation_cache_file()
+        try:
+            with open(filename, encoding="utf-8") as f:
+                _PUNCTUATION = f.read()
+        except OSError:
+            _PUNCTUATION = build_punctuation()
+            try:
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                tmp = "{}.{}.tmp".format(filename, os.getpid())
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(_PUNCTUATION)
+                os.replace(tmp, filename)
+            except OSError:
+                pass
+    return _PUNCTUATION
+
+
+def __getattr__(name):
+    '''
+    Build PUNCTUATION lazily when it is accessed as a module attribute.
+    '''
+    if name == "PUNCTUATION":
+        return get_punctuation()
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name))
 
 # When processing tweets, ignore these words
 STOP_WORDS = ["a", "an", "the", "this", "that", "of", "for", "or",
@@ -63,6 +127,39 @@ def combine_tweets(tweets, entity_desc):
     return lst
 
 
+def update_entity_counts(counts, tweet, entity_desc):
+    '''
+    Add the entities of a single tweet to a dictionary of counts.
+
+    Inputs:
+        counts: dictionary that maps entities to counts (modified in place)
+        tweet: a tweet
+        entity_desc: a triple such as ("hashtags", "text", True),
+          ("user_mentions", "screen_name", False), etc.
+    '''
+    key, field, case_sensitive = entity_desc
+    for m in tweet['entities'][key]:
+        entity = m[field] if case_sensitive else m[field].lower()
+        counts[entity] = counts.get(entity, 0) + 1
+
+
+def count_entities(tweets, entity_desc):
+    '''
+    Count each distinct entity without building a list of all of them.
+
+    Inputs:
+        tweets: an iterable of tweets
+        entity_desc: a triple such as ("hashtags", "text", True),
+          ("user_mentions", "screen_name", False), etc.
+
+    Returns: dictionary that maps entities to counts
+    '''
+    counts = {}
+    for tweet in tweets:
+        update_entity_counts(counts, tweet, entity_desc)
+    return counts
+
+
 # Task 2.1
 def find_top_k_entities(tweets, entity_desc, k):
     '''
@@ -77,8 +174,8 @@ def find_top_k_entities(tweets, entity_desc, k):
     Returns: list of entities
     '''
 
-    lst = combine_tweets(tweets, entity_desc)
-    top_k = find_top_k(lst, k)
+    counts = count_entities(tweets, entity_desc)
+    top_k = find_top_k_counts(counts, k)
     return top_k
 
 
@@ -96,8 +193,8 @@ def find_min_count_entities(tweets, entity_desc, min_count):
     Returns: set of entities
     '''
 
-    lst = combine_tweets(tweets, entity_desc)
-    min_count = find_min_count(lst, min_count)
+    counts = count_entities(tweets, entity_desc)
+    min_count = find_min_count_counts(counts, min_count)
     return min_count
 
 
@@ -107,6 +204,108 @@ def find_min_count_entities(tweets, entity_desc, min_count):
 # Pre-processing step and representing n-grams
 
 # YOUR HELPER FUNCTIONS HERE
+class Tokenizer:
+    '''
+    Class for splitting tweet text into words.  The punctuation set,
+    stop words, stop prefixes and case-folding choice are fixed when
+    the tokenizer is constructed.
+
+    Attributes:
+        case_sensitive: (bool) keep the case of each word
+        stop_words: (frozenset of str) words to drop (empty if stop
+          words are kept)
+        stop_prefixes: (tuple of str) words with one of these prefixes
+          are dropped
+
+    Methods:
+        tokenize_text(text): list of words
+        tokenize(tweets): list of lists of words
+    '''
+
+    def __init__(self, case_sensitive, remove_stop_words,
+                 punctuation=None, stop_words=STOP_WORDS,
+                 stop_prefixes=STOP_PREFIXES):
+        '''
+        Initialize the tokenizer.
+
+        Args:
+            case_sensitive: (bool) keep the case of each word
+            remove_stop_words: (bool) drop the words in stop_words
+            punctuation: (str) characters stripped from both ends of
+              each word (by default, PUNCTUATION)
+            stop_words: (list of str) the stop words
+            stop_prefixes: (tuple of str) prefixes of words to drop
+        '''
+
+        self.case_sensitive = bool(case_sensitive)
+        self.stop_words = frozenset(stop_words if remove_stop_words else ())
+        self.stop_prefixes = tuple(stop_prefixes)
+        if punctuation is None:
+            punctuation = get_punctuation()
+        self._punctuation = punctuation
+        self._punctuation_set = frozenset(punctuation)
+
+    def tokenize_text(self, text):
+        '''
+        Split a piece of text into words.  Punctuation is stripped from
+        both ends of each word, and empty words, words with a stop prefix
+        and stop words are dropped.
+
+        Args:
+            text: (str) the text
+
+        Returns: list of words
+        '''
+        punctuation = self._punctuation
+        punctuation_set = self._punctuation_set
+        stop_words = self.stop_words
+        stop_prefixes = self.stop_prefixes
+        case_sensitive = self.case_sensitive
+
+        words = []
+        for w in text.split():
+            # Most words have no punctuation at either end, so only
+            # pay for the strip when there is something to strip.
+            if w[0] in punctuation_set or w[-1] in punctuation_set:
+                w = w.strip(punctuation)
+                if not w:
+                    continue
+            if w.startswith(stop_prefixes) or w in stop_words:
+                continue
+            words.append(w if case_sensitive else w.lower())
+        return words
+
+    def tokenize(self, tweets):
+        '''
+        Split the text of each tweet in a batch into words.
+
+        Args:
+            tweets: an iterable of tweets
+
+        Returns: list of lists of words
+        '''
+        tokenize_text = self.tokenize_text
+        return [tokenize_text(tweet['abridged_text']) for tweet in tweets]
+
+
+_TOKENIZERS = {}
+
+def get_tokenizer(case_sensitive, remove_stop_words):
+    '''
+    Get the shared tokenizer for a pre-processing configuration.
+
+    Inputs:
+        case_sensitive: True or False
+        remove_stop_words: True or False
+
+    Returns: Tokenizer
+    '''
+    key = (bool(case_sensitive), bool(remove_stop_words))
+    if key not in _TOKENIZERS:
+        _TOKENIZERS[key] = Tokenizer(*key)
+    return _TOKENIZERS[key]
+
+
 def pre_process(tweets, sensitive, stop_word):
     '''
     Pre-process the tweets.
@@ -119,18 +318,8 @@ def pre_process(tweets, sensitive, stop_word):
     Returns: a list of words after the pre-process
     '''
 
-    word = tweets['abridged_text'].split()
-    new_w = []
-    for w in word:
-        w = w.strip(PUNCTUATION)
-        if w!="":
-            if not w.startswith(STOP_PREFIXES):
-                if (stop_word and w not in STOP_WORDS) or not stop_word:
-                    if sensitive:
-                        new_w.append(w)
-                    elif not sensitive:
-                        new_w.append(w.lower())
-    return new_w
+    return get_tokenizer(sensitive, stop_word).tokenize_text(
+        tweets['abridged_text'])
 
 
 
@@ -153,8 +342,235 @@ def n_grams(tweet_new, n):
     return tweet_new
 
 
+def update_ngram_counts(counts, tweet, n, case_sensitive):
+    '''
+    Add the n-grams of a single tweet to a dictionary of counts.
+
+    Inputs:
+        counts: dictionary that maps n-grams to counts (modified in place)
+        tweet: a tweet
+        n: integer
+        case_sensitive: boolean
+    '''
+    words = pre_process(tweet, case_sensitive, stop_word=True)
+    for i in range(len(words) - (n-1)):
+        gram = tuple(words[i:(i+n)])
+        counts[gram] = counts.get(gram, 0) + 1
+
+
+class NGramEncoder:
+    '''
+    Class for representing n-grams as single integers.  Each distinct
+    word is interned as an integer id, and an n-gram is packed into
+    one integer key holding the ids of its words, ID_BITS bits apiece.
+
+    Attributes:
+        n: (int) the length of the n-grams
+        words: list of the interned words, indexed by id
+        ids: dictionary that maps words to ids
+
+    Methods:
+        update_counts(counts, words): count the n-grams in a list of words
+        decode(key): the n-gram (tuple of words) for a key
+        decode_counts(counts): counts keyed by n-gram instead of key
+        find_top_k(counts, k): list of n-grams
+        find_min_count(counts, min_count): set of n-grams
+    '''
+
+    ID_BITS = 32
+
+    def __init__(self, n):
+        '''
+        Initialize the encoder.
+
+        Args:
+            n: (int) the length of the n-grams
+        '''
+
+        self.n = n
+        self.words = []
+        self.ids = {}
+        self._mask = (1 << (self.ID_BITS * n)) - 1
+
+    def _intern(self, word):
+        '''The id for a word, assigning a new one if needed'''
+        wid = self.ids.get(word)
+        if wid is None:
+            wid = len(self.words)
+            if wid >> self.ID_BITS:
+                raise ValueError("Too many distinct words to encode")
+            self.ids[word] = wid
+            self.words.append(word)
+        return wid
+
+    def update_counts(self, counts, words):
+        '''
+        Count the n-grams in a list of words.
+
+        Args:
+            counts: dictionary that maps keys to counts (modified in place)
+            words: a list of words after the pre-process
+        '''
+        n = self.n
+        if len(words) < n:
+            return
+        if n == 0:
+            counts[0] = counts.get(0, 0) + len(words) + 1
+            return
+        bits, mask, intern = self.ID_BITS, self._mask, self._intern
+        key = 0
+        for i, word in enumerate(words):
+            key = ((key << bits) | intern(word)) & mask
+            if i >= n - 1:
+                counts[key] = counts.get(key, 0) + 1
+
+    def decode(self, key):
+        '''
+        The n-gram for a key.
+
+        Returns: tuple of words
+        '''
+        low = (1 << self.ID_BITS) - 1
+        gram = []
+        for _ in range(self.n):
+            gram.append(self.words[key & low])
+            key >>= self.ID_BITS
+        return tuple(reversed(gram))
+
+    def decode_counts(self, counts):
+        '''
+        Decode every key of a dictionary of counts.
+
+        Returns: dictionary that maps n-grams to counts
+        '''
+        return {self.decode(key): count for key, count in counts.items()}
+
+    def find_top_k(self, counts, k):
+        '''
+        Find the k most frequently occurring n-grams.  Only the keys
+        whose count reaches the k-th largest count are decoded, so that
+        ties are broken on the words as usual.
+
+        Returns: list of n-grams
+        '''
+        if k < 0:
+            raise ValueError("In find_top_k, k must be a non-negative integer")
+        if k == 0 or not counts:
+            return []
+        kth = heapq.nlargest(k, counts.values())[-1]
+        candidates = {self.decode(key): count
+                      for key, count in counts.items() if count >= kth}
+        return find_top_k_counts(candidates, k)
+
+    def find_min_count(self, counts, min_count):
+        '''
+        Find the n-grams that occur at least min_count times.
+
+        Returns: set of n-grams
+        '''
+        if min_count < 0:
+            raise ValueError("min_count must be a non-negative integer")
+        return {self.decode(key) for key, count in counts.items()
+                if count >= min_count}
+
+
+def count_ngram_codes(tweets, n, case_sensitive):
+    '''
+    Count each distinct n-gram as an integer key (see NGramEncoder).
+
+    Inputs:
+        tweets: an iterable of tweets
+        n: integer
+        case_sensitive: boolean
+
+    Returns: (dictionary that maps keys to counts, NGramEncoder)
+    '''
+    encoder = NGramEncoder(n)
+    tokenizer = get_tokenizer(case_sensitive, True)
+    counts = {}
+    for tweet in tweets:
+        encoder.update_counts(counts,
+                              tokenizer.tokenize_text(tweet['abridged_text']))
+    return counts, encoder
+
+
+def count_ngrams(tweets, n, case_sensitive, workers=1, chunk_size=None,
+                 encoded=False):
+    '''
+    Count each distinct n-gram without building a list of all of them.
+
+    Inputs:
+        tweets: an iterable of tweets
+        n: integer
+        case_sensitive: boolean
+        workers: (int) number of worker processes.  With more than one
+          worker, the tweets are sharded into chunks that are counted
+          in a process pool and the partial counts are merged with a
+          tree reduction.
+        chunk_size: (int) number of tweets per chunk (by default, four
+          chunks per worker)
+        encoded: (bool) count integer-encoded n-grams (see NGramEncoder)
+          and decode them at the end
+
+    Returns: dictionary that maps n-grams to counts
+    '''
+    if workers > 1:
+        return _count_ngrams_parallel(tweets, n, case_sensitive, workers,
+                                      chunk_size, encoded)
+    if encoded:
+        codes, encoder = count_ngram_codes(tweets, n, case_sensitive)
+        return encoder.decode_counts(codes)
+    counts = {}
+    for tweet in tweets:
+        update_ngram_counts(counts, tweet, n, case_sensitive)
+    return counts
+
+
+def _count_ngrams_chunk(args):
+    '''
+    Count the n-grams in one chunk of tweets (runs in a worker).
+
+    Inputs:
+        args: (list of tweets, n, case_sensitive, encoded)
+
+    Returns: dictionary that maps n-grams to counts
+    '''
+    tweets, n, case_sensitive, encoded = args
+    return count_ngrams(tweets, n, case_sensitive, encoded=encoded)
+
+
+def _chunks(tweets, chunk_size):
+    '''
+    Split an iterable of tweets into lists of at most chunk_size tweets.
+    '''
+    it = iter(tweets)
+    chunk = list(islice(it, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(it, chunk_size))
+
+
+def _count_ngrams_parallel(tweets, n, case_sensitive, workers, chunk_size,
+                           encoded):
+    '''
+    Count n-grams across a process pool (see count_ngrams).
+    '''
+    # slow to import, so only imported when a pool is needed
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+    if chunk_size is None:
+        if not isinstance(tweets, list):
+            tweets = list(tweets)
+        chunk_size = max(1, -(-len(tweets) // (4 * workers)))
+    jobs = ((chunk, n, case_sensitive, encoded)
+            for chunk in _chunks(tweets, chunk_size))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(_count_ngrams_chunk, jobs))
+    return merge_counts(partials)
+
+
 # Task 3.1
-def find_top_k_ngrams(tweets, n, case_sensitive, k):
+def find_top_k_ngrams(tweets, n, case_sensitive, k, workers=1,
+                      chunk_size=None, encoded=False):
     '''
     Find k most frequently occurring n-grams.
 
@@ -163,21 +579,23 @@ def find_top_k_ngrams(tweets, n, case_sensitive, k):
         n: integer
         case_sensitive: boolean
         k: integer
+        workers, chunk_size, encoded: counting options (see count_ngrams)
 
     Returns: list of n-grams
     '''
 
-    lst = []
-    for tweet in tweets:
-        tweet_new = pre_process(tweet, case_sensitive, stop_word=True)
-        tweet_new = n_grams(tweet_new, n)
-        lst.extend(tweet_new)
-    top_k = find_top_k(lst, k)
+    if encoded and workers <= 1:
+        codes, encoder = count_ngram_codes(tweets, n, case_sensitive)
+        return encoder.find_top_k(codes, k)
+    counts = count_ngrams(tweets, n, case_sensitive, workers, chunk_size,
+                          encoded)
+    top_k = find_top_k_counts(counts, k)
     return top_k
 
 
 # Task 3.2
-def find_min_count_ngrams(tweets, n, case_sensitive, min_count):
+def find_min_count_ngrams(tweets, n, case_sensitive, min_count, workers=1,
+                          chunk_size=None, encoded=False):
     '''
     Find n-grams that occur at least min_count times.
 
@@ -186,21 +604,22 @@ def find_min_count_ngrams(tweets, n, case_sensitive, min_count):
         n: integer
         case_sensitive: boolean
         min_count: integer
+        workers, chunk_size, encoded: counting options (see count_ngrams)
 
     Returns: set of n-grams
     '''
 
-    lst = []
-    for tweet in tweets:
-        tweet_new = pre_process(tweet, case_sensitive, stop_word=True)
-        tweet_new = n_grams(tweet_new, n)
-        lst.extend(tweet_new)
-    min_count = find_min_count(lst, min_count)
+    if encoded and workers <= 1:
+        codes, encoder = count_ngram_codes(tweets, n, case_sensitive)
+        return encoder.find_min_count(codes, min_count)
+    counts = count_ngrams(tweets, n, case_sensitive, workers, chunk_size,
+                          encoded)
+    min_count = find_min_count_counts(counts, min_count)
     return min_count
 
 
 # Task 3.3
-def find_salient_ngrams(tweets, n, case_sensitive, threshold):
+def find_salient_ngrams(tweets, n, case_sensitive, threshold, batched=False):
     '''
     Find the salient n-grams for each tweet.
 
@@ -209,6 +628,8 @@ def find_salient_ngrams(tweets, n, case_sensitive, threshold):
         n: integer
         case_sensitive: boolean
         threshold: float
+        batched: (bool) score every n-gram in one vectorized pass (see
+          find_salient_batched)
 
     Returns: list of sets of strings
     '''
@@ -218,5 +639,7 @@ def find_salient_ngrams(tweets, n, case_sensitive, threshold):
         tweet_new = pre_process(tweet, case_sensitive, stop_word=False)
         tweet_new = n_grams(tweet_new, n)
         lst.append(tweet_new)
+    if batched:
+        return find_salient_batched(lst, threshold)
     salient = find_salient(lst, threshold)
     return salient
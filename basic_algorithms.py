@@ -9,7 +9,10 @@ Algorithms for efficiently counting and sorting distinct 'entities',
 or unique values, are widely used in data analysis.
 """
 
+import heapq
 import math
+from array import array
+
 from util import sort_count_pairs
 
 # Task 1.1
@@ -30,14 +33,47 @@ def count_tokens(tokens):
     return count_token
 
 
+def merge_counts(partials):
+    '''
+    Merge dictionaries of counts with a pairwise tree reduction.
+
+    Inputs:
+        partials: list of dictionaries that map tokens to counts (the
+          dictionaries may be modified)
+
+    Returns: dictionary that maps tokens to their total counts
+    '''
+    if not partials:
+        return {}
+    partials = list(partials)
+    while len(partials) > 1:
+        merged = []
+        for i in range(0, len(partials) - 1, 2):
+            big, small = partials[i], partials[i + 1]
+            if len(small) > len(big):
+                big, small = small, big
+            for token, count in small.items():
+                big[token] = big.get(token, 0) + count
+            merged.append(big)
+        if len(partials) % 2 == 1:
+            merged.append(partials[-1])
+        partials = merged
+    return partials[0]
+
+
 # Task 1.2
-def find_top_k(tokens, k):
+def find_top_k(tokens, k, method="heap", epsilon=0.001):
     '''
     Find the k most frequently occuring tokens.
 
     Inputs:
         tokens: list of tokens (must be immutable)
         k: a non-negative integer
+        method: "heap" (exact, bounded-heap selection), "sort" (exact,
+          sorts every distinct token) or "approx" (Space-Saving sketch
+          with a fixed number of counters, see SpaceSaving)
+        epsilon: (float) for method="approx", the error bound on each
+          count as a fraction of the number of tokens
 
     Returns: list of the top k tokens ordered by count.
     '''
@@ -46,8 +82,39 @@ def find_top_k(tokens, k):
     if k < 0:
         raise ValueError("In find_top_k, k must be a non-negative integer")
 
-    dic_tokens = count_tokens(tokens)
-    pairs = list(dic_tokens.items())
+    if method == "approx":
+        if not 0 < epsilon <= 1:
+            raise ValueError("In find_top_k, epsilon must be in (0, 1]")
+        sketch = SpaceSaving(max(k, math.ceil(1 / epsilon)))
+        sketch.update(tokens)
+        return sketch.top_k(k)
+    return find_top_k_counts(count_tokens(tokens), k, method)
+
+
+def find_top_k_counts(counts, k, method="heap"):
+    '''
+    Find the k most frequently occuring tokens from precomputed counts.
+    Ties are broken by token, as in sort_count_pairs.
+
+    Inputs:
+        counts: dictionary that maps tokens to counts
+        k: a non-negative integer
+        method: "heap" (O(U log k) selection) or "sort" (O(U log U))
+
+    Returns: list of the top k tokens ordered by count.
+    '''
+
+    if k < 0:
+        raise ValueError("In find_top_k, k must be a non-negative integer")
+
+    if method == "heap":
+        top = heapq.nsmallest(k, counts.items(),
+                              key=lambda pair: (-pair[1], pair[0]))
+        return [pair[0] for pair in top]
+    if method != "sort":
+        raise ValueError("Unknown top-k method: {}".format(method))
+
+    pairs = list(counts.items())
     sort_pairs = sort_count_pairs(pairs)
     if len(sort_pairs) <= k:
         k = len(sort_pairs)
@@ -55,6 +122,111 @@ def find_top_k(tokens, k):
     return top_k
 
 
+class SpaceSaving:
+    '''
+    Class for approximately counting the most frequent tokens in a
+    stream using a fixed number of counters (the Space-Saving
+    algorithm of Metwally et al.).
+
+    With m counters over a stream of N tokens, every estimated count
+    overestimates the true count by at most N / m, and every token
+    whose true count exceeds N / m is guaranteed to be monitored.
+
+    Attributes:
+        capacity: (int) the number of counters
+        num_tokens: (int) the number of tokens seen so far
+
+    Methods:
+        add(token): count a single token
+        update(tokens): count every token in an iterable
+        count(token): the estimated count of a token
+        error(token): the maximum overestimate in count(token)
+        top_k(k): list of the (estimated) top k tokens ordered by count
+    '''
+
+    def __init__(self, capacity):
+        '''
+        Initialize the sketch.
+
+        Args:
+            capacity: (int) the number of counters to keep
+        '''
+
+        if capacity < 1:
+            raise ValueError("SpaceSaving needs at least one counter")
+        self.capacity = capacity
+        self.num_tokens = 0
+        self._counts = {}
+        self._errors = {}
+        # Stream summary: buckets[c] holds the tokens with count c, so
+        # the token to evict is always found in buckets[self._min].
+        self._buckets = {}
+        self._min = 0
+
+    def _move(self, token, old, new):
+        '''Move a token from bucket old to bucket new'''
+        bucket = self._buckets[old]
+        del bucket[token]
+        if not bucket:
+            del self._buckets[old]
+            if self._min == old:
+                self._min = new
+        self._buckets.setdefault(new, {})[token] = None
+
+    def add(self, token):
+        '''
+        Count a single token.
+
+        Args:
+            token: the token (must be immutable)
+        '''
+        self.num_tokens += 1
+        count = self._counts.get(token)
+        if count is not None:
+            self._counts[token] = count + 1
+            self._move(token, count, count + 1)
+        elif len(self._counts) < self.capacity:
+            self._counts[token] = 1
+            self._errors[token] = 0
+            self._buckets.setdefault(1, {})[token] = None
+            self._min = 1
+        else:
+            low = self._min
+            victim = next(iter(self._buckets[low]))
+            del self._counts[victim]
+            del self._errors[victim]
+            self._buckets[low][token] = self._buckets[low].pop(victim)
+            self._counts[token] = low + 1
+            self._errors[token] = low
+            self._move(token, low, low + 1)
+
+    def update(self, tokens):
+        '''
+        Count every token in an iterable.
+
+        Args:
+            tokens: an iterable of tokens (must be immutable)
+        '''
+        for token in tokens:
+            self.add(token)
+
+    def count(self, token):
+        '''The estimated count of a token (0 if it is not monitored)'''
+        return self._counts.get(token, 0)
+
+    def error(self, token):
+        '''The maximum overestimate in count(token)'''
+        return self._errors.get(token, self._min)
+
+    def top_k(self, k):
+        '''
+        Find the (estimated) k most frequently occuring tokens.
+
+        Returns: list of tokens ordered by estimated count.
+        '''
+        return find_top_k_counts(self._counts, k)
+
+
 # Task 1.3
 def find_min_count(tokens, min_count):
     '''
@@ -71,18 +243,204 @@ def find_min_count(tokens, min_count):
     if min_count < 0:
         raise ValueError("min_count must be a non-negative integer")
 
-    dic_tokens = count_tokens(tokens)
-    pairs = list(dic_tokens.items())
-    sort_pairs = sort_count_pairs(pairs)
-    min_set = set()
-    for pair in sort_pairs:
-        if pair[1] >= min_count:
-            min_set.add(pair[0])
-    return min_set
+    return find_min_count_counts(count_tokens(tokens), min_count)
+
+
+def find_min_count_counts(counts, min_count):
+    '''
+    Find the tokens that occur *at least* min_count times from
+    precomputed counts.
+
+    Inputs:
+        counts: dictionary that maps tokens to counts
+        min_count: a non-negative integer
+
+    Returns: set of tokens
+    '''
+
+    if min_count < 0:
+        raise ValueError("min_count must be a non-negative integer")
+
+    return {token for token, count in counts.items() if count >= min_count}
 
 
 # Task 1.4
 
+class TfIdfIndex:
+    '''
+    Class for representing the term statistics of a corpus of
+    documents in compact, array-backed (CSR-style) form.  The index
+    is built in a single pass over the documents, and documents can be
+    added one at a time.
+
+    Attributes:
+        terms: list of the distinct tokens, indexed by vocabulary id
+        vocab: dictionary that maps tokens to vocabulary ids
+        indptr: (array of ints) the entries for document d are stored
+          in positions indptr[d] through indptr[d + 1] - 1 of indices
+          and counts
+        indices: (array of ints) vocabulary ids, per document in order
+          of first occurrence
+        counts: (array of ints) the number of times the matching
+          vocabulary id occurs in the document
+        df: (array of ints) document frequency of each vocabulary id
+        idf: (array of floats) idf weight of each vocabulary id
+
+    Methods:
+        add_doc(doc): append a document to the index
+        idf_dict(): dictionary that maps tokens to idf
+        tf(d): dictionary that maps the tokens in document d to tf
+        tf_idf(d): dictionary that maps the tokens in document d to tf*idf
+        salient(d, threshold): set of the salient tokens in document d
+        salient_batched(threshold): list of sets of salient tokens
+    '''
+
+    def __init__(self, docs=()):
+        '''
+        Build the index.
+
+        Args:
+            docs: iterable of lists of tokens
+        '''
+
+        self.terms = []
+        self.vocab = {}
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        self.counts = array('q')
+        self.df = array('q')
+        self._idf = None
+        for doc in docs:
+            self.add_doc(doc)
+
+    def __len__(self):
+        '''Number of documents in the index'''
+        return len(self.indptr) - 1
+
+    @property
+    def idf(self):
+        '''idf weight of each vocabulary id (computed on first use)'''
+        if self._idf is None:
+            num_docs = len(self)
+            self._idf = array('d', [math.log(num_docs / n) for n in self.df])
+        return self._idf
+
+    def add_doc(self, doc):
+        '''
+        Count the tokens in a document and append them to the index.
+
+        Args:
+            doc: list of tokens (must be immutable)
+        '''
+
+        vocab = self.vocab
+        doc_counts = {}
+        for token in doc:
+            tid = vocab.get(token)
+            if tid is None:
+                tid = len(self.terms)
+                vocab[token] = tid
+                self.terms.append(token)
+                self.df.append(0)
+            doc_counts[tid] = doc_counts.get(tid, 0) + 1
+        for tid in doc_counts:
+            self.df[tid] += 1
+        self.indices.extend(doc_counts.keys())
+        self.counts.extend(doc_counts.values())
+        self.indptr.append(len(self.indices))
+        self._idf = None
+
+    def _entries(self, d):
+        '''
+        The vocabulary ids and counts of document d.
+
+        Returns: (array of ints, array of ints)
+        '''
+        lo, hi = self.indptr[d], self.indptr[d + 1]
+        return self.indices[lo:hi], self.counts[lo:hi]
+
+    def idf_dict(self):
+        '''
+        Compute idf for each token.
+
+        Returns: a dictionary for idf
+        '''
+        return dict(zip(self.terms, self.idf))
+
+    def tf(self, d):
+        '''
+        Compute tf for each token in document d.
+
+        Returns: a dictionary of tf
+        '''
+        ids, counts = self._entries(d)
+        if not counts:
+            return {}
+        max_doc = max(counts)
+        terms = self.terms
+        return {terms[t]: 0.5 + 0.5 * c / max_doc for t, c in zip(ids, counts)}
+
+    def tf_idf(self, d):
+        '''
+        Compute tf*idf for each token in document d.
+
+        Returns: a dictionary of tf*idf
+        '''
+        ids, counts = self._entries(d)
+        if not counts:
+            return {}
+        max_doc = max(counts)
+        terms = self.terms
+        weights = self.idf
+        return {terms[t]: (0.5 + 0.5 * c / max_doc) * weights[t]
+                for t, c in zip(ids, counts)}
+
+    def salient(self, d, threshold):
+        '''
+        Compute the salient words for document d.  A word is salient if
+        its tf-idf score is strictly above a given threshold.
+
+        Returns: set of salient words
+        '''
+        return {key for key, value in self.tf_idf(d).items()
+                if value > threshold}
+
+    def salient_batched(self, threshold):
+        '''
+        Compute the salient words for every document at once.  The
+        maximum term count, tf, idf and the threshold mask for the whole
+        corpus are computed with NumPy array operations.
+
+        Returns: list of sets of salient words
+        '''
+        # NumPy is only needed for the batched path.
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        num_docs = len(self)
+        salient = [set() for _ in range(num_docs)]
+        if not self.indices:
+            return salient
+
+        indptr = np.frombuffer(self.indptr, dtype=np.int64)
+        indices = np.frombuffer(self.indices, dtype=np.int64)
+        counts = np.frombuffer(self.counts, dtype=np.int64).astype(np.float64)
+        weights = np.frombuffer(self.idf, dtype=np.float64)
+
+        lengths = np.diff(indptr)
+        nonempty = lengths > 0
+        max_doc = np.zeros(num_docs)
+        max_doc[nonempty] = np.maximum.reduceat(counts, indptr[:-1][nonempty])
+
+        # Same operation order as tf_idf, so the scores match bit for bit.
+        tf = 0.5 + 0.5 * counts / np.repeat(max_doc, lengths)
+        mask = tf * weights[indices] > threshold
+
+        doc_ids = np.repeat(np.arange(num_docs), lengths)[mask]
+        terms = self.terms
+        for d, t in zip(doc_ids.tolist(), indices[mask].tolist()):
+            salient[d].add(terms[t])
+        return salient
+
 def idf(docs):
     '''
     Compute idf for each token.
@@ -93,16 +451,7 @@ def idf(docs):
     Returns: a dictionary for idf
     '''
 
-    all_t = set()
-    for doc in docs:
-        all_t = all_t.union(set(doc))
-    idf_dic = {}
-    for t in all_t:
-        for doc in docs:
-            if t in set(doc):
-                idf_dic[t] = idf_dic.get(t,0) + 1
-    idf1 = {key:math.log(len(docs)/value) for key,value in idf_dic.items()}
-    return idf1
+    return TfIdfIndex(docs).idf_dict()
 
 def tf_doc(docs):
     '''
@@ -113,15 +462,8 @@ def tf_doc(docs):
 
     Returns: a lst of dictionary of tf
     '''
-    tf_lst = []
-    for doc in docs:
-        if doc == []:
-            tf_lst.append({})
-        else:
-            count_token = count_tokens(doc)
-            max_doc = count_token[find_top_k(doc, 1)[0]]
-            tf_lst.append({k:0.5+0.5*v/max_doc for k,v in count_token.items()})
-    return tf_lst
+    index = TfIdfIndex(docs)
+    return [index.tf(d) for d in range(len(index))]
 
 def tf_idf(docs):
     '''
@@ -132,12 +474,8 @@ def tf_idf(docs):
 
     Returns: a lst of dictionary of tf*idf
     '''
-    tf_docs = tf_doc(docs)
-    idf_docs = idf(docs)
-    tfidf = []
-    for dic in tf_docs:
-        tfidf.append({key: value*idf_docs[key] for key, value in dic.items()})
-    return tfidf
+    index = TfIdfIndex(docs)
+    return [index.tf_idf(d) for d in range(len(index))]
 
 def find_salient(docs, threshold):
     '''
@@ -150,8 +488,20 @@ def find_salient(docs, threshold):
 
     Returns: list of sets of salient words
     '''
-    tf_idf_dic = tf_idf(docs)
-    salient = []
-    for dic in tf_idf_dic:
-        salient.append({key for key,value in dic.items() if value > threshold})
-    return salient
+    index = TfIdfIndex(docs)
+    return [index.salient(d, threshold) for d in range(len(index))]
+
+
+def find_salient_batched(docs, threshold):
+    '''
+    Compute the salient words for each document, as find_salient does,
+    but score the whole corpus in one vectorized pass (see
+    TfIdfIndex.salient_batched).
+
+    Inputs:
+      docs: list of list of tokens
+      threshold: float
+
+    Returns: list of sets of salient words
+    '''
+    return TfIdfIndex(docs).salient_batched(threshold)
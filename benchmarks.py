@@ -0,0 +1,981 @@
+'''
+Benchmarks
+
+Timing harnesses for the tweet analysis and simulation modules.
+
+Example use:
+    $ python3 benchmarks.py tfidf --sizes 10000 --sizes 20000
+    $ python3 benchmarks.py suite --output before.json
+    $ python3 benchmarks.py suite --output after.json
+    $ python3 benchmarks.py compare before.json after.json --tolerance 0.1
+'''
+
+import contextlib
+import io
+import itertools
+import os
+import platform
+import random
+import subprocess
+import sys
+import json
+import tempfile
+import time
+import tracemalloc
+
+import click
+import util
+
+import analyze
+import basic_algorithms
+import query_plan
+import simulate
+import sir
+import sir_array
+import tweet_loader
+
+
+def timed(fn, *args, **kwargs):
+    '''
+    Call fn once and measure the elapsed wall time.
+
+    Returns: (float, value) the elapsed seconds and fn's return value
+    '''
+    start = time.perf_counter()
+    rv = fn(*args, **kwargs)
+    return time.perf_counter() - start, rv
+
+
+def traced(fn, *args, **kwargs):
+    '''
+    Call fn once and measure the elapsed wall time and the peak memory
+    allocated while it runs.
+
+    Returns: (float, int, value) the elapsed seconds, the peak bytes
+      and fn's return value
+    '''
+    tracemalloc.start()
+    try:
+        elapsed, rv = timed(fn, *args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak, rv
+
+
+def zipf_vocabulary(vocab_size, exponent=1.0):
+    '''
+    Build a synthetic vocabulary with Zipfian weights.
+
+    Inputs:
+        vocab_size: (int) number of distinct tokens
+        exponent: (float) Zipf exponent
+
+    Returns: (list of str, list of float) the tokens and their weights
+    '''
+    words = ["w{}".format(i) for i in range(vocab_size)]
+    weights = [1 / (rank ** exponent) for rank in range(1, vocab_size + 1)]
+    return words, weights
+
+
+def gen_docs(num_docs, vocab_size, seed, min_len=5, max_len=20):
+    '''
+    Generate a synthetic corpus of short documents drawn from a
+    Zipfian vocabulary.
+
+    Returns: list of lists of tokens
+    '''
+    rng = random.Random(seed)
+    words, weights = zipf_vocabulary(vocab_size)
+    cum_weights = list(itertools.accumulate(weights))
+    return [rng.choices(words, cum_weights=cum_weights,
+                        k=rng.randint(min_len, max_len))
+            for _ in range(num_docs)]
+
+
+def gen_zipf_tokens(num_tokens, vocab_size, seed, exponent=1.0):
+    '''
+    Generate a synthetic stream of tokens drawn from a Zipfian
+    vocabulary.
+
+    Returns: list of tokens
+    '''
+    rng = random.Random(seed)
+    words, weights = zipf_vocabulary(vocab_size, exponent)
+    return rng.choices(words, cum_weights=list(itertools.accumulate(weights)),
+                       k=num_tokens)
+
+
+HASHTAGS = ["MAGA", "maga", "ImWithHer", "Election2016", "vote", "Debate"]
+MENTIONS = ["CNN", "cnn", "FoxNews", "realDonaldTrump", "HillaryClinton"]
+DECORATIONS = ["", "", "", "!", ",", ".", "?", "...", "'", '"']
+
+
+def gen_tweets(num_tweets, vocab_size, seed, min_len=5, max_len=25):
+    '''
+    Generate synthetic tweets with the fields used by analyze.py.
+
+    Returns: list of tweets
+    '''
+    rng = random.Random(seed)
+    docs = gen_docs(num_tweets, vocab_size, seed, min_len, max_len)
+    tweets = []
+    for doc in docs:
+        words = [rng.choice(DECORATIONS) + w + rng.choice(DECORATIONS)
+                 for w in doc]
+        hashtags = rng.choices(HASHTAGS, k=rng.randint(0, 3))
+        mentions = rng.choices(MENTIONS, k=rng.randint(0, 2))
+        words.extend("#" + h for h in hashtags)
+        words.extend("@" + m for m in mentions)
+        tweets.append({
+            "abridged_text": " ".join(words),
+            "entities": {"hashtags": [{"text": h} for h in hashtags],
+                         "user_mentions": [{"screen_name": m}
+                                           for m in mentions]}})
+    return tweets
+
+
+def write_tweet_dump(filename, tweets, json_lines):
+    '''
+    Write tweets to a file as a JSON array or as JSON lines.  Each tweet
+    is padded with the kind of user and metadata fields a real dump
+    carries, which the analyses never read.
+    '''
+    with open(filename, "w", encoding="utf-8") as f:
+        if not json_lines:
+            f.write("[\n")
+        for i, tweet in enumerate(tweets):
+            full = dict(tweet, id=1000000 + i, lang="en", retweet_count=i % 97,
+                        created_at="Wed Nov 09 05:{:02d}:00 +0000 2016".format(
+                            i % 60),
+                        user={"id": i, "screen_name": "user{}".format(i),
+                              "description": "x" * 120, "followers": i * 3})
+            if not json_lines and i > 0:
+                f.write(",\n")
+            f.write(json.dumps(full))
+            if json_lines:
+                f.write("\n")
+        if not json_lines:
+            f.write("\n]\n")
+
+
+def report(rows, columns):
+    '''
+    Print a table of benchmark results.
+
+    Inputs:
+        rows: list of dictionaries
+        columns: list of the keys to print, in order
+    '''
+    print("  ".join("{:>14}".format(c) for c in columns))
+    for row in rows:
+        cells = []
+        for c in columns:
+            v = row[c]
+            if isinstance(v, float):
+                cells.append("{:>14.4g}".format(v))
+            else:
+                cells.append("{:>14}".format(str(v)))
+        print("  ".join(cells))
+
+
+@click.group()
+def cmd():
+    '''
+    Run a benchmark.
+    '''
+
+
+@cmd.command(name="tfidf")
+@click.option('--sizes', type=int, multiple=True,
+              default=(10000, 20000, 40000, 80000),
+              help="corpus sizes (number of documents)")
+@click.option('--vocab-size', type=int, default=50000)
+@click.option('--seed', type=int, default=20211201)
+def bench_tfidf(sizes, vocab_size, seed):
+    '''
+    Time find_salient over corpora of increasing size.  The time per
+    document should stay flat as the corpus grows.
+    '''
+    rows = []
+    for size in sizes:
+        docs = gen_docs(size, vocab_size, seed)
+        elapsed, _ = timed(basic_algorithms.find_salient, docs, 1.0)
+        rows.append({"docs": size, "seconds": elapsed,
+                     "us_per_doc": 1e6 * elapsed / size})
+    report(rows, ["docs", "seconds", "us_per_doc"])
+
+
+@cmd.command(name="topk")
+@click.option('--num-tokens', type=int, default=1000000)
+@click.option('--vocab-size', type=int, multiple=True,
+              default=(10000, 100000, 1000000),
+              help="number of distinct tokens in the Zipfian vocabulary")
+@click.option('--k', type=int, default=10)
+@click.option('--epsilon', type=float, default=0.0001,
+              help="error bound for the approximate mode")
+@click.option('--seed', type=int, default=20211201)
+def bench_topk(num_tokens, vocab_size, k, epsilon, seed):
+    '''
+    Compare the sort, heap and approx modes of find_top_k on Zipfian
+    token streams.  Recall is measured against the exact answer.
+    '''
+    rows = []
+    for size in vocab_size:
+        tokens = gen_zipf_tokens(num_tokens, size, seed)
+        exact = None
+        for method in ("sort", "heap", "approx"):
+            elapsed, top = timed(basic_algorithms.find_top_k, tokens, k,
+                                 method=method, epsilon=epsilon)
+            if exact is None:
+                exact = set(top)
+            rows.append({"vocab": size, "method": method, "seconds": elapsed,
+                         "recall": len(exact & set(top)) / max(len(exact), 1)})
+    report(rows, ["vocab", "method", "seconds", "recall"])
+
+
+@cmd.command(name="ngrams-scaling")
+@click.option('--num-tweets', type=int, default=200000)
+@click.option('--vocab-size', type=int, default=50000)
+@click.option('--n', type=int, default=2)
+@click.option('--workers', type=int, multiple=True, default=(1, 2, 4, 8))
+@click.option('--chunk-size', type=int, default=None)
+@click.option('--seed', type=int, default=20211201)
+def bench_ngrams_scaling(num_tweets, vocab_size, n, workers, chunk_size,
+                         seed):
+    '''
+    Time find_top_k_ngrams at several worker counts and check that the
+    answer matches the serial one.
+    '''
+    tweets = gen_tweets(num_tweets, vocab_size, seed)
+    rows = []
+    serial = None
+    base = None
+    for w in workers:
+        elapsed, top = timed(analyze.find_top_k_ngrams, tweets, n, False, 10,
+                             workers=w, chunk_size=chunk_size)
+        if serial is None:
+            serial, base = top, elapsed
+        rows.append({"workers": w, "seconds": elapsed,
+                     "speedup": base / elapsed, "same": top == serial})
+    report(rows, ["workers", "seconds", "speedup", "same"])
+
+
+def strip_pre_process(tweet, sensitive, stop_word):
+    '''
+    The original per-word str.strip(PUNCTUATION) pre-processing loop,
+    kept as the baseline for the tokenizer benchmark.
+    '''
+    new_w = []
+    for w in tweet['abridged_text'].split():
+        w = w.strip(analyze.PUNCTUATION)
+        if w != "" and not w.startswith(analyze.STOP_PREFIXES):
+            if not stop_word or w not in analyze.STOP_WORDS:
+                new_w.append(w if sensitive else w.lower())
+    return new_w
+
+
+@cmd.command(name="tokenizer")
+@click.option('--num-tweets', type=int, default=200000)
+@click.option('--vocab-size', type=int, default=50000)
+@click.option('--seed', type=int, default=20211201)
+def bench_tokenizer(num_tweets, vocab_size, seed):
+    '''
+    Compare the words per second of the original strip-based
+    pre-processing loop and Tokenizer.tokenize.
+    '''
+    tweets = gen_tweets(num_tweets, vocab_size, seed)
+    num_words = sum(len(t["abridged_text"].split()) for t in tweets)
+    tokenizer = analyze.Tokenizer(False, True)
+    rows = []
+    elapsed, baseline = timed(
+        lambda: [strip_pre_process(t, False, True) for t in tweets])
+    rows.append({"method": "strip", "seconds": elapsed,
+                 "words_per_sec": num_words / elapsed, "same": True})
+    elapsed, words = timed(tokenizer.tokenize, tweets)
+    rows.append({"method": "Tokenizer", "seconds": elapsed,
+                 "words_per_sec": num_words / elapsed,
+                 "same": words == baseline})
+    report(rows, ["method", "seconds", "words_per_sec", "same"])
+
+
+def time_python(code, repeats, env=None):
+    '''
+    Time a fresh interpreter running a snippet of code.
+
+    Returns: (float) the fastest wall time over the repeats, in seconds
+    '''
+    best = None
+    for _ in range(repeats):
+        elapsed, _ = timed(subprocess.run, [sys.executable, "-c", code],
+                           check=True, env=env,
+                           cwd=os.path.dirname(os.path.abspath(__file__)))
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+@cmd.command(name="startup")
+@click.option('--repeats', type=int, default=5)
+def bench_startup(repeats):
+    '''
+    Time `python -c "import analyze"` and the first use of PUNCTUATION
+    with a cold and a warm on-disk cache.  The cold-cache row is what
+    every import used to cost.
+    '''
+    rows = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, ANALYZE_CACHE_DIR=cache_dir)
+        rows.append({"case": "python only",
+                     "seconds": time_python("pass", repeats, env)})
+        rows.append({"case": "import analyze",
+                     "seconds": time_python("import analyze", repeats, env)})
+        use = "import analyze; analyze.get_punctuation()"
+        cold = os.path.join(cache_dir, "cold")
+        rows.append({"case": "first use, cold cache",
+                     "seconds": time_python(
+                         use, 1, dict(env, ANALYZE_CACHE_DIR=cold))})
+        rows.append({"case": "first use, warm cache",
+                     "seconds": time_python(use, repeats, env)})
+    report(rows, ["case", "seconds"])
+
+
+@cmd.command(name="ngrams-encoded")
+@click.option('--num-tweets', type=int, default=200000)
+@click.option('--vocab-size', type=int, default=50000)
+@click.option('--n', type=int, default=3)
+@click.option('--seed', type=int, default=20211201)
+def bench_ngrams_encoded(num_tweets, vocab_size, n, seed):
+    '''
+    Compare time and peak memory of counting n-grams as tuples of
+    strings and as integer keys.
+    '''
+    tweets = gen_tweets(num_tweets, vocab_size, seed)
+    analyze.get_punctuation()
+    rows = []
+    answer = None
+    for encoded in (False, True):
+        elapsed, peak, top = traced(analyze.find_top_k_ngrams, tweets, n,
+                                    False, 10, encoded=encoded)
+        answer = top if answer is None else answer
+        rows.append({"encoded": encoded, "seconds": elapsed,
+                     "peak_mb": peak / 2 ** 20, "same": top == answer})
+    report(rows, ["encoded", "seconds", "peak_mb", "same"])
+
+
+@cmd.command(name="salient")
+@click.option('--num-docs', type=int, default=1000000)
+@click.option('--vocab-size', type=int, default=50000)
+@click.option('--threshold', type=float, default=1.0)
+@click.option('--seed', type=int, default=20211201)
+def bench_salient(num_docs, vocab_size, threshold, seed):
+    '''
+    Compare find_salient and find_salient_batched on short documents.
+    '''
+    docs = gen_docs(num_docs, vocab_size, seed, 3, 12)
+    rows = []
+    answer = None
+    for fn in (basic_algorithms.find_salient,
+               basic_algorithms.find_salient_batched):
+        elapsed, salient = timed(fn, docs, threshold)
+        answer = salient if answer is None else answer
+        rows.append({"method": fn.__name__, "seconds": elapsed,
+                     "docs_per_sec": num_docs / elapsed,
+                     "same": salient == answer})
+    report(rows, ["method", "seconds", "docs_per_sec", "same"])
+
+
+@cmd.command(name="plan")
+@click.option('--num-tweets', type=int, default=200000)
+@click.option('--vocab-size', type=int, default=50000)
+@click.option('--seed', type=int, default=20211201)
+def bench_plan(num_tweets, vocab_size, seed):
+    '''
+    Compare the production queries run one at a time with the same
+    queries run as a single TweetAnalysisPlan.
+    '''
+    tweets = gen_tweets(num_tweets, vocab_size, seed)
+    hashtags = ("hashtags", "text", False)
+    mentions = ("user_mentions", "screen_name", False)
+    analyze.get_punctuation()
+
+    def separate():
+        return [analyze.find_top_k_entities(tweets, hashtags, 10),
+                analyze.find_top_k_entities(tweets, mentions, 10),
+                analyze.find_min_count_ngrams(tweets, 2, False, 100),
+                analyze.find_salient_ngrams(tweets, 1, False, 2.0)]
+
+    plan = query_plan.TweetAnalysisPlan()
+    plan.add_top_k_entities(hashtags, 10, "hashtags")
+    plan.add_top_k_entities(mentions, 10, "mentions")
+    plan.add_min_count_ngrams(2, False, 100, "bigrams")
+    plan.add_salient_ngrams(1, False, 2.0, "salient")
+
+    elapsed_separate, expected = timed(separate)
+    elapsed_plan, result = timed(plan.run, tweets)
+    same = [result[name] for name in
+            ("hashtags", "mentions", "bigrams", "salient")] == expected
+    report([{"method": "separate", "seconds": elapsed_separate, "same": True},
+            {"method": "plan", "seconds": elapsed_plan, "same": same}],
+           ["method", "seconds", "same"])
+    print(result.format_timings())
+
+
+@cmd.command(name="loader")
+@click.option('--num-tweets', type=int, default=200000)
+@click.option('--vocab-size', type=int, default=50000)
+@click.option('--seed', type=int, default=20211201)
+def bench_loader(num_tweets, vocab_size, seed):
+    '''
+    Compare the load throughput and peak memory of json.load with the
+    memory-mapped, projecting tweet_loader.
+    '''
+    tweets = gen_tweets(num_tweets, vocab_size, seed)
+    descs = [("hashtags", "text", False)]
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for json_lines in (False, True):
+            filename = os.path.join(tmp, "tweets.json")
+            write_tweet_dump(filename, tweets, json_lines)
+            mb = os.path.getsize(filename) / 2 ** 20
+            fmt = "lines" if json_lines else "array"
+            if json_lines:
+                def full():
+                    with open(filename, encoding="utf-8") as f:
+                        return [json.loads(line) for line in f]
+            else:
+                def full():
+                    with open(filename, encoding="utf-8") as f:
+                        return json.load(f)
+            for method, fn in (("json", full),
+                               ("loader", lambda: tweet_loader.load_tweets(
+                                   filename, descs))):
+                elapsed, loaded = timed(fn)
+                _, peak, _ = traced(fn)
+                rows.append({"format": fmt, "method": method,
+                             "mb_per_sec": mb / elapsed,
+                             "peak_mb": peak / 2 ** 20,
+                             "tweets": len(loaded)})
+    report(rows, ["format", "method", "mb_per_sec", "peak_mb", "tweets"])
+
+
+def gen_precinct(num_voters, hours_open=13, impatience_prob=0.3):
+    '''
+    Build a busy synthetic precinct whose voters all arrive while the
+    polls are open.
+
+    Returns: Precinct
+    '''
+    arrival_rate = 1.2 * num_voters / (hours_open * 60)
+    return simulate.Precinct("bench-{}".format(num_voters), hours_open,
+                             num_voters, arrival_rate, 0.1, impatience_prob)
+
+
+@cmd.command(name="precinct")
+@click.option('--sizes', type=int, multiple=True,
+              default=(1000, 10000, 100000, 300000),
+              help="number of voters")
+@click.option('--booths-per-1000', type=float, default=1.0)
+@click.option('--threshold', type=float, default=10)
+@click.option('--seed', type=int, default=20211201)
+def bench_precinct(sizes, booths_per_1000, threshold, seed):
+    '''
+    Compare Precinct.simulate with the array-backed
+    Precinct.simulate_columnar across precinct sizes.
+    '''
+    rows = []
+    for size in sizes:
+        precinct = gen_precinct(size)
+        num_booths = max(1, int(size * booths_per_1000 / 1000))
+        elapsed_objects, voters = timed(
+            precinct.simulate, seed, simulate.VotingBooths(num_booths),
+            threshold)
+        elapsed_columns, columns = timed(
+            precinct.simulate_columnar, seed, num_booths, threshold)
+        same = [v.start_time for v in voters] == \
+            [v.start_time for v in columns.to_voters()]
+        rows.append({"voters": size, "booths": num_booths,
+                     "objects_s": elapsed_objects,
+                     "columnar_s": elapsed_columns,
+                     "speedup": elapsed_objects / elapsed_columns,
+                     "same": same})
+    report(rows, ["voters", "booths", "objects_s", "columnar_s", "speedup",
+                  "same"])
+
+
+def counting_calls(module, name):
+    '''
+    Replace module.name with a wrapper that counts its calls.
+
+    Returns: (list, function) a one-element list holding the count, and
+      a function that restores the original
+    '''
+    original = getattr(module, name)
+    calls = [0]
+
+    def wrapper(*args, **kwargs):
+        calls[0] += 1
+        return original(*args, **kwargs)
+
+    setattr(module, name, wrapper)
+    return calls, lambda: setattr(module, name, original)
+
+
+@cmd.command(name="search")
+@click.option('--sizes', type=int, multiple=True, default=(1000, 3000),
+              help="number of voters")
+@click.option('--num-booths', type=int, default=1)
+@click.option('--threshold', type=int, default=10)
+@click.option('--num-trials', type=int, default=5)
+@click.option('--seed', type=int, default=20211201)
+def bench_search(sizes, num_booths, threshold, num_trials, seed):
+    '''
+    Compare the step and bisect strategies of find_impatience_threshold
+    and find_voting_booths_needed: wall time and number of simulations.
+    '''
+    rows = []
+    for size in sizes:
+        precinct = gen_precinct(size)
+        for task, fn, arg in (
+                ("threshold", simulate.find_impatience_threshold, num_booths),
+                ("booths", simulate.find_voting_booths_needed, threshold)):
+            for search in ("step", "bisect"):
+                simulations, restore_simulate = counting_calls(
+                    simulate.Precinct, "simulate")
+                early_exits, restore_votes = counting_calls(
+                    simulate.VoterTrace, "everyone_votes")
+                try:
+                    elapsed, answer = timed(fn, seed, precinct, arg,
+                                            num_trials, search)
+                finally:
+                    restore_simulate()
+                    restore_votes()
+                rows.append({"voters": size, "task": task, "search": search,
+                             "seconds": elapsed,
+                             "simulations": simulations[0] + early_exits[0],
+                             "answer": answer})
+    report(rows, ["voters", "task", "search", "seconds", "simulations",
+                  "answer"])
+
+
+@cmd.command(name="voters")
+@click.option('--sizes', type=int, multiple=True,
+              default=(1000, 10000, 100000, 1000000),
+              help="number of voters")
+@click.option('--seed', type=int, default=20211201)
+def bench_voters(sizes, seed):
+    '''
+    Compare the compat and numpy voter generators.
+    '''
+    rows = []
+    for size in sizes:
+        precinct = gen_precinct(size)
+        row = {"voters": size}
+        for generator in ("compat", "numpy"):
+            elapsed, voters = timed(precinct.generate_voter_columns, seed,
+                                    generator)
+            row[generator + "_s"] = elapsed
+            row[generator + "_kept"] = len(voters)
+        row["speedup"] = row["compat_s"] / row["numpy_s"]
+        rows.append(row)
+    report(rows, ["voters", "compat_s", "numpy_s", "speedup", "compat_kept",
+                  "numpy_kept"])
+
+
+@cmd.command(name="booth-sweep")
+@click.option('--size', type=int, default=20000, help="number of voters")
+@click.option('--thresholds', type=int, multiple=True,
+              default=(0, 5, 10, 20, 40, 80))
+@click.option('--num-trials', type=int, default=5)
+@click.option('--seed', type=int, default=20211201)
+def bench_booth_sweep(size, thresholds, num_trials, seed):
+    '''
+    Time a sweep of the booths needed over several impatience
+    thresholds: find_voting_booths_needed per threshold (step and
+    bisect) against find_voting_booths_sweep, which shares each trial's
+    voters across the thresholds.
+    '''
+    precinct = gen_precinct(size)
+    rows = []
+    for search in ("step", "bisect"):
+        simulate.clear_voter_trace_cache()
+        elapsed, answers = timed(lambda: [  # pylint: disable=cell-var-from-loop
+            simulate.find_voting_booths_needed(seed, precinct, threshold,
+                                               num_trials, search)
+            for threshold in thresholds])
+        rows.append({"method": "needed/" + search, "seconds": elapsed,
+                     "answers": " ".join(map(str, answers))})
+    simulate.clear_voter_trace_cache()
+    elapsed, answers = timed(simulate.find_voting_booths_sweep, seed,
+                             precinct, thresholds, num_trials)
+    rows.append({"method": "sweep", "seconds": elapsed,
+                 "answers": " ".join(str(answers[t]) for t in thresholds)})
+    report(rows, ["method", "seconds", "answers"])
+
+
+def gen_precinct_file(filename, num_voters, seed):
+    '''
+    Write a busy synthetic precinct (see gen_precinct) and its seed to a
+    precinct file in the format read by util.load_precinct.
+    '''
+    precinct = gen_precinct(num_voters)
+    with open(filename, "w") as f:
+        json.dump({"seed": seed,
+                   "precinct": {"name": precinct.name,
+                                "hours_open": precinct.hours_open,
+                                "num_voters": precinct.num_voters,
+                                "arrival_rate": precinct.arrival_rate,
+                                "voting_duration_rate":
+                                    precinct.voting_duration_rate,
+                                "impatience_prob": precinct.impatience_prob}},
+                  f)
+
+
+def gen_city_file(filename, num_people, seed, infected_every=50):
+    '''
+    Write a synthetic ring city of vax tuples in the format read by
+    sir.parse_city_file: on average one person in infected_every is
+    infected, the rest are susceptible with a random vaccine
+    eagerness.
+    '''
+    rng = random.Random(seed)
+    with open(filename, "w") as f:
+        for _ in range(num_people):
+            if rng.random() < 1 / infected_every:
+                f.write("I 0 0.0\n")
+            else:
+                f.write("S 0 {:.2f}\n".format(rng.random() / 2))
+
+
+def gen_language_grid(size, seed, num_centers=None):
+    '''
+    Generate a synthetic language region: a size x size grid of
+    language states and a list of ((row, column), radius) community
+    centers, in the form returned by utility.read_grid.
+
+    Returns: (list of lists of ints, list of tuples)
+    '''
+    rng = random.Random(seed)
+    grid = [[rng.choice((0, 1, 1, 2)) for _ in range(size)]
+            for _ in range(size)]
+    if num_centers is None:
+        num_centers = max(1, size // 10)
+    centers = [((rng.randrange(size), rng.randrange(size)),
+                rng.randint(1, 3)) for _ in range(num_centers)]
+    return grid, centers
+
+
+# Workload sizes for each scale: voters per precinct, people per city,
+# grid side, tweets per corpus.
+SUITE_SCALES = {
+    "precinct": {"small": 1000, "medium": 10000, "large": 100000},
+    "sir": {"small": 1000, "medium": 10000, "large": 100000},
+    "language": {"small": 20, "medium": 50, "large": 100},
+    "tweets": {"small": 5000, "medium": 50000, "large": 200000},
+}
+
+
+def suite_precinct(size, seed):
+    '''
+    Precinct.simulate on a busy precinct with one booth per 1000 voters,
+    read from a precinct file as simulate's command line reads it.
+
+    Returns: (function, int, str) the workload, its number of items and
+      the unit of an item
+    '''
+    with tempfile.TemporaryDirectory() as workdir:
+        filename = os.path.join(workdir, "precinct-{}.json".format(size))
+        gen_precinct_file(filename, size, seed)
+        p, precinct_seed = util.load_precinct(filename)
+    precinct = simulate.Precinct(p["name"], p["hours_open"], p["num_voters"],
+                                 p["arrival_rate"], p["voting_duration_rate"],
+                                 p["impatience_prob"])
+    num_booths = max(1, size // 1000)
+
+    def run():
+        return precinct.simulate(precinct_seed,
+                                 simulate.VotingBooths(num_booths), 10)
+    return run, size, "voters"
+
+
+def suite_sir(size, seed):
+    '''
+    sir.vaccinate_and_simulate on a city read from a city file.
+    '''
+    with tempfile.TemporaryDirectory() as workdir:
+        filename = os.path.join(workdir, "city-{}.txt".format(size))
+        gen_city_file(filename, size, seed)
+        city = sir.parse_city_file(filename, True)
+
+    def run():
+        return sir.vaccinate_and_simulate(city, 3, seed)
+    return run, size, "people"
+
+
+def suite_language(size, seed):
+    '''
+    language.run_simulation on a grid with community centers, for up to
+    five steps.  run_simulation prints the final grid, so its output
+    is discarded.  language needs the utility module, so it is only
+    imported when this workload runs.
+    '''
+    import language  # pylint: disable=import-outside-toplevel
+
+    grid, centers = gen_language_grid(size, seed)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return language.run_simulation([row[:] for row in grid], 1,
+                                           (0.6, 0.8, 1.6), centers, 5)
+    return run, size * size, "homes"
+
+
+def suite_tweets(size, seed):
+    '''
+    Load a JSON-lines tweet dump and run the top-k entity, top-k n-gram
+    and salient n-gram analyses over it.  The dump is a temporary file,
+    removed when the workload is dropped.  The punctuation table is
+    built (or read from its cache) here, so that the first timed run
+    does not pay for it.
+    '''
+    dump = tempfile.NamedTemporaryFile(  # pylint: disable=consider-using-with
+        suffix=".json")
+    write_tweet_dump(dump.name, gen_tweets(size, 50000, seed), True)
+    hashtags = ("hashtags", "text", False)
+    analyze.get_punctuation()
+
+    def run():
+        tweets = tweet_loader.load_tweets(dump.name, [hashtags])
+        return (analyze.find_top_k_entities(tweets, hashtags, 10),
+                analyze.find_top_k_ngrams(tweets, 2, False, 10),
+                analyze.find_salient_ngrams(tweets, 1, False, 2.0))
+    return run, size, "tweets"
+
+
+SUITE_WORKLOADS = {"precinct": suite_precinct, "sir": suite_sir,
+                   "language": suite_language, "tweets": suite_tweets}
+
+
+def run_suite(workloads, scales, repeats, seed, memory=True):
+    '''
+    Run benchmark workloads at several scales.
+
+    Inputs:
+        workloads: list of names from SUITE_WORKLOADS
+        scales: list of names from SUITE_SCALES
+        repeats: (int) the number of timed runs (the fastest is kept)
+        seed: (int) the seed for the synthetic data
+        memory: (bool) measure peak memory in one extra traced run
+
+    Returns: list of dictionaries, one per (workload, scale)
+    '''
+    results = []
+    for name in workloads:
+        for scale in scales:
+            size = SUITE_SCALES[name][scale]
+            run, items, unit = SUITE_WORKLOADS[name](size, seed)
+            seconds = min(timed(run)[0] for _ in range(repeats))
+            result = {"workload": name, "scale": scale, "size": size,
+                      "items": items, "unit": unit, "seconds": seconds,
+                      "throughput": items / seconds}
+            if memory:
+                result["peak_mb"] = traced(run)[1] / 2 ** 20
+            results.append(result)
+    return results
+
+
+@cmd.command(name="suite")
+@click.option('--workloads', type=click.Choice(sorted(SUITE_WORKLOADS)),
+              multiple=True, default=sorted(SUITE_WORKLOADS))
+@click.option('--scales', type=click.Choice(["small", "medium", "large"]),
+              multiple=True, default=("small", "medium"))
+@click.option('--repeats', type=int, default=3)
+@click.option('--no-memory', is_flag=True,
+              help="skip the peak memory measurements")
+@click.option('--output', type=click.Path(), default=None,
+              help="write the results to this JSON file")
+@click.option('--seed', type=int, default=20211201)
+def bench_suite(workloads, scales, repeats, no_memory, output, seed):
+    '''
+    Run the simulators and the tweet analyses on synthetic workloads at
+    several scales, recording throughput (items per second) and peak
+    memory.
+    '''
+    results = run_suite(workloads, scales, repeats, seed, not no_memory)
+    columns = ["workload", "scale", "items", "seconds", "throughput"]
+    if not no_memory:
+        columns.append("peak_mb")
+    report(results, columns)
+    if output is not None:
+        run_info = {"python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "repeats": repeats, "seed": seed}
+        with open(output, "w") as f:
+            json.dump({"run": run_info, "results": results}, f, indent=2)
+
+
+def compare_results(base, new, tolerance):
+    '''
+    Compare two suite runs.  A workload regresses when its throughput
+    drops, or its peak memory grows, by more than the tolerance.
+
+    Inputs:
+        base, new: lists of suite results
+        tolerance: (float) the allowed relative change, e.g. 0.1
+
+    Returns: list of dictionaries, one per workload run in both
+    '''
+    old = {(r["workload"], r["scale"]): r for r in base}
+    rows = []
+    for r in new:
+        b = old.get((r["workload"], r["scale"]))
+        if b is None:
+            continue
+        row = {"workload": r["workload"], "scale": r["scale"],
+               "throughput": r["throughput"] / b["throughput"] - 1,
+               "peak_mb": float("nan"), "regressed": False}
+        if row["throughput"] < -tolerance:
+            row["regressed"] = True
+        if "peak_mb" in r and "peak_mb" in b and b["peak_mb"] > 0:
+            row["peak_mb"] = r["peak_mb"] / b["peak_mb"] - 1
+            if row["peak_mb"] > tolerance:
+                row["regressed"] = True
+        rows.append(row)
+    return rows
+
+
+@cmd.command(name="compare")
+@click.argument('base_file', type=click.Path(exists=True))
+@click.argument('new_file', type=click.Path(exists=True))
+@click.option('--tolerance', type=float, default=0.1,
+              help="allowed relative slowdown or memory growth")
+def bench_compare(base_file, new_file, tolerance):
+    '''
+    Compare two suite runs (see suite --output), printing the relative
+    change in throughput and peak memory.  Exits with status 1 if any
+    workload regressed by more than the tolerance.
+    '''
+    with open(base_file) as f:
+        base = json.load(f)["results"]
+    with open(new_file) as f:
+        new = json.load(f)["results"]
+    rows = compare_results(base, new, tolerance)
+    report(rows, ["workload", "scale", "throughput", "peak_mb", "regressed"])
+    if any(row["regressed"] for row in rows):
+        sys.exit(1)
+
+
+def gen_city(num_people, seed, infected_every=50):
+    '''
+    Generate a synthetic ring city of person tuples in which on average
+    one person in infected_every is infected.
+
+    Returns: list of (string, int) tuples
+    '''
+    rng = random.Random(seed)
+    infected, susceptible = ("I", 0), ("S", 0)
+    return [infected if rng.random() < 1 / infected_every else susceptible
+            for _ in range(num_people)]
+
+
+@cmd.command(name="sir-engines")
+@click.option('--sizes', type=int, multiple=True,
+              default=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7),
+              help="number of people in the city")
+@click.option('--days-contagious', type=int, default=3)
+@click.option('--infected-every', type=int, default=50,
+              help="one person in this many starts infected")
+@click.option('--max-python-size', type=int, default=10 ** 5,
+              help="largest city to run the list engine on")
+@click.option('--seed', type=int, default=20211201)
+def bench_sir_engines(sizes, days_contagious, infected_every, max_python_size,
+                      seed):
+    '''
+    Compare sir.run_simulation with the array engine in sir_array and
+    the frontier mode sir.run_simulation_frontier, in person-days per
+    second.  The list engine is skipped on cities larger than
+    --max-python-size.
+    '''
+    rows = []
+    for size in sizes:
+        city = gen_city(size, seed, infected_every)
+        elapsed_array, result = timed(sir_array.run_simulation, city,
+                                      days_contagious)
+        elapsed_frontier, frontier = timed(sir.run_simulation_frontier, city,
+                                           days_contagious)
+        num_days = result[1]
+        row = {"people": size, "days": num_days,
+               "array_s": elapsed_array, "frontier_s": elapsed_frontier,
+               "array_rate": size * num_days / elapsed_array,
+               "list_s": float("nan"), "speedup": float("nan"),
+               "same": frontier == result}
+        if size <= max_python_size:
+            elapsed_list, expected = timed(sir.run_simulation, city,
+                                           days_contagious)
+            row.update(list_s=elapsed_list,
+                       speedup=elapsed_list / elapsed_array,
+                       same=row["same"] and expected == result)
+        rows.append(row)
+    report(rows, ["people", "days", "list_s", "array_s", "frontier_s",
+                  "speedup", "array_rate", "same"])
+
+
+def gen_vax_city(num_people, seed, infected_every=50):
+    '''
+    Generate a synthetic ring city of vax tuples, as gen_city_file
+    writes them.
+
+    Returns: list of (string, int, float) triples
+    '''
+    rng = random.Random(seed)
+    return [("I", 0, 0.0) if rng.random() < 1 / infected_every
+            else ("S", 0, round(rng.random() / 2, 2))
+            for _ in range(num_people)]
+
+
+@cmd.command(name="sir-trials")
+@click.option('--sizes', type=int, multiple=True,
+              default=(30, 100, 1000, 10000),
+              help="number of people in the city")
+@click.option('--num-trials', type=int, default=100)
+@click.option('--days-contagious', type=int, default=3)
+@click.option('--workers', type=int, default=4)
+@click.option('--seed', type=int, default=20211201)
+def bench_sir_trials(sizes, num_trials, days_contagious, workers, seed):
+    '''
+    Compare ways of running the vaccination trials of a city: the
+    serial sir.run_trials_distribution, the same on a process pool,
+    and sir_array.run_trials_batched with compat and numpy uniforms.
+    The fastest method for each city size shows the crossover.
+    '''
+    methods = [
+        ("serial", lambda city, s: sir.run_trials_distribution(
+            city, days_contagious, s, num_trials)),
+        ("pool", lambda city, s: sir.run_trials_distribution(
+            city, days_contagious, s, num_trials, workers)),
+        ("batched", lambda city, s: sir_array.run_trials_batched(
+            city, days_contagious, s, num_trials)),
+        ("batched_numpy", lambda city, s: sir_array.run_trials_batched(
+            city, days_contagious, s, num_trials, "numpy")),
+    ]
+    rows = []
+    for size in sizes:
+        city = gen_vax_city(size, seed)
+        row = {"people": size}
+        expected = None
+        for name, fn in methods:
+            elapsed, (days, _) = timed(fn, city, seed)
+            row[name + "_s"] = elapsed
+            if expected is None:
+                expected = days
+            elif name != "batched_numpy":
+                row["same"] = row.get("same", True) and days == expected
+        row["fastest"] = min((row[name + "_s"], name)
+                             for name, _ in methods)[1]
+        rows.append(row)
+    report(rows, ["people"] + [name + "_s" for name, _ in methods] +
+           ["fastest", "same"])
+
+
+if __name__ == "__main__":
+    cmd()  # pylint: disable=no-value-for-parameter
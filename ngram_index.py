@@ -0,0 +1,256 @@
+"""
+CS 121: Analyzing Election Tweets
+
+Yujing Sun
+
+N-gram index module
+
+A persistent, SQLite-backed n-gram count index.  Tweet files are
+tokenized and counted once, as they arrive; top-k and min-count
+queries then read the stored counts instead of re-scanning the tweets.
+
+Example use:
+    $ python3 ngram_index.py bigrams.db data/*.json --n 2 --top-k 10
+"""
+
+import json
+import os
+import sqlite3
+
+import click
+
+from analyze import count_ngrams
+from basic_algorithms import find_top_k_counts
+from tweet_loader import Projection, iter_tweets
+
+
+class NGramIndex:
+    '''
+    Class for representing the n-gram counts of a tweet archive on disk.
+    An index holds the counts for a single (n, case_sensitive) pair.
+
+    Attributes:
+        filename: (str) the SQLite database file
+        n: (int) the length of the n-grams
+        case_sensitive: (bool) whether case is kept when counting
+
+    Methods:
+        add_tweets(tweets): count a batch of tweets
+        add_file(filename): count the tweets in a file, once
+        has_file(filename): has the file been counted
+        file_changed(filename): has a counted file changed since
+        find_top_k(k): list of n-grams
+        find_min_count(min_count): set of n-grams
+        close(): close the database
+    '''
+
+    def __init__(self, filename, n, case_sensitive):
+        '''
+        Open an index, creating it if needed.
+
+        Args:
+            filename: (str) the SQLite database file
+            n: (int) the length of the n-grams
+            case_sensitive: (bool) whether case is kept when counting
+
+        Raises ValueError if the file holds an index for a different
+        (n, case_sensitive) pair.
+        '''
+
+        self.filename = filename
+        self.n = n
+        self.case_sensitive = bool(case_sensitive)
+        self._conn = sqlite3.connect(filename)
+        with self._conn:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY, value TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY, size INTEGER, mtime REAL,
+                    num_tweets INTEGER);
+                CREATE TABLE IF NOT EXISTS counts (
+                    gram TEXT PRIMARY KEY, count INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS counts_by_count
+                    ON counts (count);
+            ''')
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta VALUES ('spec', ?)",
+                (json.dumps([n, self.case_sensitive]),))
+        (spec,) = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'spec'").fetchone()
+        if json.loads(spec) != [n, self.case_sensitive]:
+            self.close()
+            raise ValueError("{} indexes (n, case_sensitive) = {}, not {}"
+                             .format(filename, tuple(json.loads(spec)),
+                                     (n, self.case_sensitive)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        '''Close the database'''
+        self._conn.close()
+
+    def _add_counts(self, counts):
+        '''
+        Add a dictionary of n-gram counts to the stored counts.  Must be
+        called inside a transaction.
+        '''
+        self._conn.executemany(
+            "INSERT INTO counts VALUES (?, ?) ON CONFLICT (gram) "
+            "DO UPDATE SET count = count + excluded.count",
+            ((json.dumps(gram), count) for gram, count in counts.items()))
+
+    def add_tweets(self, tweets):
+        '''
+        Count the n-grams in a batch of tweets.
+
+        Args:
+            tweets: an iterable of tweets
+        '''
+        counts = count_ngrams(tweets, self.n, self.case_sensitive,
+                              encoded=True)
+        with self._conn:
+            self._add_counts(counts)
+
+    def _file_record(self, filename):
+        '''The (size, mtime) recorded for a counted file, or None'''
+        return self._conn.execute(
+            "SELECT size, mtime FROM files WHERE path = ?",
+            (os.path.abspath(filename),)).fetchone()
+
+    def has_file(self, filename):
+        '''Has the file already been counted'''
+        return self._file_record(filename) is not None
+
+    def file_changed(self, filename):
+        '''
+        Has a counted file changed (in size or modification time) since
+        it was counted?
+        '''
+        record = self._file_record(filename)
+        if record is None:
+            return False
+        stat = os.stat(filename)
+        return tuple(record) != (stat.st_size, stat.st_mtime)
+
+    def add_file(self, filename):
+        '''
+        Count the tweets in a file (a JSON array or JSON lines).  A file
+        is only counted once; the counts and the record of the file are
+        committed together.  The file's size and modification time are
+        recorded as they were before it was read, so a file that changes
+        while it is being counted shows up as changed later.
+
+        Args:
+            filename: (str) the name of the file
+
+        Returns: (bool) True if the file was counted, False if it was
+          already in the index (including when another process counted
+          it at the same time)
+
+        Raises ValueError if the file was counted but has changed since:
+        its old counts cannot be taken out of the index, so it has to be
+        rebuilt.
+        '''
+        if self.file_changed(filename):
+            raise ValueError("{} has changed since it was indexed; rebuild "
+                             "{} to count it again"
+                             .format(filename, self.filename))
+        if self.has_file(filename):
+            return False
+        stat = os.stat(filename)
+        num_tweets = 0
+
+        def tweets():
+            nonlocal num_tweets
+            for tweet in iter_tweets(filename, Projection(text=True)):
+                num_tweets += 1
+                yield tweet
+
+        counts = count_ngrams(tweets(), self.n, self.case_sensitive,
+                              encoded=True)
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO files VALUES (?, ?, ?, ?)",
+                    (os.path.abspath(filename), stat.st_size, stat.st_mtime,
+                     num_tweets))
+                self._add_counts(counts)
+        except sqlite3.IntegrityError:
+            # another process counted the file first; nothing was added
+            return False
+        return True
+
+    def find_top_k(self, k):
+        '''
+        Find the k most frequently occurring n-grams.  Only the rows
+        whose count reaches the k-th largest count are read.
+
+        Returns: list of n-grams
+        '''
+        if k < 0:
+            raise ValueError("In find_top_k, k must be a non-negative integer")
+        if k == 0:
+            return []
+        row = self._conn.execute(
+            "SELECT count FROM counts ORDER BY count DESC LIMIT 1 OFFSET ?",
+            (k - 1,)).fetchone()
+        kth = row[0] if row else 0
+        return find_top_k_counts(self._counts_at_least(kth), k)
+
+    def find_min_count(self, min_count):
+        '''
+        Find the n-grams that occur at least min_count times.
+
+        Returns: set of n-grams
+        '''
+        if min_count < 0:
+            raise ValueError("min_count must be a non-negative integer")
+        return set(self._counts_at_least(min_count))
+
+    def _counts_at_least(self, min_count):
+        '''
+        The stored n-grams that occur at least min_count times.
+
+        Returns: dictionary that maps n-grams to counts
+        '''
+        rows = self._conn.execute(
+            "SELECT gram, count FROM counts WHERE count >= ?", (min_count,))
+        return {tuple(json.loads(gram)): count for gram, count in rows}
+
+
+@click.command(name="ngram_index")
+@click.argument('index_file', type=click.Path())
+@click.argument('tweet_files', nargs=-1, type=click.Path(exists=True))
+@click.option('--n', type=int, default=2, help="length of the n-grams")
+@click.option('--case-sensitive', is_flag=True)
+@click.option('--top-k', type=int, default=None,
+              help="print the k most frequent n-grams")
+@click.option('--min-count', type=int, default=None,
+              help="print the n-grams that occur at least this many times")
+def cmd(index_file, tweet_files, n, case_sensitive, top_k, min_count):
+    '''
+    Add any new tweet files to an index, then query it.
+    '''
+    with NGramIndex(index_file, n, case_sensitive) as index:
+        for filename in tweet_files:
+            try:
+                indexed = index.add_file(filename)
+            except ValueError as e:
+                raise click.ClickException(str(e)) from e
+            if indexed:
+                print("Indexed", filename)
+        if top_k is not None:
+            for gram in index.find_top_k(top_k):
+                print(" ".join(gram))
+        if min_count is not None:
+            for gram in sorted(index.find_min_count(min_count)):
+                print(" ".join(gram))
+
+
+if __name__ == "__main__":
+    cmd()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,249 @@
+"""
+CS 121: Analyzing Election Tweets
+
+Yujing Sun
+
+Query plan module
+
+Run several tweet analyses in a single pass over the tweets, sharing
+tokenization and entity extraction between them.
+
+Example use:
+    plan = TweetAnalysisPlan()
+    plan.add_top_k_entities(("hashtags", "text", False), 10)
+    plan.add_top_k_entities(("user_mentions", "screen_name", False), 10)
+    plan.add_min_count_ngrams(2, False, 50)
+    plan.add_salient_ngrams(1, False, 1.5)
+    result = plan.run(tweets)
+    print(result.results, result.timings)
+"""
+
+import time
+
+from analyze import STOP_WORDS, get_tokenizer, update_entity_counts, n_grams
+from basic_algorithms import TfIdfIndex, find_top_k_counts, \
+    find_min_count_counts
+from tweet_loader import Projection
+
+
+class PlanResult:
+    '''
+    Class for representing the output of a query plan.
+
+    Attributes:
+        results: dictionary that maps analysis names to their answers
+        timings: dictionary that maps stages to the seconds spent in
+          them.  The shared stages are "tokenize", "entities ...",
+          "ngrams ..." and "tf-idf ..."; the time to compute each
+          answer from the shared counts is listed under the name of the
+          analysis.
+        num_tweets: (int) the number of tweets processed
+    '''
+
+    def __init__(self, results, timings, num_tweets):
+        self.results = results
+        self.timings = timings
+        self.num_tweets = num_tweets
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def format_timings(self):
+        '''
+        Format the timings as a table, slowest stage first.
+
+        Returns: str
+        '''
+        lines = []
+        for stage, seconds in sorted(self.timings.items(),
+                                     key=lambda pair: -pair[1]):
+            lines.append("{:>10.4f}s  {}".format(seconds, stage))
+        return "\n".join(lines)
+
+
+class TweetAnalysisPlan:
+    '''
+    Class for representing a set of analyses to run over the same tweets.
+
+    Methods:
+        add_top_k_entities(entity_desc, k): register an analysis
+        add_min_count_entities(entity_desc, min_count): register an analysis
+        add_top_k_ngrams(n, case_sensitive, k): register an analysis
+        add_min_count_ngrams(n, case_sensitive, min_count): register an
+          analysis
+        add_salient_ngrams(n, case_sensitive, threshold): register an
+          analysis
+        projection(): the tweet fields the plan reads
+        run(tweets): PlanResult
+    '''
+
+    def __init__(self):
+        '''
+        Initialize an empty plan.
+        '''
+
+        # (name, kind, spec, parameter)
+        self._analyses = []
+
+    def _add(self, name, kind, spec, param):
+        '''
+        Register an analysis.
+
+        Returns: (str) the name of the analysis
+        '''
+        if name is None:
+            name = "{} {} {}".format(kind, spec, param)
+        if any(name == other[0] for other in self._analyses):
+            raise ValueError("Duplicate analysis name: {}".format(name))
+        self._analyses.append((name, kind, spec, param))
+        return name
+
+    def add_top_k_entities(self, entity_desc, k, name=None):
+        '''
+        Register find_top_k_entities(tweets, entity_desc, k).
+
+        Returns: (str) the name of the analysis in the results
+        '''
+        return self._add(name, "top_k_entities", tuple(entity_desc), k)
+
+    def add_min_count_entities(self, entity_desc, min_count, name=None):
+        '''
+        Register find_min_count_entities(tweets, entity_desc, min_count).
+
+        Returns: (str) the name of the analysis in the results
+        '''
+        return self._add(name, "min_count_entities", tuple(entity_desc),
+                         min_count)
+
+    def add_top_k_ngrams(self, n, case_sensitive, k, name=None):
+        '''
+        Register find_top_k_ngrams(tweets, n, case_sensitive, k).
+
+        Returns: (str) the name of the analysis in the results
+        '''
+        return self._add(name, "top_k_ngrams", (n, bool(case_sensitive)), k)
+
+    def add_min_count_ngrams(self, n, case_sensitive, min_count, name=None):
+        '''
+        Register find_min_count_ngrams(tweets, n, case_sensitive,
+        min_count).
+
+        Returns: (str) the name of the analysis in the results
+        '''
+        return self._add(name, "min_count_ngrams", (n, bool(case_sensitive)),
+                         min_count)
+
+    def add_salient_ngrams(self, n, case_sensitive, threshold, name=None):
+        '''
+        Register find_salient_ngrams(tweets, n, case_sensitive, threshold).
+
+        Returns: (str) the name of the analysis in the results
+        '''
+        return self._add(name, "salient_ngrams", (n, bool(case_sensitive)),
+                         threshold)
+
+    def projection(self):
+        '''
+        The fields of each tweet that the registered analyses read, for
+        loading only those fields (see tweet_loader.iter_tweets).
+
+        Returns: tweet_loader.Projection
+        '''
+        descs = [spec for _, kind, spec, _ in self._analyses
+                 if kind.endswith("_entities")]
+        text = any(not kind.endswith("_entities")
+                   for _, kind, _, _ in self._analyses)
+        return Projection(descs, text)
+
+    def run(self, tweets):
+        '''
+        Run every registered analysis in one pass over the tweets.
+
+        Each tweet is tokenized once (case-sensitive, keeping stop
+        words); the other pre-processing variants are derived from those
+        words.  Each entity descriptor and each (n, case_sensitive) pair
+        is counted once, however many analyses use it.
+
+        Args:
+            tweets: an iterable of tweets
+
+        Returns: PlanResult
+        '''
+        entity_counts = {}
+        ngram_counts = {}
+        indexes = {}
+        for _, kind, spec, _ in self._analyses:
+            if kind.endswith("_entities"):
+                entity_counts[spec] = {}
+            elif kind == "salient_ngrams":
+                indexes[spec] = TfIdfIndex()
+            else:
+                ngram_counts[spec] = {}
+        # pre-processing variants, keyed (case_sensitive, remove_stop_words)
+        variants = {(cs, True) for (_, cs) in ngram_counts}
+        variants |= {(cs, False) for (_, cs) in indexes}
+
+        timings = {"tokenize": 0.0}
+        entity_labels = {spec: "entities {}.{} case_sensitive={}".format(*spec)
+                         for spec in entity_counts}
+        ngram_labels = {spec: "ngrams n={} case_sensitive={}".format(*spec)
+                        for spec in ngram_counts}
+        index_labels = {spec: "tf-idf n={} case_sensitive={}".format(*spec)
+                        for spec in indexes}
+        for label in [*entity_labels.values(), *ngram_labels.values(),
+                      *index_labels.values()]:
+            timings[label] = 0.0
+
+        tokenizer = get_tokenizer(True, False)
+        stop_words = frozenset(STOP_WORDS)
+        clock = time.perf_counter
+        num_tweets = 0
+        for tweet in tweets:
+            num_tweets += 1
+            words = {}
+            if variants:
+                start = clock()
+                base = tokenizer.tokenize_text(tweet['abridged_text'])
+                for cs, remove_stop_words in variants:
+                    words[(cs, remove_stop_words)] = [
+                        w if cs else w.lower() for w in base
+                        if not (remove_stop_words and w in stop_words)]
+                timings["tokenize"] += clock() - start
+
+            for spec, counts in entity_counts.items():
+                start = clock()
+                update_entity_counts(counts, tweet, spec)
+                timings[entity_labels[spec]] += clock() - start
+
+            for (n, cs), counts in ngram_counts.items():
+                start = clock()
+                tokens = words[(cs, True)]
+                for i in range(len(tokens) - (n-1)):
+                    gram = tuple(tokens[i:(i+n)])
+                    counts[gram] = counts.get(gram, 0) + 1
+                timings[ngram_labels[(n, cs)]] += clock() - start
+
+            for (n, cs), index in indexes.items():
+                start = clock()
+                index.add_doc(n_grams(words[(cs, False)], n))
+                timings[index_labels[(n, cs)]] += clock() - start
+
+        results = {}
+        for name, kind, spec, param in self._analyses:
+            start = clock()
+            if kind == "top_k_entities":
+                results[name] = find_top_k_counts(entity_counts[spec], param)
+            elif kind == "min_count_entities":
+                results[name] = find_min_count_counts(entity_counts[spec],
+                                                      param)
+            elif kind == "top_k_ngrams":
+                results[name] = find_top_k_counts(ngram_counts[spec], param)
+            elif kind == "min_count_ngrams":
+                results[name] = find_min_count_counts(ngram_counts[spec],
+                                                      param)
+            else:
+                index = indexes[spec]
+                results[name] = [index.salient(d, param)
+                                 for d in range(len(index))]
+            timings[name] = clock() - start
+        return PlanResult(results, timings, num_tweets)
@@ -9,10 +9,14 @@ Main file for polling place simulation
 import sys
 import random
 import queue
+import heapq
+import functools
+from concurrent.futures import ProcessPoolExecutor
 import click
+import numpy as np
 import util
 
-from util import gen_voter_parameters
+from simulation_metrics import SimulationMetrics
 
 
 
@@ -58,6 +62,8 @@ class VotingBooths:
     Attributes: None
 
     Methods:
+        num_booths: int
+            the number of voting booths in the bank
         is_booth_available: bool
             is there at least one unoccupied booth
         is_some_booth_occupied: bool
@@ -83,6 +89,11 @@ class VotingBooths:
         self._num_booths = num_booths
         self._q = queue.PriorityQueue()
 
+    @property
+    def num_booths(self):
+        '''The number of voting booths in the bank'''
+        return self._num_booths
+
     def is_booth_available(self):
         '''Is at least one booth open'''
         return self._q.qsize() < self._num_booths
@@ -137,6 +148,157 @@ class VotingBooths:
         return v, dt
 
 
+class BoothBank:
+    '''Class for representing a bank of voting booths by the departure
+    times of the voters in them, kept in a heap.  Unlike VotingBooths,
+    it takes no locks and can peek at the next departure.
+
+    Attributes: None
+
+    Methods:
+        num_booths: int
+            the number of voting booths in the bank
+        is_booth_available: bool
+            is there at least one unoccupied booth
+        is_some_booth_occupied: bool
+            is there at least one occupied booth
+        enter_booth(departure_time):
+            occupy a booth until departure_time. requires a booth to
+            be available.
+        time_next_free(): float
+            when will a booth be free next
+        exit_booth(): float
+            free the booth with the earliest departure time and return
+            that time.
+        replace(departure_time): float
+            exit_booth() followed by enter_booth(departure_time), in
+            one heap operation.
+    '''
+
+    def __init__(self, num_booths):
+        '''
+        Initialize the voting booths.
+
+        Args:
+            num_booths: (int) the number of voting booths in the bank
+        '''
+
+        self._num_booths = num_booths
+        self._heap = []
+
+    @property
+    def num_booths(self):
+        '''The number of voting booths in the bank'''
+        return self._num_booths
+
+    def is_booth_available(self):
+        '''Is at least one booth open'''
+        return len(self._heap) < self._num_booths
+
+    def is_some_booth_occupied(self):
+        '''Is at least one booth occupied'''
+        return len(self._heap) > 0
+
+    def enter_booth(self, departure_time):
+        '''
+        Occupy an open booth until departure_time.
+
+        Requirements: there must be an open booth.
+        '''
+        assert self.is_booth_available(), "All booths in use"
+        heapq.heappush(self._heap, departure_time)
+
+    def time_next_free(self):
+        '''
+        When will the next voter leave?
+
+        Requirements: there must be at least one occupied booth.
+        '''
+        assert self.is_some_booth_occupied(), "No booths in use"
+        return self._heap[0]
+
+    def exit_booth(self):
+        '''
+        Free the booth with the lowest departure time.
+
+        Returns: the departure time
+
+        Requirements: there must be at least one occupied booth.
+        '''
+        assert self.is_some_booth_occupied(), "No booths in use"
+        return heapq.heappop(self._heap)
+
+    def replace(self, departure_time):
+        '''
+        Free the booth with the lowest departure time and occupy it
+        until departure_time.
+
+        Returns: the departure time of the voter who left
+
+        Requirements: there must be at least one occupied booth.
+        '''
+        assert self.is_some_booth_occupied(), "No booths in use"
+        return heapq.heapreplace(self._heap, departure_time)
+
+
+class VoterColumns:
+    '''
+    Class for representing the voters of a simulation column by column.
+    Entry i of each array describes the i-th voter to arrive.
+
+    Attributes:
+        arrival_time: (array of floats)
+        voting_duration: (array of floats)
+        is_impatient: (array of bools)
+        start_time: (array of floats) NaN for voters who did not vote
+        departure_time: (array of floats) NaN for voters who did not vote
+        has_voted: (array of bools)
+
+    Methods:
+        to_voters(): list of Voter
+    '''
+
+    def __init__(self, arrival_time, voting_duration, is_impatient):
+        '''
+        Initialize the columns for voters who have not voted yet.
+
+        Args:
+            arrival_time: (sequence of floats)
+            voting_duration: (sequence of floats)
+            is_impatient: (sequence of bools)
+        '''
+
+        self.arrival_time = np.asarray(arrival_time, dtype=np.float64)
+        self.voting_duration = np.asarray(voting_duration, dtype=np.float64)
+        self.is_impatient = np.asarray(is_impatient, dtype=bool)
+        n = len(self.arrival_time)
+        self.start_time = np.full(n, np.nan)
+        self.departure_time = np.full(n, np.nan)
+        self.has_voted = np.zeros(n, dtype=bool)
+
+    def __len__(self):
+        return len(self.arrival_time)
+
+    def to_voters(self):
+        '''
+        Convert the columns into Voter objects, as returned by
+        Precinct.simulate.
+
+        Returns: list of Voter
+        '''
+        voters = []
+        for a, d, imp, st, voted in zip(self.arrival_time.tolist(),
+                                        self.voting_duration.tolist(),
+                                        self.is_impatient.tolist(),
+                                        self.start_time.tolist(),
+                                        self.has_voted.tolist()):
+            v = Voter(a, d, imp)
+            if voted:
+                v.vote(st)
+            voters.append(v)
+        return voters
+
+
 class Precinct(object):
     '''
     Class for representing precincts.
@@ -181,18 +343,125 @@ class Precinct(object):
         Return: list of Voter
         '''
 
-        random.seed(seed)
+        return [Voter(arrival_time, voting_duration, is_impatient)
+                for arrival_time, voting_duration, is_impatient
+                in zip(*self.__voter_parameters(seed))]
+
+    def __voter_parameters(self, seed):
+        '''
+        Draw the arrival times, voting durations and impatience flags of
+        the voters who arrive before the polls close, from a
+        random.Random(seed) of this trial's own.  The draws are made in
+        the order util.gen_voter_parameters makes them on the global
+        generator (gap, duration, impatience, voter by voter), so the
+        voters are the same as after random.seed(seed).  Drawing stops
+        at the first voter to arrive after closing, since arrival times
+        only increase.
+
+        Args:
+           seed: (int) the seed for the random number generator
+
+        Return: (list of floats, list of floats, list of bools)
+        '''
+
+        rng = random.Random(seed)
+        expovariate = rng.expovariate
+        uniform = rng.random
+        closing_time = self.hours_open * 60
         arrival_time = 0
-        voter_lst = []
-        for i in range(self.num_voters):
-            (gap, voting_duration, is_impatient) = gen_voter_parameters(self.arrival_rate, self.voting_duration_rate, self.impatience_prob)
-            arrival_time = arrival_time + gap
-            if arrival_time < (self.hours_open * 60):
-                voter1 = Voter(arrival_time, voting_duration, is_impatient)
-                voter_lst.append(voter1)
-        return voter_lst
+        arrivals, durations, impatient = [], [], []
+        for _ in range(self.num_voters):
+            arrival_time = arrival_time + expovariate(self.arrival_rate)
+            if arrival_time >= closing_time:
+                break
+            arrivals.append(arrival_time)
+            durations.append(expovariate(self.voting_duration_rate))
+            impatient.append(uniform() < self.impatience_prob)
+        return arrivals, durations, impatient
+
+    def __batched_voter_parameters(self, seed):
+        '''
+        Draw the voters who arrive before the polls close from a
+        numpy.random.Generator(seed), in batches: gaps are drawn a block
+        at a time until an arrival falls after closing, then the
+        durations and impatience flags of the voters kept are drawn in
+        one call each.  The voters follow the same distributions as
+        __voter_parameters, but are a different sample.
+
+        Args:
+           seed: (int) the seed for the random number generator (numpy
+               only takes non-negative seeds, so a negative seed is used
+               as its absolute value, as random.seed does)
+
+        Return: (array of floats, array of floats, array of bools)
+        '''
 
-    def simulate(self, seed, voting_booths, impatience_threshold):
+        rng = np.random.default_rng(None if seed is None else abs(seed))
+        closing_time = self.hours_open * 60
+        expected = self.arrival_rate * closing_time
+        block = max(16, int(expected + 4 * expected ** 0.5))
+        blocks = []
+        last = 0.0
+        remaining = self.num_voters
+        while remaining > 0:
+            gaps = rng.exponential(1 / self.arrival_rate,
+                                   size=min(block, remaining))
+            times = last + np.cumsum(gaps)
+            kept = int(np.searchsorted(times, closing_time, side="left"))
+            blocks.append(times[:kept])
+            if kept < len(times):
+                break
+            remaining -= len(times)
+            last = times[-1]
+        arrivals = np.concatenate(blocks) if blocks else np.zeros(0)
+        n = len(arrivals)
+        durations = rng.exponential(1 / self.voting_duration_rate, size=n)
+        impatient = rng.random(n) < self.impatience_prob
+        return arrivals, durations, impatient
+
+    def generate_voter_columns(self, seed, generator="compat"):
+        '''
+        Generate the voters for the precinct using the specified seed,
+        as __generate_voters does, but as columns.
+
+        Args:
+           seed: (int) the seed for the random number generator
+           generator: (str) "compat" draws the same voters as
+               __generate_voters; "numpy" draws them in batches from a
+               numpy generator (faster for large precincts, but a
+               different sample)
+
+        Return: VoterColumns
+        '''
+
+        if generator == "numpy":
+            return VoterColumns(*self.__batched_voter_parameters(seed))
+        if generator != "compat":
+            raise ValueError("Unknown voter generator: {}".format(generator))
+        return VoterColumns(*self.__voter_parameters(seed))
+
+    def simulate_columnar(self, seed, num_booths, impatience_threshold,
+                          generator="compat"):
+        '''
+        Simulate election day for the precinct, as simulate does, but
+        with the voters kept in arrays and the booths in a BoothBank.
+
+        Args:
+            seed: (int) the seed for the random number generator
+            num_booths: (int) the number of voting booths
+            impatience_threshold: (int) the number of minutes an impatient
+                voter is willing to wait (inclusive)
+            generator: (str) "compat" or "numpy" (see
+                generate_voter_columns)
+
+        Returns: VoterColumns
+        '''
+        voters = self.generate_voter_columns(seed, generator)
+        run_voters(voters, num_booths, impatience_threshold)
+        return voters
+
+    def simulate(self, seed, voting_booths, impatience_threshold,
+                 metrics=None):
         '''
         Simulate election day for the precinct using the specified seed,
         voting_booths, and impatience threshold.
@@ -203,11 +472,36 @@ class Precinct(object):
                 precinct for the day
             impatience_threshold: (int) the number of minutes an impatient voter
                 is willing to wait (inclusive)
+            metrics: (SimulationMetrics) if given, record timings and
+                queue metrics into it
 
         Returns: list of Voters
         '''
+        if metrics is not None:
+            with metrics.stage("generate voters"):
+                voter_lst = Precinct.__generate_voters(self, seed)
+            with metrics.stage("main loop"):
+                Precinct.__run(voter_lst, metrics.timed_booths(voting_booths),
+                               impatience_threshold)
+            metrics.record_voters(voter_lst, voting_booths.num_booths,
+                                  self.hours_open * 60)
+            return voter_lst
+
         voter_lst = Precinct.__generate_voters(self, seed)
+        Precinct.__run(voter_lst, voting_booths, impatience_threshold)
+        return voter_lst
 
+    @staticmethod
+    def __run(voter_lst, voting_booths, impatience_threshold):
+        '''
+        Send the voters through the booths, in order of arrival.
+
+        Args:
+            voter_lst: (list of Voter) the voters
+            voting_booths: (VotingBooths) the voting booths
+            impatience_threshold: (int) the number of minutes an impatient voter
+                is willing to wait (inclusive)
+        '''
         for voter in voter_lst:
             if voting_booths.is_booth_available():
                 voter.vote(voter.arrival_time)
@@ -222,12 +516,263 @@ class Precinct(object):
                     voting_booths.enter_booth(voter)
         while voting_booths.is_some_booth_occupied():
             voting_booths.exit_booth()
-        return voter_lst
 
 
+def run_voters(voters, num_booths, impatience_threshold):
+    '''
+    Send a batch of voters through a bank of booths, filling in their
+    start times, departure times and has_voted flags.
+
+    Args:
+        voters: (VoterColumns) the voters, in order of arrival
+        num_booths: (int) the number of voting booths
+        impatience_threshold: (int) the number of minutes an impatient
+            voter is willing to wait (inclusive)
+    '''
+    # Plain lists are much faster than NumPy arrays for element-wise
+    # access in the loop; the results are copied back at the end.
+    arrivals = voters.arrival_time.tolist()
+    durations = voters.voting_duration.tolist()
+    impatient = voters.is_impatient.tolist()
+    n = len(arrivals)
+    start = [np.nan] * n
+    voted = [False] * n
+
+    booths = BoothBank(num_booths)
+    for i in range(n):
+        arrival_time = arrivals[i]
+        if booths.is_booth_available():
+            booths.enter_booth(arrival_time + durations[i])
+            start[i] = arrival_time
+            voted[i] = True
+        else:
+            start_time = max(arrival_time, booths.time_next_free())
+            if not impatient[i] or \
+               start_time - arrival_time <= impatience_threshold:
+                booths.replace(start_time + durations[i])
+                start[i] = start_time
+                voted[i] = True
+
+    voters.start_time = np.array(start, dtype=np.float64)
+    voters.departure_time = voters.start_time + voters.voting_duration
+    voters.has_voted = np.array(voted, dtype=bool)
+
+
+class VoterTrace:
+    '''
+    Class for representing the arrivals of a trial's voters as plain
+    lists, for evaluating many booth counts and thresholds against the
+    same voters.  A trace is never modified, so it can be cached and
+    shared (see voter_trace).
+
+    Attributes:
+        arrival_time: (list of floats)
+        voting_duration: (list of floats)
+        is_impatient: (list of bools)
+        any_impatient: (bool) is some voter impatient
+        max_concurrency: (int) the largest number of voters who would be
+            voting at once if nobody waited
+
+    Methods:
+        everyone_votes(num_booths, impatience_threshold): bool
+        min_booths(impatience_threshold): int
+        min_threshold(num_booths, first, step): int
+    '''
+
+    def __init__(self, voters):
+        '''
+        Initialize the trace.
+
+        Args:
+            voters: (VoterColumns) the voters, in order of arrival
+        '''
+
+        self.arrival_time = voters.arrival_time.tolist()
+        self.voting_duration = voters.voting_duration.tolist()
+        self.is_impatient = voters.is_impatient.tolist()
+        self.any_impatient = any(self.is_impatient)
+        self._max_concurrency = None
+
+    def __len__(self):
+        return len(self.arrival_time)
+
+    @property
+    def max_concurrency(self):
+        '''
+        The largest number of voters who would be voting at once if
+        every voter started on arrival.  With at least this many booths
+        a free booth is always waiting for the next voter (a booth
+        freed at the moment a voter arrives counts as free), so nobody
+        waits and, for any threshold >= 0, everyone votes.
+        '''
+        if self._max_concurrency is None:
+            heap = []
+            most = 0
+            for arrival_time, duration in zip(self.arrival_time,
+                                              self.voting_duration):
+                while heap and heap[0] <= arrival_time:
+                    heapq.heappop(heap)
+                heapq.heappush(heap, arrival_time + duration)
+                most = max(most, len(heap))
+            self._max_concurrency = most
+        return self._max_concurrency
+
+    def everyone_votes(self, num_booths, impatience_threshold):
+        '''
+        Does every voter vote?  Runs the voters through the booths as
+        run_voters does, but stops as soon as a voter is turned away and
+        records nothing.
+
+        Returns: bool
+        '''
+        if not self.any_impatient:
+            return True
+        if impatience_threshold >= 0 and num_booths >= self.max_concurrency:
+            return True
+        heap = []
+        for arrival_time, duration, is_impatient in zip(
+                self.arrival_time, self.voting_duration, self.is_impatient):
+            if len(heap) < num_booths:
+                heapq.heappush(heap, arrival_time + duration)
+                continue
+            start_time = max(arrival_time, heap[0])
+            if is_impatient and \
+               start_time - arrival_time > impatience_threshold:
+                return False
+            heapq.heapreplace(heap, start_time + duration)
+        return True
+
+    def min_booths(self, impatience_threshold):
+        '''
+        The smallest number of booths at which everyone votes.  When
+        nobody is impatient the answer is 1 without simulating;
+        otherwise it is bisected, never testing more than
+        max_concurrency booths, which always suffice.
+
+        Returns: int
+        '''
+        if not self.any_impatient:
+            return 1
+        last = self.max_concurrency if impatience_threshold >= 0 else None
+        return find_smallest(1, lambda num_booths: self.everyone_votes(
+            num_booths, impatience_threshold), last)
+
+    def min_threshold(self, num_booths, first=1, step=10):
+        '''
+        The smallest threshold among first, first + step, first + 2*step,
+        ... at which everyone votes.
+
+        Returns: int
+        '''
+        if not self.any_impatient or \
+           (first >= 0 and num_booths >= self.max_concurrency):
+            return first
+        i = find_smallest(0, lambda i: self.everyone_votes(
+            num_booths, first + step * i))
+        return first + step * i
+
 
+# The most recent voter traces, keyed by precinct parameters and seed.
+VOTER_TRACE_CACHE_SIZE = 8
 
-def find_patience_threshold_single_trial(seed, precinct, voting_booths):
+
+@functools.lru_cache(maxsize=VOTER_TRACE_CACHE_SIZE)
+def _cached_voter_trace(hours_open, num_voters, arrival_rate,
+                        voting_duration_rate, impatience_prob, seed):
+    '''
+    Generate the voter trace of a trial (see voter_trace).
+    '''
+    precinct = Precinct(None, hours_open, num_voters, arrival_rate,
+                        voting_duration_rate, impatience_prob)
+    return VoterTrace(precinct.generate_voter_columns(seed))
+
+
+def voter_trace(precinct, seed):
+    '''
+    The voter trace of a precinct for a seed.  The voters depend only on
+    the precinct's parameters and the seed, so the traces of the most
+    recent VOTER_TRACE_CACHE_SIZE (precinct, seed) pairs are cached and
+    shared by every search that uses them.
+
+    Args:
+        precinct: (Precinct) the precinct
+        seed: (int) the seed for the random number generator
+
+    Returns: VoterTrace
+    '''
+    return _cached_voter_trace(precinct.hours_open, precinct.num_voters,
+                               precinct.arrival_rate,
+                               precinct.voting_duration_rate,
+                               precinct.impatience_prob, seed)
+
+
+def clear_voter_trace_cache():
+    '''
+    Forget the cached voter traces (see voter_trace), e.g. to time
+    searches that start without them.
+    '''
+    _cached_voter_trace.cache_clear()
+
+
+def everyone_votes(voters, num_booths, impatience_threshold):
+    '''
+    Does every voter vote?  Runs the voters through the booths as
+    run_voters does, but stops as soon as a voter is turned away and
+    records nothing.
+
+    Args:
+        voters: (VoterColumns or VoterTrace) the voters, in order of
+            arrival
+        num_booths: (int) the number of voting booths
+        impatience_threshold: (int) the number of minutes an impatient
+            voter is willing to wait (inclusive)
+
+    Returns: bool
+    '''
+    if not isinstance(voters, VoterTrace):
+        voters = VoterTrace(voters)
+    return voters.everyone_votes(num_booths, impatience_threshold)
+
+
+def find_smallest(first, passes, last=None):
+    '''
+    Find the smallest integer i >= first for which passes(i) is True,
+    assuming passes is monotone (once True, True for every larger i).
+    Uses exponential bracketing followed by bisection, so passes is
+    called O(log(answer - first)) times.
+
+    Args:
+        first: (int) the smallest candidate
+        passes: function from int to bool
+        last: (int) a candidate known to pass, if any; it caps the
+            bracketing and is never tested
+
+    Returns: int
+    '''
+    if last is not None and last <= first:
+        return first
+    if passes(first):
+        return first
+    lo, step = first, 1
+    hi = first + step
+    while not (last is not None and hi >= last) and not passes(hi):
+        lo = hi
+        step *= 2
+        hi = first + step
+    if last is not None:
+        hi = min(hi, last)
+    # passes(lo) is False and passes(hi) is True
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if passes(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def find_patience_threshold_single_trial(seed, precinct, voting_booths,
+                                         search="step"):
     '''
     For a given precinct and seed, find the impatience threshold at which
     everyone votes.
@@ -236,11 +781,20 @@ def find_patience_threshold_single_trial(seed, precinct, voting_booths):
       precinct:(Precinct) the precinct to simulate
       voting_booths: (VotingBooths) a bank of voting booths to use in the
                 simulations
+      search (str): "step" tries 1, 11, 21, ... in turn; "bisect" finds
+                the same threshold with O(log) early-exit simulations.
+                This works because once everyone votes at a threshold,
+                no wait exceeds it, so everyone votes at every larger
+                threshold too.
 
     Returns: (int) a threshold at which is sufficient to guarantee that the
           voters will vote.
     '''
 
+    if search == "bisect":
+        return voter_trace(precinct, seed).min_threshold(
+            voting_booths.num_booths, 1, 10)
+
     threshold = 1
     voters = precinct.simulate(seed, voting_booths, threshold)
     tf_voter = [v.has_voted for v in voters]
@@ -251,7 +805,81 @@ def find_patience_threshold_single_trial(seed, precinct, voting_booths):
     return threshold
 
 
-def find_impatience_threshold(seed, precinct, num_booths, num_trials):
+def _threshold_trial(job):
+    '''
+    Run one trial of find_impatience_threshold (see run_trials).  The
+    booths are created here since a VotingBooths cannot be sent to a
+    worker process; simulate leaves its booths empty, so this matches
+    reusing one bank across trials.
+    '''
+    seed, precinct, num_booths, search = job
+    return find_patience_threshold_single_trial(
+        seed, precinct, VotingBooths(num_booths), search)
+
+
+def _booths_trial(job):
+    '''
+    Run one trial of find_voting_booths_needed (see run_trials).
+    '''
+    seed, precinct, threshold, search = job
+    return find_voting_booths_single_trial(seed, precinct, threshold, search)
+
+
+def run_trials(trial, seed, precinct, param, num_trials, search="step",
+               workers=1):
+    '''
+    Run num_trials independent trials, trial i with seed seed+i, on a
+    process pool when workers > 1.  Every trial seeds its own random
+    numbers, so the results are the same for any number of workers.
+
+    Args:
+        trial: _threshold_trial, _booths_trial or _booths_sweep_trial
+        seed (int): the initial seed for the random number generator
+        precinct: (Precinct) the precinct to simulate
+        param: the number of booths (_threshold_trial), the
+            impatience threshold (_booths_trial) or the thresholds
+            (_booths_sweep_trial)
+        num_trials: (int) the number of trials to run
+        search (str): "step" or "bisect"
+        workers (int): the number of worker processes
+
+    Returns: list of the per-trial results, in order of seed
+    '''
+
+    assert num_trials > 0
+
+    jobs = [(seed + i, precinct, param, search) for i in range(num_trials)]
+    if workers <= 1:
+        return [trial(job) for job in jobs]
+    chunksize = max(1, num_trials // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(trial, jobs, chunksize=chunksize))
+
+
+def median(results):
+    '''
+    The median of the per-trial results (the upper median when the
+    number of trials is even).
+    '''
+    return sorted(results)[len(results) // 2]
+
+
+def impatience_threshold_trials(seed, precinct, num_booths, num_trials,
+                                search="step", workers=1):
+    '''
+    For a given precinct, find the impatience threshold at which
+    everyone votes in each of num_trials trials.
+
+    Args: see find_impatience_threshold
+
+    Returns: (list of ints) the threshold from each trial
+    '''
+    return run_trials(_threshold_trial, seed, precinct, num_booths,
+                      num_trials, search, workers)
+
+
+def find_impatience_threshold(seed, precinct, num_booths, num_trials,
+                              search="step", workers=1):
     '''
     For a given precinct, find the impatience threshold at which all
     voters are likely to vote.
@@ -262,21 +890,18 @@ def find_impatience_threshold(seed, precinct, num_booths, num_trials):
         num_booths: (int) number of voting booths to use in
             the simulations
         num_trials: (int) the number of trials to run
+        search (str): "step" or "bisect" (see
+            find_patience_threshold_single_trial)
+        workers (int): the number of worker processes (see run_trials)
 
     Returns: (int) the median threshold from the trials
     '''
 
-    assert num_trials > 0
+    return median(impatience_threshold_trials(seed, precinct, num_booths,
+                                              num_trials, search, workers))
 
-    threshold_lst = []
-    voting_booths = VotingBooths(num_booths)
-    for i in range(num_trials):
-        threshold=find_patience_threshold_single_trial(seed+i,precinct,voting_booths)
-        threshold_lst.append(threshold)
-    return sorted(threshold_lst)[len(threshold_lst) // 2]
 
-
-def find_voting_booths_single_trial(seed, precinct, threshold):
+def find_voting_booths_single_trial(seed, precinct, threshold, search="step"):
     '''
     For a given precinct and seed, find the voting booths
     at which everyone votes.
@@ -285,11 +910,19 @@ def find_voting_booths_single_trial(seed, precinct, threshold):
       precinct:(Precinct) the precinct to simulate
       threshold: (int) the number of minutes an impatient voter
                 is willing to wait (inclusive)
+      search (str): "step" tries 1, 2, 3, ... booths in turn; "bisect"
+                finds the same number with O(log) early-exit
+                simulations.  This works because, when everyone votes,
+                adding a booth never makes anyone start later, so
+                everyone still votes.
 
     Returns: (int) a threshold at which is sufficient to
         guarantee that the voters will vote.
     '''
 
+    if search == "bisect":
+        return voter_trace(precinct, seed).min_booths(threshold)
+
     num_booths = 1
     voting_booths = VotingBooths(num_booths)
     voters = precinct.simulate(seed, voting_booths, threshold)
@@ -302,7 +935,22 @@ def find_voting_booths_single_trial(seed, precinct, threshold):
     return num_booths
 
 
-def find_voting_booths_needed(seed, precinct, imp_threshold, num_trials):
+def voting_booths_trials(seed, precinct, imp_threshold, num_trials,
+                         search="step", workers=1):
+    '''
+    For a given precinct and impatience threshold, find the number of
+    booths at which everyone votes in each of num_trials trials.
+
+    Args: see find_voting_booths_needed
+
+    Returns: (list of ints) the number of booths from each trial
+    '''
+    return run_trials(_booths_trial, seed, precinct, imp_threshold,
+                      num_trials, search, workers)
+
+
+def find_voting_booths_needed(seed, precinct, imp_threshold, num_trials,
+                              search="step", workers=1):
     '''
     For a given precinct, seed, and impatience threshold, predict the number of
     booths needed to make it likely that all the voters will vote.
@@ -312,17 +960,49 @@ def find_voting_booths_needed(seed, precinct, imp_threshold, num_trials):
         precinct: (Precinct) the precinct to simulate
         impatience_threshold: (int) the impatience threshold
         num_trials: (int) the number of trials to run
+        search (str): "step" or "bisect" (see
+            find_voting_booths_single_trial)
+        workers (int): the number of worker processes (see run_trials)
 
     Returns: (int) the median number of booths needed from the trials.
     '''
 
-    assert num_trials > 0
+    return median(voting_booths_trials(seed, precinct, imp_threshold,
+                                       num_trials, search, workers))
+
 
-    booths_lst = []
-    for i in range(num_trials):
-        booth_threshold = find_voting_booths_single_trial(seed + i, precinct, imp_threshold)
-        booths_lst.append(booth_threshold)
-    return sorted(booths_lst)[len(booths_lst) // 2]
+def _booths_sweep_trial(job):
+    '''
+    Run one trial of find_voting_booths_sweep (see run_trials).
+    '''
+    seed, precinct, thresholds, _ = job
+    trace = voter_trace(precinct, seed)
+    return [trace.min_booths(threshold) for threshold in thresholds]
+
+
+def find_voting_booths_sweep(seed, precinct, thresholds, num_trials,
+                             workers=1):
+    '''
+    For a given precinct and several impatience thresholds, predict the
+    number of booths needed at each threshold, as
+    find_voting_booths_needed(..., search="bisect") would.  The voters
+    of each trial are generated once and shared by every threshold.
+
+    Args:
+        seed (int): the initial seed for the random number generator
+        precinct: (Precinct) the precinct to simulate
+        thresholds: (list of ints) the impatience thresholds
+        num_trials: (int) the number of trials to run
+        workers (int): the number of worker processes (see run_trials)
+
+    Returns: dictionary that maps each threshold to the median number of
+      booths needed
+    '''
+    thresholds = list(thresholds)
+    per_trial = run_trials(_booths_sweep_trial, seed, precinct, thresholds,
+                           num_trials, "bisect", workers)
+    return {threshold: median([booths[j] for booths in per_trial])
+            for j, threshold in enumerate(thresholds)}
 
 
 @click.command(name="simulate")
@@ -336,12 +1016,24 @@ def find_voting_booths_needed(seed, precinct, imp_threshold, num_trials):
 @click.option('--find-num-booths', is_flag=True)
 @click.option('--num-trials', type=int, default=100,
               help="number trials to run")
+@click.option('--search', type=click.Choice(['step', 'bisect']),
+              default='step',
+              help="search strategy for --find-threshold/--find-num-booths")
+@click.option('--workers', type=int, default=1,
+              help="number of processes to run the trials on")
+@click.option('--metrics-output', type=click.Path(), default=None,
+              help="write simulation metrics to this JSON file")
 def cmd(precinct_file, num_booths, impatience_threshold,
-        print_voters, find_threshold, find_num_booths, num_trials):
+        print_voters, find_threshold, find_num_booths, num_trials, search,
+        workers, metrics_output):
     '''
     Run the program...
     '''
     #pylint: disable=too-many-locals
+    if metrics_output and (find_threshold or find_num_booths):
+        raise click.UsageError("--metrics-output records a single simulation;"
+                               " it cannot be used with --find-threshold or"
+                               " --find-num-booths")
     p, seed = util.load_precinct(precinct_file)
 
     precinct = Precinct(p["name"],
@@ -351,24 +1043,30 @@ def cmd(precinct_file, num_booths, impatience_threshold,
                         p["voting_duration_rate"],
                         p["impatience_prob"])
 
+    metrics = None
+    if metrics_output:
+        metrics = SimulationMetrics()
+
     if find_threshold:
-        pt = find_impatience_threshold(seed, precinct, num_booths, num_trials)
+        pt = find_impatience_threshold(seed, precinct, num_booths, num_trials,
+                                       search, workers)
         s = ("Given {} booths, an impatience threshold of {}"
              " would be appropriate for Precinct {}")
         print(s.format(num_booths, pt, p["name"]))
     elif find_num_booths:
         vbn = find_voting_booths_needed(seed, precinct,
-                                        impatience_threshold, num_trials)
+                                        impatience_threshold, num_trials,
+                                        search, workers)
         s = ("Given an impatience threshold of {}, provisioning {}"
              " booth(s) would be appropriate for Precinct {}")
         print(s.format(impatience_threshold, vbn, p["name"]))
     elif print_voters:
         vb = VotingBooths(num_booths)
-        voters = precinct.simulate(seed, vb, impatience_threshold)
+        voters = precinct.simulate(seed, vb, impatience_threshold, metrics)
         util.print_voters(voters)
     else:
         vb = VotingBooths(num_booths)
-        voters = precinct.simulate(seed, vb, impatience_threshold)
+        voters = precinct.simulate(seed, vb, impatience_threshold, metrics)
         print("Precinct", p["name"])
         print("- {} voters voted".format(len(voters)))
         if len(voters) > 0:
@@ -386,6 +1084,9 @@ def cmd(precinct_file, num_booths, impatience_threshold,
             if not voters[-1].departure_time:
                 print("  including the last person to arrive at the polls")
 
+    if metrics is not None:
+        metrics.to_json(metrics_output)
+
 
 if __name__ == "__main__":
     cmd() # pylint: disable=no-value-for-parameter
@@ -0,0 +1,338 @@
+'''
+Polling places
+
+Yujing Sun, Xin Li, Linhui Wu, Zhennuo Wu, Zhiyun Hu
+
+Batch simulation of many precincts in one process
+
+Simulates every precinct file in a directory (or listed in a manifest)
+and streams one row per precinct, and optionally one row per voter, to
+CSV or Parquet as each precinct finishes.
+
+Example use:
+    $ python3 simulate_batch.py data/precincts/ results.csv \
+        --voters-output voters.parquet --num-booths 3 --workers 4
+'''
+
+import csv
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+import numpy as np
+import util
+
+from simulate import Precinct
+
+# (column name, type) of the per-precinct and per-voter results.  Missing
+# numbers (e.g. the start time of a voter who did not vote) are NaN.
+PRECINCT_COLUMNS = [("file", "str"), ("precinct", "str"),
+                    ("hours_open", "int"), ("num_voters", "int"),
+                    ("num_booths", "int"),
+                    ("impatience_threshold", "float"),
+                    ("voters_arrived", "int"), ("voters_voted", "int"),
+                    ("voters_turned_away", "int"), ("mean_wait", "float"),
+                    ("max_wait", "float"), ("last_departure", "float")]
+VOTER_COLUMNS = [("file", "str"), ("precinct", "str"), ("voter", "int"),
+                 ("arrival_time", "float"), ("voting_duration", "float"),
+                 ("is_impatient", "bool"), ("start_time", "float"),
+                 ("departure_time", "float"), ("has_voted", "bool")]
+
+
+def find_precinct_files(source):
+    '''
+    List the precinct files to simulate.
+
+    Args:
+        source: (str) a directory, whose .json files are simulated in
+            name order, or a manifest file listing one precinct file per
+            line (relative paths are relative to the manifest; blank
+            lines and lines starting with # are skipped)
+
+    Returns: list of str
+    '''
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name)
+                      for name in os.listdir(source)
+                      if name.endswith(".json"))
+    base = os.path.dirname(source)
+    filenames = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                filenames.append(os.path.join(base, line))
+    return filenames
+
+
+def simulate_file(job):
+    '''
+    Simulate the precinct in one file.
+
+    Args:
+        job: (filename, num_booths, impatience_threshold, generator,
+            keep_voters) tuple
+
+    Returns: (dict, dict) the precinct's result row and its voters'
+      result columns (None unless keep_voters)
+    '''
+    filename, num_booths, impatience_threshold, generator, keep_voters = job
+    p, seed = util.load_precinct(filename)
+    precinct = Precinct(p["name"],
+                        p["hours_open"],
+                        p["num_voters"],
+                        p["arrival_rate"],
+                        p["voting_duration_rate"],
+                        p["impatience_prob"])
+    voters = precinct.simulate_columnar(seed, num_booths,
+                                        impatience_threshold, generator)
+    voted = voters.has_voted
+    waits = voters.start_time[voted] - voters.arrival_time[voted]
+    summary = {"file": filename,
+               "precinct": p["name"],
+               "hours_open": p["hours_open"],
+               "num_voters": p["num_voters"],
+               "num_booths": num_booths,
+               "impatience_threshold": impatience_threshold,
+               "voters_arrived": len(voters),
+               "voters_voted": int(voted.sum()),
+               "voters_turned_away": int(len(voters) - voted.sum()),
+               "mean_wait": float(waits.mean()) if len(waits) else math.nan,
+               "max_wait": float(waits.max()) if len(waits) else math.nan,
+               "last_departure": (float(np.nanmax(voters.departure_time))
+                                  if len(waits) else math.nan)}
+    if not keep_voters:
+        return summary, None
+    n = len(voters)
+    columns = {"file": [filename] * n,
+               "precinct": [p["name"]] * n,
+               "voter": np.arange(n),
+               "arrival_time": voters.arrival_time,
+               "voting_duration": voters.voting_duration,
+               "is_impatient": voters.is_impatient,
+               "start_time": voters.start_time,
+               "departure_time": voters.departure_time,
+               "has_voted": voters.has_voted}
+    return summary, columns
+
+
+class CsvSink:
+    '''
+    Class for writing result rows to a CSV file as they arrive.
+
+    Methods:
+        write(columns): append rows, given as a dictionary that maps
+            column names to equal-length sequences
+        close(): close the file
+    '''
+
+    def __init__(self, filename, columns):
+        '''
+        Open the file and write the header.
+
+        Args:
+            filename: (str) the output file
+            columns: (name, type) pairs
+        '''
+
+        self._names = [name for name, _ in columns]
+        self._file = open(filename, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self._names)
+
+    def write(self, columns):
+        '''Append rows'''
+        self._writer.writerows(zip(*[
+            col.tolist() if isinstance(col, np.ndarray) else col
+            for col in (columns[name] for name in self._names)]))
+
+    def close(self):
+        '''Close the file'''
+        self._file.close()
+
+
+class ParquetSink:
+    '''
+    Class for writing result rows to a Parquet file as they arrive.
+    Rows are buffered and written a row group at a time, so at most
+    ROW_GROUP_SIZE rows are held in memory.  Needs pyarrow.
+
+    Methods:
+        write(columns): append rows, given as a dictionary that maps
+            column names to equal-length sequences
+        close(): flush the buffered rows and close the file
+    '''
+
+    ROW_GROUP_SIZE = 1 << 16
+
+    def __init__(self, filename, columns):
+        '''
+        Open the file.
+
+        Args:
+            filename: (str) the output file
+            columns: (name, type) pairs
+        '''
+
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise click.UsageError(
+                "Writing Parquet files requires pyarrow") from e
+        types = {"str": pyarrow.string(), "int": pyarrow.int64(),
+                 "float": pyarrow.float64(), "bool": pyarrow.bool_()}
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([(name, types[kind])
+                                       for name, kind in columns])
+        self._writer = pyarrow.parquet.ParquetWriter(filename, self._schema)
+        self._buffer = []
+        self._num_rows = 0
+
+    def write(self, columns):
+        '''Append rows'''
+        self._buffer.append(columns)
+        self._num_rows += len(columns[self._schema.names[0]])
+        if self._num_rows >= self.ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self):
+        '''Write the buffered rows as one row group'''
+        if not self._buffer:
+            return
+        arrays = []
+        for field in self._schema:
+            parts = [self._pa.array(columns[field.name], type=field.type)
+                     for columns in self._buffer]
+            arrays.append(self._pa.concat_arrays(parts))
+        self._writer.write_table(self._pa.Table.from_arrays(
+            arrays, schema=self._schema))
+        self._buffer = []
+        self._num_rows = 0
+
+    def close(self):
+        '''Flush the buffered rows and close the file'''
+        self._flush()
+        self._writer.close()
+
+
+def open_sink(filename, columns, fmt=None):
+    '''
+    Open a CsvSink or ParquetSink.
+
+    Args:
+        filename: (str) the output file
+        columns: (name, type) pairs
+        fmt: (str) "csv" or "parquet" (by default, guessed from the
+            file's extension)
+
+    Returns: CsvSink or ParquetSink
+    '''
+    if fmt is None:
+        fmt = "parquet" if filename.endswith((".parquet", ".pq")) else "csv"
+    if fmt == "parquet":
+        return ParquetSink(filename, columns)
+    return CsvSink(filename, columns)
+
+
+def _map_bounded(pool, fn, jobs, window):
+    '''
+    pool.map(fn, jobs), in order, with at most window jobs submitted
+    but not yet consumed, so finished results do not pile up when the
+    consumer is slower than the pool.
+    '''
+    pending = deque()
+    for job in jobs:
+        pending.append(pool.submit(fn, job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def simulate_batch(filenames, precinct_sink, voter_sink=None, num_booths=1,
+                   impatience_threshold=1000, generator="compat", workers=1):
+    '''
+    Simulate each precinct file and write its results as soon as it
+    finishes.  Only the precincts being simulated (at most a few per
+    worker) are held in memory.
+
+    Args:
+        filenames: (list of str) the precinct files
+        precinct_sink: (CsvSink or ParquetSink) for one row per precinct
+        voter_sink: (CsvSink or ParquetSink) for one row per voter, or
+            None
+        num_booths: (int) the number of voting booths
+        impatience_threshold: (int) the number of minutes an impatient
+            voter is willing to wait (inclusive)
+        generator: (str) "compat" or "numpy" (see
+            Precinct.generate_voter_columns)
+        workers: (int) the number of worker processes
+
+    Returns: (int) the number of precincts simulated
+    '''
+    jobs = ((filename, num_booths, impatience_threshold, generator,
+             voter_sink is not None) for filename in filenames)
+    if workers <= 1:
+        results = map(simulate_file, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = _map_bounded(pool, simulate_file, jobs, 2 * workers)
+    num_precincts = 0
+    try:
+        for summary, voter_columns in results:
+            precinct_sink.write({name: [value]
+                                 for name, value in summary.items()})
+            if voter_sink is not None:
+                voter_sink.write(voter_columns)
+            num_precincts += 1
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return num_precincts
+
+
+@click.command(name="simulate_batch")
+@click.argument('source', type=click.Path(exists=True))
+@click.argument('output', type=click.Path())
+@click.option('--voters-output', type=click.Path(), default=None,
+              help="also write one row per voter to this file")
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'parquet']),
+              default=None,
+              help="output format (default: from the file extension)")
+@click.option('--num-booths', type=int, default=1,
+              help="number of voting booths to use")
+@click.option('--impatience-threshold', type=float,
+              default=1000, help="the impatience threshold")
+@click.option('--generator', type=click.Choice(['compat', 'numpy']),
+              default='compat', help="voter generator")
+@click.option('--workers', type=int, default=1,
+              help="number of processes to simulate on")
+def cmd(source, output, voters_output, fmt, num_booths, impatience_threshold,
+        generator, workers):
+    '''
+    Simulate every precinct in SOURCE (a directory of precinct files or
+    a manifest listing them) and write the results to OUTPUT.
+    '''
+    #pylint: disable=too-many-arguments
+    filenames = find_precinct_files(source)
+    precinct_sink = open_sink(output, PRECINCT_COLUMNS, fmt)
+    voter_sink = None
+    try:
+        if voters_output is not None:
+            voter_sink = open_sink(voters_output, VOTER_COLUMNS, fmt)
+        num_precincts = simulate_batch(filenames, precinct_sink, voter_sink,
+                                       num_booths, impatience_threshold,
+                                       generator, workers)
+    finally:
+        precinct_sink.close()
+        if voter_sink is not None:
+            voter_sink.close()
+    print("Simulated {} precincts".format(num_precincts))
+
+
+if __name__ == "__main__":
+    cmd()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,234 @@
+'''
+Polling places
+
+Yujing Sun, Xin Li, Linhui Wu, Zhennuo Wu, Zhiyun Hu
+
+Simulation metrics
+
+Opt-in instrumentation for Precinct.simulate: where the time goes, and
+how the queue behaved.  Pass a SimulationMetrics to simulate to record
+them; without one, simulate runs exactly as before.
+
+Example use:
+    metrics = SimulationMetrics()
+    voters = precinct.simulate(seed, VotingBooths(3), 10, metrics)
+    metrics.to_json("metrics.json")
+'''
+
+import json
+import time
+from contextlib import contextmanager
+
+
+class SimulationMetrics:
+    '''
+    Class for recording the metrics of a simulation.
+
+    Attributes:
+        timings: dictionary that maps stages to seconds.  "generate
+            voters" and "main loop" are the two parts of simulate;
+            "booths" is the part of the main loop spent in VotingBooths
+            calls.
+        booth_calls: (int) the number of VotingBooths calls
+        num_booths: (int)
+        closing_time: (float) minutes after opening
+        num_voters: (int) the number of voters who arrived
+        num_voted: (int)
+        num_turned_away: (int) impatient voters who left without voting
+        queue_length: list of [time, length] pairs: the number of voters
+            waiting for a booth changes to length at time
+        max_queue_length: (int)
+        mean_queue_length: (float) time-weighted, over the day
+        utilisation: (float) the fraction of booth time spent voting,
+            over the day (from opening until the later of closing and
+            the last departure)
+        wait_bin_width: (float) the width of the wait histogram bins
+        wait_histogram: list of ints: entry i counts the voters who
+            waited between i and i+1 bin widths
+
+    Methods:
+        stage(name): context manager that times a stage
+        timed_booths(voting_booths): VotingBooths whose calls are timed
+        record_voters(voters, num_booths, closing_time): compute the
+            queue metrics
+        to_dict(): dictionary
+        to_json(filename): write the metrics as JSON
+    '''
+
+    def __init__(self, wait_bin_width=5):
+        '''
+        Initialize empty metrics.
+
+        Args:
+            wait_bin_width: (float) the width of the wait histogram bins,
+                in minutes
+        '''
+
+        self.timings = {"generate voters": 0.0, "main loop": 0.0,
+                        "booths": 0.0}
+        self.booth_calls = 0
+        self.num_booths = 0
+        self.closing_time = 0
+        self.num_voters = 0
+        self.num_voted = 0
+        self.num_turned_away = 0
+        self.queue_length = []
+        self.max_queue_length = 0
+        self.mean_queue_length = 0.0
+        self.utilisation = 0.0
+        self.wait_bin_width = wait_bin_width
+        self.wait_histogram = []
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Add the time spent in the with block to timings[name].
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (self.timings.get(name, 0.0)
+                                  + time.perf_counter() - start)
+
+    def timed_booths(self, voting_booths):
+        '''
+        Wrap a bank of voting booths so that the time spent in its
+        methods is added to timings["booths"].
+
+        Returns: TimedBooths
+        '''
+        return TimedBooths(voting_booths, self)
+
+    def record_voters(self, voters, num_booths, closing_time):
+        '''
+        Compute the queue metrics from the voters of a finished
+        simulation.  A voter waits in the queue from arrival until
+        starting to vote; voters who are turned away leave on arrival.
+
+        Args:
+            voters: (list of Voter) in order of arrival
+            num_booths: (int) the number of booths
+            closing_time: (float) minutes after opening
+        '''
+        self.num_booths = num_booths
+        self.closing_time = closing_time
+        self.num_voters = len(voters)
+        voted = [v for v in voters if v.has_voted]
+        self.num_voted = len(voted)
+        self.num_turned_away = self.num_voters - self.num_voted
+
+        end_of_day = max([closing_time] + [v.departure_time for v in voted])
+        busy = sum(v.voting_duration for v in voted)
+        self.utilisation = (busy / (num_booths * end_of_day)
+                            if num_booths and end_of_day else 0.0)
+
+        width = self.wait_bin_width
+        histogram = []
+        events = []
+        for v in voted:
+            wait = v.start_time - v.arrival_time
+            i = int(wait // width)
+            if i >= len(histogram):
+                histogram.extend([0] * (i + 1 - len(histogram)))
+            histogram[i] += 1
+            if wait > 0:
+                events.append((v.arrival_time, 1))
+                events.append((v.start_time, -1))
+        self.wait_histogram = histogram
+
+        # leaving before joining at the same time keeps lengths exact
+        events.sort()
+        self.queue_length = [[0.0, 0]]
+        length = 0
+        area = 0.0
+        for t, change in events:
+            area += length * (t - self.queue_length[-1][0])
+            length += change
+            if t == self.queue_length[-1][0]:
+                self.queue_length[-1][1] = length
+            else:
+                self.queue_length.append([t, length])
+        self.max_queue_length = max(n for _, n in self.queue_length)
+        self.mean_queue_length = area / end_of_day if end_of_day else 0.0
+
+    def to_dict(self):
+        '''
+        The metrics as a dictionary of JSON-compatible values.
+
+        Returns: dict
+        '''
+        return {"timings": dict(self.timings),
+                "booth_calls": self.booth_calls,
+                "num_booths": self.num_booths,
+                "closing_time": self.closing_time,
+                "num_voters": self.num_voters,
+                "num_voted": self.num_voted,
+                "num_turned_away": self.num_turned_away,
+                "utilisation": self.utilisation,
+                "max_queue_length": self.max_queue_length,
+                "mean_queue_length": self.mean_queue_length,
+                "queue_length": self.queue_length,
+                "wait_bin_width": self.wait_bin_width,
+                "wait_histogram": self.wait_histogram}
+
+    def to_json(self, filename=None):
+        '''
+        Write the metrics as JSON.
+
+        Args:
+            filename: (str) the output file (None returns the JSON
+                instead)
+
+        Returns: (str) the JSON, if filename is None
+        '''
+        if filename is None:
+            return json.dumps(self.to_dict())
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f)
+        return None
+
+
+class TimedBooths:
+    '''
+    Class for timing the calls made to a bank of voting booths.  Has the
+    same methods as VotingBooths.
+    '''
+
+    def __init__(self, voting_booths, metrics):
+        self._booths = voting_booths
+        self._metrics = metrics
+
+    @property
+    def num_booths(self):
+        '''The number of voting booths in the bank'''
+        return self._booths.num_booths
+
+    def _timed(self, method, *args):
+        '''Call a method of the booths, timing it'''
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._metrics.timings["booths"] += time.perf_counter() - start
+            self._metrics.booth_calls += 1
+
+    def is_booth_available(self):
+        '''Is at least one booth open'''
+        return self._timed(self._booths.is_booth_available)
+
+    def is_some_booth_occupied(self):
+        '''Is at least one booth occupied'''
+        return self._timed(self._booths.is_some_booth_occupied)
+
+    def enter_booth(self, v):
+        '''Add voter v to an open booth'''
+        return self._timed(self._booths.enter_booth, v)
+
+    def time_next_free(self):
+        '''When will the next voter leave'''
+        return self._timed(self._booths.time_next_free)
+
+    def exit_booth(self):
+        '''Remove voter with lowest departure time'''
+        return self._timed(self._booths.exit_booth)
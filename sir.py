@@ -8,6 +8,8 @@ Functions for running a simple epidemiological simulation
 
 import random
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import click
 
@@ -119,15 +121,85 @@ def is_transmission_possible(city):
     return transmission
 
 
-def find_end(new_city, days_contagious, simulated_days):
-    
-    if is_transmission_possible(new_city):
-        new_city = simulate_one_day(new_city, days_contagious)
-        return find_end(new_city, days_contagious, simulated_days + 1)
-    else:
-        return (new_city, simulated_days)
-    
-def run_simulation(starting_city, days_contagious):
+def advance_city(city, days_contagious):
+    '''
+    Move the simulation forward a single day, as simulate_one_day does,
+    and check whether transmission is still possible in the new city in
+    the same pass.  Each person's new state is computed as in
+    advance_person_at_location; once the new states of a person and of
+    both neighbors are known, the person is checked as in
+    is_transmission_possible.
+
+    Args:
+        city (list): the state of all people in the simulation at the
+          start of the day
+        days_contagious (int): the number of a days a person is infected
+
+    Returns (list of tuples, boolean): the state of the city after one
+      day, and whether transmission is possible in it
+    '''
+
+    n = len(city)
+    new_city = [None] * n
+    possible = False
+    for i in range(n):
+        state, days = city[i]
+        if state == 'S':
+            if city[i - 1][0] == 'I' or city[(i + 1) % n][0] == 'I':
+                new_city[i] = ('I', 0)
+            else:
+                new_city[i] = ('S', days + 1)
+        elif state == 'I' and days + 1 == days_contagious:
+            new_city[i] = ('R', 0)
+        else:
+            new_city[i] = (state, days + 1)
+        # the neighbors of location i - 1 are now known
+        if not possible and i >= 2 and new_city[i - 1][0] == 'S' and \
+           (new_city[i - 2][0] == 'I' or new_city[i][0] == 'I'):
+            possible = True
+    if not possible:
+        # the locations at either end of the ring
+        for j in {0, n - 1} if n else ():
+            if new_city[j][0] == 'S' and \
+               (new_city[j - 1][0] == 'I' or new_city[(j + 1) % n][0] == 'I'):
+                possible = True
+    return new_city, possible
+
+
+def find_end(new_city, days_contagious, simulated_days, stats=None):
+    '''
+    Simulate days until no transmission is possible.  The days are run
+    in a loop (not by recursion, so long epidemics do not hit the
+    recursion limit), and each day is a single pass over the city (see
+    advance_city).
+
+    Args:
+        new_city (list): the state of the city
+        days_contagious (int): the number of a days a person is infected
+        simulated_days (int): the number of days simulated so far
+        stats (dict): if given, filled in with the number of "days"
+          simulated here, the "seconds" they took and "days_per_second"
+
+    Returns tuple (list of tuples, int): the final state of the city
+      and the total number of days simulated.
+    '''
+
+    start = time.perf_counter()
+    first_day = simulated_days
+    possible = is_transmission_possible(new_city)
+    while possible:
+        new_city, possible = advance_city(new_city, days_contagious)
+        simulated_days += 1
+    if stats is not None:
+        seconds = time.perf_counter() - start
+        stats["days"] = simulated_days - first_day
+        stats["seconds"] = seconds
+        stats["days_per_second"] = (stats["days"] / seconds
+                                    if seconds > 0 else 0.0)
+    return (new_city, simulated_days)
+
+
+def run_simulation(starting_city, days_contagious, stats=None):
     '''
     Run the entire simulation
 
@@ -135,17 +207,71 @@ def run_simulation(starting_city, days_contagious):
         starting_city (list): the state of all people in the city at the
           start of the simulation
         days_contagious (int): the number of a days a person is infected
+        stats (dict): if given, filled in with timing statistics (see
+          find_end)
 
     Returns tuple (list of tuples, int): the final state of the city
       and the number of days actually simulated.
     '''
 
     simulated_days = 0
-    result = find_end(starting_city, days_contagious, simulated_days)
+    result = find_end(starting_city, days_contagious, simulated_days, stats)
     return result
 
 
-def vaccinate_person(vax_tuple):
+def run_simulation_frontier(starting_city, days_contagious):
+    '''
+    Run the entire simulation, as run_simulation does, tracking only the
+    infection frontier: the susceptible people next to an infected
+    person.  Every one of them is infected the next day, and afterwards
+    only the neighbors of the newly infected can be next to an
+    infected person, so each day costs time proportional to the size
+    of the frontier, not of the city.
+
+    Day counters are not advanced daily.  Instead each person records
+    the day their counter was zero (possibly before the start), and
+    the counters, and the recoveries they imply, are worked out once,
+    at the end.
+
+    Args:
+        starting_city (list): the state of all people in the city at the
+          start of the simulation
+        days_contagious (int): the number of a days a person is infected
+
+    Returns tuple (list of tuples, int): the final state of the city
+      and the number of days actually simulated.
+    '''
+
+    n = len(starting_city)
+    states = [state for state, _ in starting_city]
+    # the day on which each person's counter was (or would have been) 0
+    since = [-days for _, days in starting_city]
+
+    frontier = {i for i in range(n) if states[i] == 'S' and
+                (states[i - 1] == 'I' or states[(i + 1) % n] == 'I')}
+    simulated_days = 0
+    while frontier:
+        simulated_days += 1
+        for i in frontier:
+            states[i] = 'I'
+            since[i] = simulated_days
+        frontier = {j for i in frontier for j in ((i - 1) % n, (i + 1) % n)
+                    if states[j] == 'S'}
+
+    final_city = []
+    for state, zero_day in zip(states, since):
+        if state == 'I' and days_contagious >= 1:
+            # an infected person recovers on the day their counter
+            # reaches days_contagious, if that day has been simulated
+            recovery_day = zero_day + days_contagious
+            if 1 <= recovery_day <= simulated_days:
+                final_city.append(('R', simulated_days - recovery_day))
+                continue
+        final_city.append((state, simulated_days - zero_day))
+    return (final_city, simulated_days)
+
+
+def vaccinate_person(vax_tuple, rng=random):
     '''
     Attempt to vaccinate a single person based on their current
     disease state and personal eagerness to be vaccinated.
@@ -153,6 +279,8 @@ def vaccinate_person(vax_tuple):
     Args:
         vax_tuple (string, int, float): information about a person,
           including their eagerness to be vaccinated.
+        rng: the random number generator to draw from (a random.Random,
+          or by default the random module's global generator)
 
     Returns (string, int): a person tuple
     '''
@@ -160,7 +288,7 @@ def vaccinate_person(vax_tuple):
     if vax_tuple[0] == 'R' or vax_tuple[0] == 'I':
         return (vax_tuple[0], vax_tuple[1])
     else:
-        if vax_tuple[2] > random.random():
+        if vax_tuple[2] > rng.random():
             return ('V', 0)
         else:
             return (vax_tuple[0], vax_tuple[1])
@@ -182,10 +310,13 @@ def vaccinate_city(city_vax_tuples, random_seed):
       city after vaccination
     '''
 
-    random.seed(random_seed)
+    # A generator of its own, seeded as random.seed(random_seed) would
+    # seed the global one, so the draws are the same but concurrent
+    # trials do not share state.
+    rng = random.Random(random_seed)
     vacc_city = []
     for location in city_vax_tuples:
-        vacc_city.append(vaccinate_person(location))
+        vacc_city.append(vaccinate_person(location, rng))
     return vacc_city
 
 
@@ -207,6 +338,81 @@ def vaccinate_and_simulate(city_vax_tuples, days_contagious, random_seed):
     return simulate_city
 
 
+def trial_seeds(random_seed, num_trials):
+    """
+    The seed of each trial: random_seed + i for trial i, or random_seed
+    for every trial if it is 0 or None.
+    """
+
+    if random_seed:
+        return [random_seed + i for i in range(num_trials)]
+    return [random_seed] * num_trials
+
+
+# The city and days_contagious shared by the trials in a worker process
+# (see _init_trial_worker).
+_TRIAL_CITY = None
+
+
+def _init_trial_worker(vax_city, days_contagious):
+    """
+    Give a worker process the city once, instead of with every trial.
+    """
+
+    global _TRIAL_CITY  # pylint: disable=global-statement
+    _TRIAL_CITY = (vax_city, days_contagious)
+
+
+def _run_trial(seed):
+    """
+    Run one trial in a worker process.
+
+    Returns (int): the number of days simulated
+    """
+
+    vax_city, days_contagious = _TRIAL_CITY
+    _, num_days_simulated = vaccinate_and_simulate(vax_city, days_contagious,
+                                                   seed)
+    return num_days_simulated
+
+
+def run_trials_distribution(vax_city, days_contagious, random_seed,
+                            num_trials, workers=1):
+    """
+    Run multiple trials of vaccinate_and_simulate, on a process pool
+    when workers > 1, and collect the number of days until infection
+    transmission stops in each.  Trial i uses the same seed as in
+    run_trials, and each trial draws from its own generator, so the
+    results do not depend on the number of workers.
+
+    Args:
+        vax_city (list of (string, int, float) triples): a list with vax
+            tuples for the people in the city
+        days_contagious (int): the number of days a person is infected
+        random_seed (int): the seed for the random number generator
+        num_trials (int): the number of trial simulations to run
+        workers (int): the number of worker processes
+
+    Returns:
+        (list of ints, int) the number of days in each trial, in order,
+          and their median
+    """
+
+    seeds = trial_seeds(random_seed, num_trials)
+    if workers <= 1:
+        days = [vaccinate_and_simulate(vax_city, days_contagious, seed)[1]
+                for seed in seeds]
+    else:
+        chunksize = max(1, num_trials // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_trial_worker,
+                                 initargs=(vax_city, days_contagious)) as pool:
+            days = list(pool.map(_run_trial, seeds, chunksize=chunksize))
+
+    # quick way to compute the median
+    return days, sorted(days)[num_trials // 2]
+
+
 ################ Do not change the code below this line #######################
 
 def run_trials(vax_city, days_contagious, random_seed, num_trials):
@@ -306,7 +512,10 @@ def parse_city_file(filename, is_vax_tuple):
               type=click.Choice(['no_vax', 'vax']))
 @click.option("--random-seed", default=None, type=int)
 @click.option("--num-trials", default=1, type=int)
-def cmd(filename, days_contagious, task_type, random_seed, num_trials):
+@click.option("--workers", default=1, type=int,
+              help="number of processes to run the trials on")
+def cmd(filename, days_contagious, task_type, random_seed, num_trials,
+        workers):
     '''
     Process the command-line arguments and do the work.
     '''
@@ -328,8 +537,12 @@ def cmd(filename, days_contagious, task_type, random_seed, num_trials):
         print("Days simulated:", num_days_simulated)
     else:
         print("Running multiple trials of the vax clinic and simulation ...")
-        median_num_days = run_trials(city, days_contagious,
-                                     random_seed, num_trials)
+        if workers > 1:
+            _, median_num_days = run_trials_distribution(
+                city, days_contagious, random_seed, num_trials, workers)
+        else:
+            median_num_days = run_trials(city, days_contagious,
+                                         random_seed, num_trials)
         print("Median number of days until infection transmission stops:",
               median_num_days)
     return 0
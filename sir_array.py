@@ -0,0 +1,280 @@
+'''
+Epidemic modelling
+
+Yujing Sun
+
+Array engine for the ring-city simulation in sir.py
+
+The city is stored as two NumPy arrays, a disease state code and a
+days-in-state counter, and each day is computed with whole-array
+operations instead of one advance_person_at_location call per person.
+The results are identical to sir.run_simulation.
+
+It also runs many vaccination trials of a city at once, as rows of
+2-D arrays (trials x people) that advance in lockstep.
+
+Example use:
+    final_city, num_days = sir_array.run_simulation(city, 3)
+    days, median = sir_array.run_trials_batched(vax_city, 3, 20170217, 100)
+'''
+
+import random
+
+import numpy as np
+
+from sir import trial_seeds
+
+# Disease state codes: STATES[code] is the state's letter.
+STATES = "SIRV"
+S, I, R, V = range(len(STATES))
+CODES = {state: code for code, state in enumerate(STATES)}
+
+
+def city_to_arrays(city):
+    '''
+    Convert a city of person tuples into arrays.
+
+    Args:
+        city (list of (string, int) tuples): the state of all people
+
+    Returns (array of int8, array of int64): the disease state codes and
+      the number of days each person has been in their state
+    '''
+    states = np.array([CODES[person[0]] for person in city], dtype=np.int8)
+    days = np.array([person[1] for person in city], dtype=np.int64)
+    return states, days
+
+
+def arrays_to_city(states, days):
+    '''
+    Convert state code and day counter arrays back into person tuples.
+
+    Returns (list of (string, int) tuples): the city
+    '''
+    return [(STATES[code], num_days)
+            for code, num_days in zip(states.tolist(), days.tolist())]
+
+
+def infected_neighbors(states):
+    '''
+    Which people have an infected neighbor in the ring?  A 2-D array
+    holds one city per row.
+
+    Args:
+        states (array of int8): the disease state codes
+
+    Returns (array of bools)
+    '''
+    infected = states == I
+    return np.roll(infected, 1, axis=-1) | np.roll(infected, -1, axis=-1)
+
+
+def is_transmission_possible(states):
+    '''
+    Is there at least one susceptible person who has an infected
+    neighbor?
+
+    Args:
+        states (array of int8): the disease state codes
+
+    Returns (boolean)
+    '''
+    return bool(((states == S) & infected_neighbors(states)).any())
+
+
+def transmission_possible_rows(states):
+    '''
+    Is transmission possible in each city of a 2-D array?
+
+    Args:
+        states (2-D array of int8): the disease state codes, one city per
+          row
+
+    Returns (array of bools): one per row
+    '''
+    return ((states == S) & infected_neighbors(states)).any(axis=1)
+
+
+def simulate_one_day(states, days, days_contagious):
+    '''
+    Move the simulation forward a single day, as sir.simulate_one_day
+    does: susceptible people with an infected neighbor become infected,
+    infected people whose counter reaches days_contagious recover, and
+    everyone else's counter goes up by one (including infected people
+    already past days_contagious, who stay infected, as in sir.py).
+
+    Args:
+        states (array of int8): the disease state codes at the start of
+          the day (a 2-D array holds one city per row)
+        days (array of int64): the days-in-state counters at the start
+          of the day
+        days_contagious (int): the number of a days a person is infected
+
+    Returns (array of int8, array of int64): the state codes and counters
+      after one day
+    '''
+    newly_infected = (states == S) & infected_neighbors(states)
+    days = days + 1
+    recovered = (states == I) & (days == days_contagious)
+    states = states.copy()
+    states[newly_infected] = I
+    states[recovered] = R
+    days[newly_infected | recovered] = 0
+    return states, days
+
+
+def run_simulation_arrays(states, days, days_contagious):
+    '''
+    Simulate days until no transmission is possible.
+
+    Args:
+        states (array of int8): the disease state codes
+        days (array of int64): the days-in-state counters
+        days_contagious (int): the number of a days a person is infected
+
+    Returns (array of int8, array of int64, int): the final state codes
+      and counters and the number of days simulated
+    '''
+    simulated_days = 0
+    while is_transmission_possible(states):
+        states, days = simulate_one_day(states, days, days_contagious)
+        simulated_days += 1
+    return states, days, simulated_days
+
+
+def run_simulation(starting_city, days_contagious):
+    '''
+    Run the entire simulation, as sir.run_simulation does.
+
+    Args:
+        starting_city (list): the state of all people in the city at the
+          start of the simulation
+        days_contagious (int): the number of a days a person is infected
+
+    Returns tuple (list of tuples, int): the final state of the city
+      and the number of days actually simulated.
+    '''
+    states, days = city_to_arrays(starting_city)
+    states, days, simulated_days = run_simulation_arrays(states, days,
+                                                         days_contagious)
+    return arrays_to_city(states, days), simulated_days
+
+
+def vaccinate_trials(vax_city, seeds, generator="compat"):
+    '''
+    Vaccinate one copy of the city per seed, as sir.vaccinate_city
+    does: each susceptible or vaccinated person is vaccinated when their
+    eagerness exceeds a uniform draw.  The draws are one comparison of
+    the eagerness against a (trials, people) matrix of uniforms.
+
+    Args:
+        vax_city (list of (string, int, float) triples): the city
+        seeds (list of ints): the seed of each trial
+        generator (str): "compat" draws trial i's uniforms from
+          random.Random(seeds[i]), in the order sir.vaccinate_city draws
+          them, so the cities match it exactly; "numpy" draws trial i's
+          row from numpy.random.default_rng(seeds[i]) in one call, which
+          is faster but a different sample (numpy only takes non-negative
+          seeds, so negative seeds are used as their absolute values, as
+          random.seed does).  Either way a trial's city depends only on
+          its own seed.
+
+    Returns (2-D array of int8, 2-D array of int64): the disease state
+      codes and day counters, one trial per row
+    '''
+    states, days = city_to_arrays([(state, num_days)
+                                   for state, num_days, _ in vax_city])
+    eagerness = np.array([ve for _, _, ve in vax_city], dtype=np.float64)
+    # sir.vaccinate_person draws for everyone who is not I or R
+    eligible = np.flatnonzero((states == S) | (states == V))
+    num_trials = len(seeds)
+    if generator == "numpy":
+        uniforms = np.empty((num_trials, len(eligible)))
+        for row, seed in enumerate(seeds):
+            rng = np.random.default_rng(None if seed is None else abs(seed))
+            uniforms[row] = rng.random(len(eligible))
+    elif generator == "compat":
+        uniforms = np.empty((num_trials, len(eligible)))
+        for row, seed in enumerate(seeds):
+            draw = random.Random(seed).random
+            uniforms[row] = [draw() for _ in range(len(eligible))]
+    else:
+        raise ValueError("Unknown generator: {}".format(generator))
+    vaccinated = np.zeros((num_trials, len(states)), dtype=bool)
+    vaccinated[:, eligible] = eagerness[eligible] > uniforms
+    trial_states = np.repeat(states[np.newaxis, :], num_trials, axis=0)
+    trial_days = np.repeat(days[np.newaxis, :], num_trials, axis=0)
+    trial_states[vaccinated] = V
+    trial_days[vaccinated] = 0
+    return trial_states, trial_days
+
+
+def run_simulation_rows(states, days, days_contagious):
+    '''
+    Simulate every city of a 2-D array until no transmission is possible
+    in it.  The cities advance in lockstep; a city that has finished is
+    dropped from the arrays, so later days only touch the cities still
+    running.
+
+    Args:
+        states (2-D array of int8): the disease state codes, one city per
+          row
+        days (2-D array of int64): the day counters
+        days_contagious (int): the number of a days a person is infected
+
+    Returns (2-D array of int8, 2-D array of int64, array of ints): the
+      final state codes and counters and the number of days simulated
+      in each city
+    '''
+    final_states = np.empty_like(states)
+    final_days = np.empty_like(days)
+    simulated_days = np.zeros(len(states), dtype=np.int64)
+    rows = np.arange(len(states))
+    day = 0
+    while len(rows):
+        running = transmission_possible_rows(states)
+        if not running.all():
+            done = ~running
+            final_states[rows[done]] = states[done]
+            final_days[rows[done]] = days[done]
+            simulated_days[rows[done]] = day
+            states, days, rows = states[running], days[running], rows[running]
+            if not len(rows):
+                break
+        states, days = simulate_one_day(states, days, days_contagious)
+        day += 1
+    return final_states, final_days, simulated_days
+
+
+def run_trials_batched(vax_city, days_contagious, random_seed, num_trials,
+                       generator="compat", max_cells=1 << 24):
+    '''
+    Run num_trials trials of sir.vaccinate_and_simulate as 2-D arrays
+    (see vaccinate_trials and run_simulation_rows), with the seeds of
+    sir.run_trials.  With the "compat" generator the results are the
+    same as sir.run_trials_distribution.
+
+    Args:
+        vax_city (list of (string, int, float) triples): the city
+        days_contagious (int): the number of days a person is infected
+        random_seed (int): the seed for the random number generator
+        num_trials (int): the number of trial simulations to run
+        generator (str): "compat" or "numpy" (see vaccinate_trials)
+        max_cells (int): the trials are run in batches of at most this
+          many trials x people, to bound memory
+
+    Returns:
+        (list of ints, int) the number of days in each trial, in order,
+          and their median
+    '''
+    seeds = trial_seeds(random_seed, num_trials)
+    batch = max(1, max_cells // max(1, len(vax_city)))
+    days = []
+    for start in range(0, num_trials, batch):
+        states, counters = vaccinate_trials(vax_city,
+                                            seeds[start:start + batch],
+                                            generator)
+        _, _, simulated_days = run_simulation_rows(states, counters,
+                                                   days_contagious)
+        days.extend(simulated_days.tolist())
+    return days, sorted(days)[num_trials // 2]
@@ -0,0 +1,118 @@
+'''
+Tests for analyze: the counting, tokenizing and scoring functions must
+give the same results as the original list-based implementations.
+'''
+
+import random
+
+import pytest
+
+import analyze
+import basic_algorithms
+
+WORDS = ["Vote", "vote", "VOTE!", "the", "The", "a", "rt", "election,",
+         "“Election”", "#Election2016", "@CNN", "http://t.co/x", "&amp;",
+         "...", "—", "Trump's", "Clinton.", "(polls)", "today!!", "é-té",
+         "America", "¿qué?", "with", "...and", "ok"]
+ENTITY_DESCS = [("hashtags", "text", True), ("hashtags", "text", False),
+                ("user_mentions", "screen_name", False)]
+
+
+def original_pre_process(tweet, case_sensitive, remove_stop_words):
+    '''The original pre_process: strip PUNCTUATION from every word'''
+    punctuation = analyze.get_punctuation()
+    words = []
+    for w in tweet['abridged_text'].split():
+        w = w.strip(punctuation)
+        if w and not w.startswith(analyze.STOP_PREFIXES) and \
+           not (remove_stop_words and w in analyze.STOP_WORDS):
+            words.append(w if case_sensitive else w.lower())
+    return words
+
+
+def original_ngrams(tweets, n, case_sensitive, remove_stop_words=True):
+    '''The n-grams of each tweet, as the original functions built them'''
+    return [analyze.n_grams(original_pre_process(tweet, case_sensitive,
+                                                 remove_stop_words), n)
+            for tweet in tweets]
+
+
+def random_tweets(rng, num_tweets):
+    '''Tweets of random words and entities'''
+    tags = ["Vote", "vote", "MAGA", "ImWithHer", "Debate"]
+    return [{"abridged_text": " ".join(rng.choice(WORDS)
+                                       for _ in range(rng.randrange(0, 15))),
+             "entities": {
+                 "hashtags": [{"text": rng.choice(tags)}
+                              for _ in range(rng.randrange(3))],
+                 "user_mentions": [{"screen_name": rng.choice(tags)}
+                                   for _ in range(rng.randrange(2))]}}
+            for _ in range(num_tweets)]
+
+
+@pytest.mark.parametrize("case_sensitive", [True, False])
+@pytest.mark.parametrize("remove_stop_words", [True, False])
+def test_pre_process_matches_original(case_sensitive, remove_stop_words):
+    tweets = random_tweets(random.Random(0), 200)
+    for tweet in tweets:
+        assert analyze.pre_process(tweet, case_sensitive, remove_stop_words) \
+            == original_pre_process(tweet, case_sensitive, remove_stop_words)
+
+
+def test_punctuation_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANALYZE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(analyze, "_PUNCTUATION", None)
+    built = analyze.build_punctuation()
+    assert analyze.get_punctuation() == built
+    assert list(tmp_path.iterdir())
+    monkeypatch.setattr(analyze, "_PUNCTUATION", None)
+    assert analyze.PUNCTUATION == built
+
+
+@pytest.mark.parametrize("entity_desc", ENTITY_DESCS)
+def test_entities_match_original(entity_desc):
+    tweets = random_tweets(random.Random(1), 100)
+    entities = analyze.combine_tweets(tweets, entity_desc)
+    for k in [0, 1, 3, 10]:
+        assert analyze.find_top_k_entities(tweets, entity_desc, k) \
+            == basic_algorithms.find_top_k(entities, k, "sort")
+    for min_count in [0, 1, 5, 30]:
+        assert analyze.find_min_count_entities(tweets, entity_desc,
+                                               min_count) \
+            == basic_algorithms.find_min_count(entities, min_count)
+
+
+@pytest.mark.parametrize("n", [1, 2, 3])
+@pytest.mark.parametrize("case_sensitive", [True, False])
+@pytest.mark.parametrize("options", [{}, {"encoded": True},
+                                     {"workers": 2, "chunk_size": 7},
+                                     {"workers": 2, "encoded": True}],
+                         ids=["plain", "encoded", "workers", "both"])
+def test_ngrams_match_original(n, case_sensitive, options):
+    tweets = random_tweets(random.Random(n), 60)
+    grams = [gram for grams in original_ngrams(tweets, n, case_sensitive)
+             for gram in grams]
+    counts = basic_algorithms.count_tokens(grams)
+    assert analyze.count_ngrams(tweets, n, case_sensitive, **options) \
+        == counts
+    for k in [0, 1, 5, 50]:
+        assert analyze.find_top_k_ngrams(tweets, n, case_sensitive, k,
+                                         **options) \
+            == basic_algorithms.find_top_k(grams, k, "sort")
+    for min_count in [1, 3, 10]:
+        assert analyze.find_min_count_ngrams(tweets, n, case_sensitive,
+                                             min_count, **options) \
+            == basic_algorithms.find_min_count(grams, min_count)
+
+
+@pytest.mark.parametrize("n", [1, 2])
+@pytest.mark.parametrize("batched", [False, True])
+def test_salient_ngrams_match_original(n, batched):
+    tweets = random_tweets(random.Random(n), 80)
+    docs = original_ngrams(tweets, n, False, remove_stop_words=False)
+    for threshold in [0.0, 0.5, 1.5, 3.0]:
+        scores = basic_algorithms.tf_idf(docs)
+        expected = [{gram for gram, score in doc.items() if score > threshold}
+                    for doc in scores]
+        assert analyze.find_salient_ngrams(tweets, n, False, threshold,
+                                           batched) == expected
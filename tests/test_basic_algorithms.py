@@ -0,0 +1,131 @@
+'''
+Tests for basic_algorithms: the fast paths must give the same results as
+the original sort-based implementations.
+'''
+
+import math
+import random
+
+import pytest
+
+import basic_algorithms
+from basic_algorithms import SpaceSaving
+
+
+def original_idf(docs):
+    '''The original idf: one scan of the corpus per distinct token'''
+    idf = {}
+    for t in set().union(*map(set, docs)):
+        df = sum(1 for doc in docs if t in set(doc))
+        idf[t] = math.log(len(docs) / df)
+    return idf
+
+
+def original_tf_idf(docs):
+    '''The original tf_idf'''
+    idf = original_idf(docs)
+    result = []
+    for doc in docs:
+        counts = basic_algorithms.count_tokens(doc)
+        if not doc:
+            result.append({})
+            continue
+        max_doc = counts[basic_algorithms.find_top_k(doc, 1, "sort")[0]]
+        result.append({t: (0.5 + 0.5 * c / max_doc) * idf[t]
+                       for t, c in counts.items()})
+    return result
+
+
+def random_docs(rng, num_docs):
+    '''Documents of skewed tokens, some of them empty'''
+    return [[rng.choice("abcdefghij"[:rng.randrange(1, 11)])
+             for _ in range(rng.randrange(0, 15))]
+            for _ in range(num_docs)]
+
+
+def random_tokens(rng, num_tokens, num_distinct):
+    '''Tokens with a skewed distribution'''
+    return [rng.randrange(num_distinct) ** 2 % 97
+            for _ in range(num_tokens)]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_heap_top_k_matches_sort(seed):
+    rng = random.Random(seed)
+    tokens = [str(t) for t in random_tokens(rng, 300, 40)]
+    for k in [0, 1, 3, 10, 100]:
+        assert basic_algorithms.find_top_k(tokens, k) \
+            == basic_algorithms.find_top_k(tokens, k, "sort")
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_approx_top_k_error_bound(seed):
+    rng = random.Random(seed)
+    tokens = random_tokens(rng, 2000, 200)
+    counts = basic_algorithms.count_tokens(tokens)
+    sketch = SpaceSaving(20)
+    sketch.update(tokens)
+    bound = len(tokens) / 20
+    for token, count in counts.items():
+        if token in sketch._counts:  # pylint: disable=protected-access
+            assert count <= sketch.count(token) <= count + bound
+            assert sketch.count(token) - sketch.error(token) <= count
+        else:
+            assert count <= bound
+
+
+def test_approx_top_k_exact_with_room():
+    tokens = list("aabbbcddddd")
+    assert basic_algorithms.find_top_k(tokens, 2, "approx") \
+        == basic_algorithms.find_top_k(tokens, 2, "sort")
+
+
+@pytest.mark.parametrize("epsilon", [0, -1, 1.5])
+def test_epsilon_out_of_range(epsilon):
+    with pytest.raises(ValueError):
+        basic_algorithms.find_top_k(list("aabbc"), 2, "approx",
+                                    epsilon=epsilon)
+    # the exact methods never use epsilon
+    assert basic_algorithms.find_top_k(list("aabbc"), 2, "heap",
+                                       epsilon=epsilon) == ["a", "b"]
+
+
+def test_negative_k():
+    with pytest.raises(ValueError):
+        basic_algorithms.find_top_k(list("aabbc"), -1)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_tf_idf_matches_original(seed):
+    rng = random.Random(seed)
+    docs = random_docs(rng, rng.randrange(1, 30))
+    expected = original_tf_idf(docs)
+    assert basic_algorithms.idf(docs) == original_idf(docs)
+    assert basic_algorithms.tf_idf(docs) == expected
+    # thresholds at, between and around the actual scores
+    scores = sorted({v for doc in expected for v in doc.values()})
+    for threshold in [-1.0, 0.0] + scores[::3] + [max(scores, default=0) + 1]:
+        salient = [{t for t, v in doc.items() if v > threshold}
+                   for doc in expected]
+        assert basic_algorithms.find_salient(docs, threshold) == salient
+        assert basic_algorithms.find_salient_batched(docs, threshold) \
+            == salient
+
+
+def test_tf_idf_index_grows_one_doc_at_a_time():
+    rng = random.Random(3)
+    docs = random_docs(rng, 25)
+    index = basic_algorithms.TfIdfIndex()
+    for i, doc in enumerate(docs):
+        index.add_doc(doc)
+        assert [index.tf_idf(d) for d in range(len(index))] \
+            == original_tf_idf(docs[:i + 1])
+
+
+
+def test_merge_counts():
+    rng = random.Random(4)
+    chunks = [random_tokens(rng, rng.randrange(50), 30) for _ in range(7)]
+    assert basic_algorithms.merge_counts(
+        [basic_algorithms.count_tokens(c) for c in chunks]) \
+        == basic_algorithms.count_tokens([t for c in chunks for t in c])
@@ -0,0 +1,93 @@
+'''
+Tests for ngram_index: the stored counts must answer queries as
+analyze does on the same tweets, and each file must be counted once.
+'''
+
+import json
+import os
+import random
+
+import pytest
+
+# pylint: disable=protected-access
+
+import analyze
+from ngram_index import NGramIndex
+
+WORDS = ["Vote", "vote", "the", "election", "#Election2016", "Trump",
+         "Clinton", "polls", "close", "today!", "@CNN", "America"]
+
+
+def random_tweets(rng, num_tweets):
+    '''Tweets of random words'''
+    return [{"abridged_text": " ".join(rng.choice(WORDS)
+                                       for _ in range(rng.randrange(1, 12)))}
+            for _ in range(num_tweets)]
+
+
+def write_tweets(path, tweets):
+    '''Write tweets as a JSON array and return the file name'''
+    path.write_text(json.dumps(tweets))
+    return str(path)
+
+
+@pytest.mark.parametrize("n,case_sensitive", [(1, False), (2, True),
+                                              (3, False)])
+def test_queries_match_analyze(tmp_path, n, case_sensitive):
+    rng = random.Random(n)
+    files = [random_tweets(rng, 30) for _ in range(3)]
+    everything = [tweet for tweets in files for tweet in tweets]
+    with NGramIndex(str(tmp_path / "index.db"), n, case_sensitive) as index:
+        for i, tweets in enumerate(files):
+            assert index.add_file(write_tweets(tmp_path / f"{i}.json",
+                                               tweets))
+        for k in [1, 5, 20]:
+            assert index.find_top_k(k) == analyze.find_top_k_ngrams(
+                everything, n, case_sensitive, k)
+        for min_count in [1, 3, 10]:
+            assert index.find_min_count(min_count) \
+                == analyze.find_min_count_ngrams(everything, n,
+                                                 case_sensitive, min_count)
+
+
+def test_file_counted_once(tmp_path):
+    rng = random.Random(1)
+    filename = write_tweets(tmp_path / "a.json", random_tweets(rng, 20))
+    db = str(tmp_path / "index.db")
+    with NGramIndex(db, 2, False) as index:
+        assert index.add_file(filename)
+        before = index._counts_at_least(1)
+        assert not index.add_file(filename)
+    with NGramIndex(db, 2, False) as index:
+        assert not index.add_file(filename)
+        assert index._counts_at_least(1) == before
+
+
+def test_changed_file_raises(tmp_path):
+    rng = random.Random(2)
+    path = tmp_path / "a.json"
+    filename = write_tweets(path, random_tweets(rng, 20))
+    with NGramIndex(str(tmp_path / "index.db"), 1, False) as index:
+        index.add_file(filename)
+        assert not index.file_changed(filename)
+        write_tweets(path, random_tweets(rng, 25))
+        stat = os.stat(filename)
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert index.file_changed(filename)
+        with pytest.raises(ValueError):
+            index.add_file(filename)
+
+
+def test_concurrent_duplicate_add(tmp_path, monkeypatch):
+    rng = random.Random(3)
+    filename = write_tweets(tmp_path / "a.json", random_tweets(rng, 20))
+    db = str(tmp_path / "index.db")
+    with NGramIndex(db, 1, False) as first, \
+            NGramIndex(db, 1, False) as second:
+        # second checks for the file before first has recorded it
+        monkeypatch.setattr(second, "has_file", lambda filename: False)
+        monkeypatch.setattr(second, "file_changed", lambda filename: False)
+        assert first.add_file(filename)
+        counts = first._counts_at_least(1)
+        assert not second.add_file(filename)
+        assert second._counts_at_least(1) == counts
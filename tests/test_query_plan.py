@@ -0,0 +1,57 @@
+'''
+Tests for query_plan: the single-pass plan must answer every query as the
+analyze functions do.
+'''
+
+import random
+
+import pytest
+
+import analyze
+from query_plan import TweetAnalysisPlan
+from test_analyze import ENTITY_DESCS, random_tweets
+
+NGRAM_SPECS = [(1, True), (1, False), (2, False), (3, True)]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_plan_matches_analyze(seed):
+    tweets = random_tweets(random.Random(seed), 120)
+    plan = TweetAnalysisPlan()
+    expected = {}
+    for desc in ENTITY_DESCS:
+        name = plan.add_top_k_entities(desc, 3)
+        expected[name] = analyze.find_top_k_entities(tweets, desc, 3)
+        name = plan.add_min_count_entities(desc, 10)
+        expected[name] = analyze.find_min_count_entities(tweets, desc, 10)
+    for n, case_sensitive in NGRAM_SPECS:
+        name = plan.add_top_k_ngrams(n, case_sensitive, 5)
+        expected[name] = analyze.find_top_k_ngrams(tweets, n,
+                                                   case_sensitive, 5)
+        name = plan.add_min_count_ngrams(n, case_sensitive, 4)
+        expected[name] = analyze.find_min_count_ngrams(tweets, n,
+                                                       case_sensitive, 4)
+        name = plan.add_salient_ngrams(n, case_sensitive, 1.2)
+        expected[name] = analyze.find_salient_ngrams(tweets, n,
+                                                     case_sensitive, 1.2)
+    result = plan.run(iter(tweets))
+    assert result.num_tweets == len(tweets)
+    assert result.results == expected
+
+
+def test_plan_projection_keeps_what_it_reads():
+    tweets = random_tweets(random.Random(5), 50)
+    plan = TweetAnalysisPlan()
+    plan.add_top_k_entities(ENTITY_DESCS[2], 3, name="mentions")
+    plan.add_top_k_ngrams(2, False, 3, name="bigrams")
+    projection = plan.projection()
+    assert plan.run(map(projection, tweets)).results \
+        == plan.run(tweets).results
+
+
+def test_duplicate_name():
+    plan = TweetAnalysisPlan()
+    plan.add_top_k_ngrams(1, False, 3, name="x")
+    with pytest.raises(ValueError):
+        plan.add_top_k_ngrams(2, False, 3, name="x")
+
@@ -0,0 +1,201 @@
+'''
+Tests for simulate: the voters and simulations must match the original
+random.seed + util.gen_voter_parameters implementation.
+'''
+
+import random
+
+import pytest
+import util
+from click.testing import CliRunner
+
+import simulate
+from simulate import Precinct
+from simulation_metrics import SimulationMetrics
+
+PRECINCTS = [Precinct("A", 1, 20, 0.3, 0.1, 0.0),
+             Precinct("B", 2, 100, 0.8, 0.05, 0.5),
+             Precinct("C", 13, 500, 0.11, 0.1, 0.2),
+             Precinct("D", 1, 1000, 5.0, 0.3, 1.0)]
+SEEDS = [0, 1, 1468604453, 2**40 + 7, -5]
+
+
+def original_voters(precinct, seed):
+    '''
+    The (arrival time, voting duration, is impatient) triples of the
+    voters, drawn as the original Precinct.__generate_voters drew them.
+    '''
+    random.seed(seed)
+    arrival_time = 0
+    voters = []
+    for _ in range(precinct.num_voters):
+        gap, voting_duration, is_impatient = util.gen_voter_parameters(
+            precinct.arrival_rate, precinct.voting_duration_rate,
+            precinct.impatience_prob)
+        arrival_time = arrival_time + gap
+        if arrival_time < precinct.hours_open * 60:
+            voters.append((arrival_time, voting_duration, is_impatient))
+    return voters
+
+
+@pytest.mark.parametrize("precinct", PRECINCTS, ids=lambda p: p.name)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_compat_voters_match_gen_voter_parameters(precinct, seed):
+    columns = precinct.generate_voter_columns(seed)
+    assert list(zip(columns.arrival_time.tolist(),
+                    columns.voting_duration.tolist(),
+                    columns.is_impatient.tolist())) \
+        == original_voters(precinct, seed)
+
+
+def test_compat_voters_leave_global_generator_alone():
+    random.seed(17)
+    expected = random.random()
+    random.seed(17)
+    PRECINCTS[1].generate_voter_columns(3)
+    assert random.random() == expected
+
+
+@pytest.mark.parametrize("precinct", PRECINCTS, ids=lambda p: p.name)
+def test_numpy_voters(precinct):
+    a = precinct.generate_voter_columns(11, "numpy")
+    b = precinct.generate_voter_columns(11, "numpy")
+    assert a.arrival_time.tolist() == b.arrival_time.tolist()
+    assert len(a) <= precinct.num_voters
+    assert (a.arrival_time < precinct.hours_open * 60).all()
+    assert (a.arrival_time[1:] >= a.arrival_time[:-1]).all()
+
+
+def test_numpy_voters_negative_seed():
+    precinct = PRECINCTS[1]
+    negative = precinct.generate_voter_columns(-5, "numpy")
+    positive = precinct.generate_voter_columns(5, "numpy")
+    assert negative.arrival_time.tolist() == positive.arrival_time.tolist()
+
+
+def test_unknown_generator():
+    with pytest.raises(ValueError):
+        PRECINCTS[0].generate_voter_columns(1, "other")
+
+
+SEARCH_PRECINCTS = [Precinct("E", 1, 40, 0.5, 0.1, 0.3),
+                    Precinct("F", 2, 80, 0.6, 0.08, 0.6)]
+
+
+@pytest.mark.parametrize("precinct", SEARCH_PRECINCTS, ids=lambda p: p.name)
+def test_booths_sweep_matches_step_search(precinct):
+    thresholds = [0, 3, 10, 25]
+    simulate.clear_voter_trace_cache()
+    sweep = simulate.find_voting_booths_sweep(7, precinct, thresholds, 5)
+    assert sweep == {threshold: simulate.find_voting_booths_needed(
+        7, precinct, threshold, 5, "step") for threshold in thresholds}
+
+
+def test_clear_voter_trace_cache():
+    precinct = SEARCH_PRECINCTS[0]
+    trace = simulate.voter_trace(precinct, 3)
+    assert simulate.voter_trace(precinct, 3) is trace
+    simulate.clear_voter_trace_cache()
+    assert simulate.voter_trace(precinct, 3) is not trace
+
+
+def original_simulate(precinct, seed, num_booths, impatience_threshold):
+    '''
+    The original Precinct.simulate, on the original voters.
+
+    Returns: list of (start time, departure time, has voted) triples
+    '''
+    voters = [simulate.Voter(*params)
+              for params in original_voters(precinct, seed)]
+    booths = simulate.VotingBooths(num_booths)
+    for voter in voters:
+        if booths.is_booth_available():
+            voter.vote(voter.arrival_time)
+            booths.enter_booth(voter)
+        else:
+            start = max(voter.arrival_time, booths.time_next_free())
+            if not voter.is_impatient or \
+               start - voter.arrival_time <= impatience_threshold:
+                booths.exit_booth()
+                voter.vote(start)
+                booths.enter_booth(voter)
+    return [(v.start_time, v.departure_time, v.has_voted) for v in voters]
+
+
+@pytest.mark.parametrize("precinct", PRECINCTS + SEARCH_PRECINCTS,
+                         ids=lambda p: p.name)
+@pytest.mark.parametrize("num_booths,impatience_threshold",
+                         [(1, 0), (1, 5), (2, 1), (3, 20)])
+def test_simulate_matches_original(precinct, num_booths,
+                                   impatience_threshold):
+    for seed in [1, 99]:
+        expected = original_simulate(precinct, seed, num_booths,
+                                     impatience_threshold)
+        voters = precinct.simulate(seed, simulate.VotingBooths(num_booths),
+                                   impatience_threshold)
+        assert [(v.start_time, v.departure_time, v.has_voted)
+                for v in voters] == expected
+        columns = precinct.simulate_columnar(seed, num_booths,
+                                             impatience_threshold)
+        assert [(v.start_time, v.departure_time, v.has_voted)
+                for v in columns.to_voters()] == expected
+
+
+@pytest.mark.parametrize("precinct", SEARCH_PRECINCTS, ids=lambda p: p.name)
+@pytest.mark.parametrize("seed", [1, 17, 250])
+def test_bisect_matches_step(precinct, seed):
+    for num_booths in [1, 2, 3]:
+        booths = simulate.VotingBooths(num_booths)
+        assert simulate.find_patience_threshold_single_trial(
+            seed, precinct, booths, "bisect") \
+            == simulate.find_patience_threshold_single_trial(
+                seed, precinct, booths, "step")
+    for threshold in [0, 2, 15]:
+        assert simulate.find_voting_booths_single_trial(
+            seed, precinct, threshold, "bisect") \
+            == simulate.find_voting_booths_single_trial(
+                seed, precinct, threshold, "step")
+
+
+def test_find_smallest():
+    for answer in range(0, 40):
+        for first in range(0, answer + 1):
+            def passes(i):
+                return i >= answer  # pylint: disable=cell-var-from-loop
+            assert simulate.find_smallest(first, passes) == answer
+            assert simulate.find_smallest(first, passes, answer + 3) == answer
+
+
+@pytest.mark.parametrize("search", ["step", "bisect"])
+def test_workers_match_serial(search):
+    precinct = SEARCH_PRECINCTS[1]
+    assert simulate.impatience_threshold_trials(3, precinct, 2, 6, search,
+                                                workers=2) \
+        == simulate.impatience_threshold_trials(3, precinct, 2, 6, search)
+    assert simulate.voting_booths_trials(3, precinct, 5, 6, search,
+                                         workers=2) \
+        == simulate.voting_booths_trials(3, precinct, 5, 6, search)
+
+
+def test_metrics_do_not_change_results():
+    precinct = PRECINCTS[2]
+    plain = precinct.simulate(5, simulate.VotingBooths(2), 10)
+    metrics = SimulationMetrics()
+    measured = precinct.simulate(5, simulate.VotingBooths(2), 10, metrics)
+    assert [(v.start_time, v.has_voted) for v in measured] \
+        == [(v.start_time, v.has_voted) for v in plain]
+    assert metrics.num_voters == len(plain)
+    assert metrics.num_voted == sum(v.has_voted for v in plain)
+
+
+@pytest.mark.parametrize("search_flag", ["--find-threshold",
+                                         "--find-num-booths"])
+def test_metrics_output_needs_single_simulation(tmp_path, search_flag):
+    precinct_file = tmp_path / "precinct.json"
+    precinct_file.write_text("{}")
+    result = CliRunner().invoke(simulate.cmd, [
+        str(precinct_file), search_flag,
+        "--metrics-output", str(tmp_path / "metrics.json")])
+    assert result.exit_code == 2
+    assert "--metrics-output" in result.output
+    assert not (tmp_path / "metrics.json").exists()
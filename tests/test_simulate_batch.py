@@ -0,0 +1,199 @@
+'''
+Tests for simulate_batch: every precinct file must give the same rows as
+simulating it on its own, in every output format and on any number of
+workers.
+'''
+
+import csv
+import json
+import math
+
+import pytest
+from click.testing import CliRunner
+
+import simulate_batch
+from simulate import Precinct, VotingBooths
+from simulate_batch import PRECINCT_COLUMNS, VOTER_COLUMNS
+
+PRECINCTS = [(Precinct("North", 1, 40, 0.8, 0.1, 0.5), 11),
+             (Precinct("South", 2, 100, 0.9, 0.08, 0.0), 250),
+             (Precinct("East", 1, 30, 2.0, 0.05, 1.0), -3)]
+
+
+def write_precincts(directory):
+    '''
+    Write one precinct file per precinct, in the format util.load_precinct
+    reads.
+
+    Returns: list of str, the files in name order
+    '''
+    filenames = []
+    for i, (precinct, seed) in enumerate(PRECINCTS):
+        path = directory / "precinct-{}.json".format(i)
+        path.write_text(json.dumps({
+            "seed": seed,
+            "precinct": {"name": precinct.name,
+                         "hours_open": precinct.hours_open,
+                         "num_voters": precinct.num_voters,
+                         "arrival_rate": precinct.arrival_rate,
+                         "voting_duration_rate":
+                             precinct.voting_duration_rate,
+                         "impatience_prob": precinct.impatience_prob}}))
+        filenames.append(str(path))
+    return filenames
+
+
+def expected_rows(filenames, num_booths, impatience_threshold):
+    '''
+    The precinct and voter rows, from simulating each precinct with
+    Precinct.simulate.
+
+    Returns: (list of dicts, list of dicts)
+    '''
+    precinct_rows = []
+    voter_rows = []
+    for filename, (precinct, seed) in zip(filenames, PRECINCTS):
+        voters = precinct.simulate(seed, VotingBooths(num_booths),
+                                   impatience_threshold)
+        waits = [v.start_time - v.arrival_time for v in voters
+                 if v.has_voted]
+        departures = [v.departure_time for v in voters if v.has_voted]
+        precinct_rows.append({
+            "file": filename, "precinct": precinct.name,
+            "hours_open": precinct.hours_open,
+            "num_voters": precinct.num_voters,
+            "num_booths": num_booths,
+            "impatience_threshold": impatience_threshold,
+            "voters_arrived": len(voters),
+            "voters_voted": len(waits),
+            "voters_turned_away": len(voters) - len(waits),
+            "mean_wait": sum(waits) / len(waits) if waits else math.nan,
+            "max_wait": max(waits, default=math.nan),
+            "last_departure": max(departures, default=math.nan)})
+        for i, v in enumerate(voters):
+            voter_rows.append({
+                "file": filename, "precinct": precinct.name, "voter": i,
+                "arrival_time": v.arrival_time,
+                "voting_duration": v.voting_duration,
+                "is_impatient": v.is_impatient,
+                "start_time": (v.start_time if v.has_voted else math.nan),
+                "departure_time": (v.departure_time if v.has_voted
+                                   else math.nan),
+                "has_voted": v.has_voted})
+    return precinct_rows, voter_rows
+
+
+def read_csv(filename, columns):
+    '''
+    Read a CSV file written by CsvSink, converting each column back to
+    its type.
+
+    Returns: list of dicts
+    '''
+    convert = {"str": str, "int": int, "float": float,
+               "bool": lambda s: s == "True"}
+    with open(filename, newline="") as f:
+        reader = csv.DictReader(f)
+        assert reader.fieldnames == [name for name, _ in columns]
+        return [{name: convert[kind](row[name]) for name, kind in columns}
+                for row in reader]
+
+
+def without_nan(rows):
+    '''
+    Replace the NaNs in rows with None, so that rows compare equal.
+    '''
+    return [{name: (None if isinstance(value, float) and math.isnan(value)
+                    else value)
+             for name, value in row.items()} for row in rows]
+
+
+def check_rows(actual, expected):
+    '''
+    Compare rows, with the numbers up to rounding.
+    '''
+    assert len(actual) == len(expected)
+    for row, expected_row in zip(without_nan(actual), without_nan(expected)):
+        assert row == pytest.approx(expected_row)
+
+
+def run_batch(filenames, precinct_file, voter_file, fmt=None, workers=1):
+    '''
+    Simulate the precinct files with 2 booths and a threshold of 5.
+    '''
+    precinct_sink = simulate_batch.open_sink(precinct_file, PRECINCT_COLUMNS,
+                                             fmt)
+    voter_sink = simulate_batch.open_sink(voter_file, VOTER_COLUMNS, fmt)
+    try:
+        num_precincts = simulate_batch.simulate_batch(
+            filenames, precinct_sink, voter_sink, num_booths=2,
+            impatience_threshold=5.0, workers=workers)
+    finally:
+        precinct_sink.close()
+        voter_sink.close()
+    assert num_precincts == len(filenames)
+
+
+def test_csv_round_trip(tmp_path):
+    filenames = write_precincts(tmp_path)
+    run_batch(filenames, str(tmp_path / "precincts.csv"),
+              str(tmp_path / "voters.csv"))
+    precinct_rows, voter_rows = expected_rows(filenames, 2, 5.0)
+    check_rows(read_csv(tmp_path / "precincts.csv", PRECINCT_COLUMNS),
+               precinct_rows)
+    check_rows(read_csv(tmp_path / "voters.csv", VOTER_COLUMNS), voter_rows)
+
+
+def test_parquet_round_trip(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    filenames = write_precincts(tmp_path)
+    run_batch(filenames, str(tmp_path / "precincts.parquet"),
+              str(tmp_path / "voters.pq"))
+    precinct_rows, voter_rows = expected_rows(filenames, 2, 5.0)
+    precincts = parquet.read_table(str(tmp_path / "precincts.parquet"))
+    assert precincts.schema.names == [name for name, _ in PRECINCT_COLUMNS]
+    check_rows(precincts.to_pylist(), precinct_rows)
+    check_rows(parquet.read_table(str(tmp_path / "voters.pq")).to_pylist(),
+               voter_rows)
+
+
+def test_workers_match_serial(tmp_path):
+    filenames = write_precincts(tmp_path) * 2
+    run_batch(filenames, str(tmp_path / "serial.csv"),
+              str(tmp_path / "serial_voters.csv"))
+    run_batch(filenames, str(tmp_path / "pool.csv"),
+              str(tmp_path / "pool_voters.csv"), workers=2)
+    assert (tmp_path / "pool.csv").read_text() \
+        == (tmp_path / "serial.csv").read_text()
+    assert (tmp_path / "pool_voters.csv").read_text() \
+        == (tmp_path / "serial_voters.csv").read_text()
+
+
+def test_manifest(tmp_path):
+    precinct_dir = tmp_path / "precincts"
+    precinct_dir.mkdir()
+    filenames = write_precincts(precinct_dir)
+    (precinct_dir / "notes.txt").write_text("not a precinct")
+    assert simulate_batch.find_precinct_files(str(precinct_dir)) == filenames
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# the east side first\nprecincts/precinct-2.json\n"
+                        "\n  precincts/precinct-0.json  \n")
+    assert simulate_batch.find_precinct_files(str(manifest)) \
+        == [filenames[2], filenames[0]]
+
+
+def test_cmd_summary(tmp_path):
+    filenames = write_precincts(tmp_path)
+    output = tmp_path / "results" / "precincts.csv"
+    output.parent.mkdir()
+    result = CliRunner().invoke(simulate_batch.cmd, [
+        str(tmp_path), str(output), "--num-booths", "3",
+        "--impatience-threshold", "2"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "Simulated 3 precincts\n"
+    precinct_rows, _ = expected_rows(filenames, 3, 2.0)
+    rows = read_csv(output, PRECINCT_COLUMNS)
+    check_rows(rows, precinct_rows)
+    for row in rows:
+        assert row["voters_voted"] + row["voters_turned_away"] \
+            == row["voters_arrived"]
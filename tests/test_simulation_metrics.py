@@ -0,0 +1,77 @@
+'''
+Tests for simulation_metrics: the queue metrics of a small, hand-worked
+day at one booth.
+'''
+
+import json
+
+import pytest
+
+from simulate import Voter
+from simulation_metrics import SimulationMetrics
+
+
+def one_booth_day():
+    '''
+    Three voters at one booth, with the polls closing at 60:
+      - the first arrives at 0 and votes from 0 to 10;
+      - the second arrives at 2, waits 8 and votes from 10 to 15;
+      - the third arrives at 4, is impatient and would have to wait 11,
+        so leaves without voting.
+
+    Returns: list of Voter
+    '''
+    first = Voter(0.0, 10.0, False)
+    first.vote(0.0)
+    second = Voter(2.0, 5.0, False)
+    second.vote(10.0)
+    third = Voter(4.0, 3.0, True)
+    return [first, second, third]
+
+
+def test_record_voters():
+    metrics = SimulationMetrics(wait_bin_width=5)
+    metrics.record_voters(one_booth_day(), 1, 60)
+    assert metrics.num_booths == 1
+    assert metrics.closing_time == 60
+    assert metrics.num_voters == 3
+    assert metrics.num_voted == 2
+    assert metrics.num_turned_away == 1
+    # waits of 0 and 8 fall in [0, 5) and [5, 10)
+    assert metrics.wait_histogram == [1, 1]
+    # the second voter queues from 2 to 10
+    assert metrics.queue_length == [[0.0, 0], [2.0, 1], [10.0, 0]]
+    assert metrics.max_queue_length == 1
+    assert metrics.mean_queue_length == pytest.approx(8 / 60)
+    # 15 minutes of voting over a 60 minute day
+    assert metrics.utilisation == pytest.approx(0.25)
+
+
+def test_day_ends_with_last_departure():
+    metrics = SimulationMetrics(wait_bin_width=5)
+    metrics.record_voters(one_booth_day(), 1, 12)
+    assert metrics.utilisation == pytest.approx(1.0)
+    assert metrics.mean_queue_length == pytest.approx(8 / 15)
+
+
+def test_to_json(tmp_path):
+    metrics = SimulationMetrics(wait_bin_width=5)
+    metrics.record_voters(one_booth_day(), 1, 60)
+    expected = {"timings": {"generate voters": 0.0, "main loop": 0.0,
+                            "booths": 0.0},
+                "booth_calls": 0,
+                "num_booths": 1,
+                "closing_time": 60,
+                "num_voters": 3,
+                "num_voted": 2,
+                "num_turned_away": 1,
+                "utilisation": 0.25,
+                "max_queue_length": 1,
+                "mean_queue_length": 8 / 60,
+                "queue_length": [[0.0, 0], [2.0, 1], [10.0, 0]],
+                "wait_bin_width": 5,
+                "wait_histogram": [1, 1]}
+    assert json.loads(metrics.to_json()) == expected
+    path = tmp_path / "metrics.json"
+    assert metrics.to_json(str(path)) is None
+    assert json.loads(path.read_text()) == expected
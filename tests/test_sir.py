@@ -0,0 +1,93 @@
+'''
+Tests for sir: the simulation drivers and the trial runner must give the
+same results as the original recursive driver and serial run_trials,
+which seeded the global generator once per trial.
+'''
+
+import random
+
+import pytest
+
+import sir
+
+
+def original_run_simulation(city, days_contagious):
+    '''The original driver: one simulate_one_day call per day'''
+    simulated_days = 0
+    while sir.is_transmission_possible(city):
+        city = sir.simulate_one_day(city, days_contagious)
+        simulated_days += 1
+    return city, simulated_days
+
+
+def original_vaccinate_city(vax_city, seed):
+    '''The original vaccinate_city, on the global generator'''
+    random.seed(seed)
+    city = []
+    for state, days, eagerness in vax_city:
+        if state not in ("I", "R") and eagerness > random.random():
+            city.append(("V", 0))
+        else:
+            city.append((state, days))
+    return city
+
+
+def original_trial_days(vax_city, days_contagious, random_seed, num_trials):
+    '''The number of days of each trial of the original run_trials'''
+    days = []
+    for i in range(num_trials):
+        seed = random_seed + i if random_seed else random_seed
+        city = original_vaccinate_city(vax_city, seed)
+        days.append(original_run_simulation(city, days_contagious)[1])
+    return days
+
+
+def random_city(rng, size):
+    '''A random city of person tuples'''
+    city = []
+    for _ in range(size):
+        state = rng.choice("SSSSIRV")
+        city.append((state, rng.randrange(3) if state == "I" else 0))
+    return city
+
+
+def random_vax_city(rng, size):
+    '''A random city of vax tuples'''
+    return [person + (rng.random(),) for person in random_city(rng, size)]
+
+
+@pytest.mark.parametrize("trial", range(40))
+def test_drivers_match_original(trial):
+    rng = random.Random(trial)
+    city = random_city(rng, rng.randrange(1, 50))
+    days_contagious = rng.randrange(1, 5)
+    expected = original_run_simulation(city, days_contagious)
+    assert sir.run_simulation(city, days_contagious) == expected
+    assert sir.run_simulation_frontier(city, days_contagious) == expected
+
+
+def test_long_epidemic_does_not_recurse():
+    city = [("I", 0)] + [("S", 0)] * 5000
+    assert sir.run_simulation(city, 3)[1] == 2500
+
+
+@pytest.mark.parametrize("seed", [0, 1, 20170217, -5])
+def test_vaccinate_city_matches_original(seed):
+    rng = random.Random(seed)
+    vax_city = random_vax_city(rng, 50)
+    assert sir.vaccinate_city(vax_city, seed) \
+        == original_vaccinate_city(vax_city, seed)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("seed", [0, 1, 20170217])
+def test_run_trials_matches_original_seeds(workers, seed):
+    rng = random.Random(seed)
+    vax_city = random_vax_city(rng, 30)
+    num_trials = 11
+    expected = original_trial_days(vax_city, 2, seed, num_trials)
+    days, median = sir.run_trials_distribution(vax_city, 2, seed, num_trials,
+                                               workers)
+    assert days == expected
+    assert median == sorted(expected)[num_trials // 2]
+    assert sir.run_trials(vax_city, 2, seed, num_trials) == median
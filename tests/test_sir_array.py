@@ -0,0 +1,85 @@
+'''
+Tests for sir_array: the array engine and the batched trials must give
+the same results as sir.
+'''
+
+import random
+
+import pytest
+
+import sir
+import sir_array
+
+
+def random_city(rng, size):
+    '''A random city of person tuples'''
+    city = []
+    for _ in range(size):
+        state = rng.choice("SSSSIRV")
+        city.append((state, rng.randrange(3) if state == "I" else 0))
+    return city
+
+
+def random_vax_city(rng, size):
+    '''A random city of vax tuples'''
+    return [person + (rng.random(),) for person in random_city(rng, size)]
+
+
+@pytest.mark.parametrize("trial", range(30))
+def test_run_simulation_matches_sir(trial):
+    rng = random.Random(trial)
+    city = random_city(rng, rng.randrange(1, 60))
+    days_contagious = rng.randrange(1, 5)
+    assert sir_array.run_simulation(city, days_contagious) \
+        == sir.run_simulation(city, days_contagious)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 20170217, -5])
+@pytest.mark.parametrize("trial", range(5))
+def test_batched_trials_match_run_trials_distribution(seed, trial):
+    rng = random.Random(trial)
+    vax_city = random_vax_city(rng, rng.randrange(1, 40))
+    days_contagious = rng.randrange(1, 5)
+    num_trials = rng.randrange(1, 25)
+    # a few trials per batch, so the trials are split into batches
+    max_cells = 3 * len(vax_city)
+    assert sir_array.run_trials_batched(vax_city, days_contagious, seed,
+                                        num_trials, max_cells=max_cells) \
+        == sir.run_trials_distribution(vax_city, days_contagious, seed,
+                                       num_trials)
+
+
+def test_unseeded_trials():
+    # random.Random(None) seeds from the OS, as random.seed(None) did, so
+    # only the shape of the results can be checked
+    rng = random.Random(5)
+    vax_city = random_vax_city(rng, 20)
+    days, median = sir_array.run_trials_batched(vax_city, 2, None, 9,
+                                                max_cells=40)
+    assert len(days) == 9
+    assert median == sorted(days)[4]
+
+
+@pytest.mark.parametrize("generator", ["compat", "numpy"])
+def test_batch_size_does_not_change_results(generator):
+    rng = random.Random(7)
+    vax_city = random_vax_city(rng, 50)
+    results = [sir_array.run_trials_batched(vax_city, 2, 100, 17, generator,
+                                            max_cells=max_cells)
+               for max_cells in [1, 50, 60, 1 << 24]]
+    assert results[0] == results[1] == results[2] == results[3]
+
+
+@pytest.mark.parametrize("seed", [-5, 0, None, 3])
+def test_numpy_generator_seeds(seed):
+    rng = random.Random(3)
+    vax_city = random_vax_city(rng, 30)
+    days, median = sir_array.run_trials_batched(vax_city, 2, seed, 3,
+                                                generator="numpy")
+    assert len(days) == 3
+    assert median == sorted(days)[1]
+
+
+def test_unknown_generator():
+    with pytest.raises(ValueError):
+        sir_array.vaccinate_trials([("S", 0, 0.5)], [1], "other")
@@ -0,0 +1,61 @@
+'''
+Tests for trending: the running window totals must match counting the
+tokens in each window from scratch.
+'''
+
+import random
+
+import pytest
+
+from trending import SlidingWindowCounter
+
+WINDOWS = (300, 900, 3600)
+BUCKET = 60
+
+
+def recount(events, now, window):
+    '''Count the kept events in the window ending at bucket now'''
+    edge = now - -(-window // BUCKET) + 1
+    counts = {}
+    for bucket_id, token, count in events:
+        if edge <= bucket_id <= now:
+            counts[token] = counts.get(token, 0) + count
+    return counts
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_totals_match_recount(seed):
+    rng = random.Random(seed)
+    counter = SlidingWindowCounter(WINDOWS, BUCKET)
+    events = []
+    clock = None
+    timestamp = 1.0e9
+    for _ in range(400):
+        # mostly forward, sometimes late, sometimes a long gap
+        timestamp += rng.choice([0, 1, 5, 30, 61, 200, 4000, -700])
+        token = rng.choice("abcdefg")
+        count = rng.randrange(1, 4)
+        bucket_id = int(timestamp // BUCKET)
+        clock = bucket_id if clock is None else max(clock, bucket_id)
+        counter.add(token, timestamp, count)
+        if bucket_id >= clock - 3600 // BUCKET + 1:
+            events.append((bucket_id, token, count))
+        for window in WINDOWS + (120, 1000):
+            assert counter.counts(window) == recount(events, clock, window)
+
+
+def test_counts_is_a_copy():
+    counter = SlidingWindowCounter(WINDOWS, BUCKET)
+    counter.add("a", 0)
+    counter.counts(300)["a"] = 10
+    counter.counts(300).clear()
+    counter.add("a", 301)
+    assert counter.counts(300) == {"a": 1}
+    assert counter.counts(900) == {"a": 2}
+    assert counter.find_top_k(900, 1) == ["a"]
+
+
+def test_window_longer_than_kept():
+    counter = SlidingWindowCounter(WINDOWS, BUCKET)
+    with pytest.raises(ValueError):
+        counter.counts(7200)
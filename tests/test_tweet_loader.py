@@ -0,0 +1,99 @@
+'''
+Tests for tweet_loader: the streaming decoder must give the same values
+as json.load, whatever the chunk size.
+'''
+
+import json
+import random
+
+import pytest
+
+import tweet_loader
+
+
+def write(tmp_path, text):
+    '''Write text to a file and return its name'''
+    path = tmp_path / "tweets.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def random_tweet(rng):
+    '''A small tweet with some multi-byte text'''
+    words = ["vote", "état", "🗳", "election", "\"quoted\"", "a\\b"]
+    return {"abridged_text": " ".join(rng.choice(words)
+                                      for _ in range(rng.randrange(1, 8))),
+            "entities": {"hashtags": [{"text": rng.choice(words),
+                                       "indices": [0, rng.randrange(9)]}
+                                      for _ in range(rng.randrange(3))]},
+            "id": rng.randrange(10 ** 12)}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 20])
+def test_array_matches_json_load(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(tweet_loader, "CHUNK_SIZE", chunk_size)
+    rng = random.Random(chunk_size)
+    tweets = [random_tweet(rng) for _ in range(40)]
+    filename = write(tmp_path, json.dumps(tweets, ensure_ascii=False,
+                                          indent=rng.choice([None, 2])))
+    assert list(tweet_loader.iter_tweets(filename)) == tweets
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5])
+def test_numbers_split_across_chunks(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(tweet_loader, "CHUNK_SIZE", chunk_size)
+    values = [1.5, 1.5e3, -2.25e-7, 10, 123456789, True, False, None,
+              "1.5", 0.0]
+    text = "[1.5, 1.5e3,-2.25e-7 ,10,123456789,true,false,null,\"1.5\",0.0]"
+    assert list(tweet_loader.iter_tweets(write(tmp_path, text))) == values
+
+
+def test_json_lines(tmp_path):
+    rng = random.Random(0)
+    tweets = [random_tweet(rng) for _ in range(20)]
+    filename = write(tmp_path, "\n".join(json.dumps(t) for t in tweets))
+    assert list(tweet_loader.iter_tweets(filename)) == tweets
+
+
+def test_corrupt_element_fails_without_reading_ahead(tmp_path, monkeypatch):
+    monkeypatch.setattr(tweet_loader, "CHUNK_SIZE", 16)
+    rng = random.Random(1)
+    tweets = [random_tweet(rng) for _ in range(2000)]
+    text = '[{"abridged_text": x}, ' + json.dumps(tweets)[1:]
+    reads = []
+    real_decode = tweet_loader.codecs.getincrementaldecoder("utf-8")
+
+    def counting_decoder():
+        decoder = real_decode()
+        decode = decoder.decode
+
+        def counted(chunk, final=False):
+            reads.append(len(chunk))
+            return decode(chunk, final)
+        decoder.decode = counted
+        return decoder
+    monkeypatch.setattr(tweet_loader.codecs, "getincrementaldecoder",
+                        lambda encoding: counting_decoder)
+    with pytest.raises(json.JSONDecodeError):
+        list(tweet_loader.iter_tweets(write(tmp_path, text)))
+    assert sum(reads) < 64
+
+
+@pytest.mark.parametrize("text", ['[{"a": 1} {"b": 2}]', '[1 2]', '[1.5x]',
+                                  '[{"a": 1}', '{"a": 1'])
+def test_malformed(tmp_path, monkeypatch, text):
+    monkeypatch.setattr(tweet_loader, "CHUNK_SIZE", 2)
+    with pytest.raises(ValueError):
+        list(tweet_loader.iter_tweets(write(tmp_path, text)))
+
+
+def test_projection(tmp_path):
+    rng = random.Random(2)
+    tweets = [random_tweet(rng) for _ in range(10)]
+    filename = write(tmp_path, json.dumps(tweets))
+    loaded = tweet_loader.load_tweets(filename, [("hashtags", "text", True)])
+    assert loaded == [{"abridged_text": t["abridged_text"],
+                       "entities": {"hashtags": [
+                           {"text": h["text"]}
+                           for h in t["entities"]["hashtags"]]}}
+                      for t in tweets]
@@ -0,0 +1,42 @@
+'''
+Tests for tweet_stream: the streaming counter must answer every query as
+the analyze functions do on the whole list of tweets.
+'''
+
+import json
+import random
+
+import pytest
+
+import analyze
+from test_analyze import ENTITY_DESCS, random_tweets
+from tweet_stream import TweetCounter, read_json_lines
+
+NGRAM_SPECS = [(1, True), (1, False), (2, False), (3, True)]
+
+
+def test_tweet_counter_matches_analyze(tmp_path):
+    tweets = random_tweets(random.Random(6), 150)
+    path = tmp_path / "tweets.json"
+    path.write_text("\n\n".join(json.dumps(t) for t in tweets))
+    counter = TweetCounter(ENTITY_DESCS, NGRAM_SPECS)
+    counter.update(read_json_lines(str(path)))
+    assert counter.num_tweets == len(tweets)
+    for desc in ENTITY_DESCS:
+        assert counter.find_top_k_entities(desc, 4) \
+            == analyze.find_top_k_entities(tweets, desc, 4)
+        assert counter.find_min_count_entities(desc, 5) \
+            == analyze.find_min_count_entities(tweets, desc, 5)
+    for n, case_sensitive in NGRAM_SPECS:
+        assert counter.find_top_k_ngrams(n, case_sensitive, 6) \
+            == analyze.find_top_k_ngrams(tweets, n, case_sensitive, 6)
+        assert counter.find_min_count_ngrams(n, case_sensitive, 3) \
+            == analyze.find_min_count_ngrams(tweets, n, case_sensitive, 3)
+
+
+def test_unregistered_query():
+    counter = TweetCounter(ENTITY_DESCS[:1], NGRAM_SPECS[:1])
+    with pytest.raises(ValueError):
+        counter.find_top_k_entities(ENTITY_DESCS[2], 3)
+    with pytest.raises(ValueError):
+        counter.find_top_k_ngrams(2, True, 3)
@@ -0,0 +1,336 @@
+"""
+CS 121: Analyzing Election Tweets
+
+Yujing Sun
+
+Trending module
+
+Sliding-window entity and n-gram counts (e.g. the top hashtags over
+the last 5, 15 and 60 minutes), updated continuously as tweets arrive.
+"""
+
+from datetime import datetime
+
+from analyze import update_entity_counts, update_ngram_counts
+from basic_algorithms import find_top_k_counts, find_min_count_counts
+
+# Format of tweet['created_at'], e.g. "Wed Nov 09 05:31:00 +0000 2016"
+CREATED_AT_FORMAT = "%a %b %d %H:%M:%S %z %Y"
+
+
+def tweet_timestamp(tweet):
+    '''
+    The time a tweet was created.
+
+    Inputs:
+        tweet: a tweet with a created_at field
+
+    Returns: (float) seconds since the epoch
+    '''
+    return datetime.strptime(tweet['created_at'],
+                             CREATED_AT_FORMAT).timestamp()
+
+
+class SlidingWindowCounter:
+    '''
+    Class for counting tokens over sliding time windows.
+
+    Counts are kept in fixed-width time buckets, keyed by bucket id.
+    For each registered window a running total is kept up to date:
+    adding a token updates its bucket and the totals, and a bucket is
+    subtracted from a window's total once, when it slides out of that
+    window.  Moving the clock forward only looks at the buckets between
+    each window's old and new edges, so adding a token costs O(1) per
+    registered window, plus O(1) amortized per registered window for
+    each bucket the clock moves, and a query on a registered window
+    copies its total.  Buckets older than the largest window are
+    discarded.
+
+    Attributes:
+        bucket_seconds: (int) the width of a bucket
+        windows: (tuple of ints) the registered window lengths, in seconds
+        now: (int) the latest bucket seen (None before the first token)
+
+    Methods:
+        add(token, timestamp): count a token
+        add_counts(counts, timestamp): count several tokens
+        advance(timestamp): move the clock forward
+        counts(window): dictionary that maps tokens to counts
+        find_top_k(window, k): list of tokens
+        find_min_count(window, min_count): set of tokens
+    '''
+
+    def __init__(self, windows=(300, 900, 3600), bucket_seconds=60):
+        '''
+        Initialize the counter.
+
+        Args:
+            windows: window lengths, in seconds
+            bucket_seconds: (int) the width of a bucket, in seconds.
+              Windows are rounded up to a whole number of buckets.
+        '''
+
+        if bucket_seconds <= 0 or not windows or min(windows) <= 0:
+            raise ValueError("Windows and buckets must have positive lengths")
+        self.bucket_seconds = bucket_seconds
+        self.windows = tuple(sorted(set(windows)))
+        self.now = None
+        self._num_buckets = {w: -(-w // bucket_seconds) for w in self.windows}
+        self._max_buckets = max(self._num_buckets.values())
+        # dictionary that maps bucket ids to dictionaries that map
+        # tokens to counts
+        self._buckets = {}
+        self._totals = {w: {} for w in self.windows}
+
+    def _bucket(self, timestamp):
+        '''The id of the bucket holding a timestamp'''
+        return int(timestamp // self.bucket_seconds)
+
+    def _oldest(self, window, now):
+        '''The oldest bucket id inside a window ending at bucket now'''
+        return now - self._num_buckets[window] + 1
+
+    def _bucket_ids(self, start, stop):
+        '''
+        The ids of the buckets kept in [start, stop), looking at no more
+        than min(stop - start, number of buckets kept) ids.
+        '''
+        if stop - start <= len(self._buckets):
+            return [i for i in range(start, stop) if i in self._buckets]
+        return [i for i in self._buckets if start <= i < stop]
+
+    def advance(self, timestamp):
+        '''
+        Move the clock forward to a timestamp, expiring the buckets that
+        slide out of each window.  Timestamps earlier than the clock are
+        ignored.
+
+        Args:
+            timestamp: (float) seconds since the epoch
+        '''
+        new_now = self._bucket(timestamp)
+        if self.now is not None and new_now <= self.now:
+            return
+        old_now = self.now
+        self.now = new_now
+        if old_now is None:
+            return
+        for w in self.windows:
+            totals = self._totals[w]
+            for bucket_id in self._bucket_ids(self._oldest(w, old_now),
+                                              self._oldest(w, new_now)):
+                _subtract(totals, self._buckets[bucket_id])
+        # the buckets that left the largest window have left them all
+        for bucket_id in self._bucket_ids(
+                self._oldest(self.windows[-1], old_now),
+                self._oldest(self.windows[-1], new_now)):
+            del self._buckets[bucket_id]
+
+    def add(self, token, timestamp, count=1):
+        '''
+        Count a token.
+
+        Args:
+            token: the token (must be immutable)
+            timestamp: (float) seconds since the epoch
+            count: (int) the number of occurrences
+        '''
+        self.add_counts({token: count}, timestamp)
+
+    def add_counts(self, counts, timestamp):
+        '''
+        Count several tokens seen at the same time.  Tokens that arrive
+        late are added to their own bucket (and to the windows that
+        still include it), or dropped if that bucket has expired.
+
+        Args:
+            counts: dictionary that maps tokens to counts
+            timestamp: (float) seconds since the epoch
+        '''
+        self.advance(timestamp)
+        bucket_id = self._bucket(timestamp)
+        if not counts or bucket_id < self._oldest(self.windows[-1], self.now):
+            return
+        bucket = self._buckets.setdefault(bucket_id, {})
+        for w in self.windows:
+            if bucket_id >= self._oldest(w, self.now):
+                _add(self._totals[w], counts)
+        _add(bucket, counts)
+
+    def counts(self, window):
+        '''
+        The counts over the last window seconds (up to the clock).
+
+        Args:
+            window: (int) the window length, in seconds
+
+        Returns: dictionary that maps tokens to counts (a copy, which
+          the caller may change)
+        '''
+        return dict(self._window_counts(window))
+
+    def _window_counts(self, window):
+        '''
+        The counts over the last window seconds.  For a registered window
+        this is the running total itself, which must not be changed.
+        '''
+        if window in self._totals:
+            return self._totals[window]
+        num_buckets = -(-window // self.bucket_seconds)
+        if num_buckets > self._max_buckets:
+            raise ValueError("Window {} is longer than the counts kept"
+                             .format(window))
+        totals = {}
+        if self.now is None:
+            return totals
+        edge = self.now - num_buckets + 1
+        for bucket_id, counts in self._buckets.items():
+            if bucket_id >= edge:
+                _add(totals, counts)
+        return totals
+
+    def find_top_k(self, window, k):
+        '''
+        Find the k most frequently occuring tokens in a window.
+
+        Returns: list of tokens
+        '''
+        return find_top_k_counts(self._window_counts(window), k)
+
+    def find_min_count(self, window, min_count):
+        '''
+        Find the tokens that occur at least min_count times in a window.
+
+        Returns: set of tokens
+        '''
+        return find_min_count_counts(self._window_counts(window), min_count)
+
+
+def _add(totals, counts):
+    '''Add counts to totals, in place'''
+    for token, count in counts.items():
+        totals[token] = totals.get(token, 0) + count
+
+
+def _subtract(totals, counts):
+    '''Subtract counts from totals, in place, dropping zero counts'''
+    for token, count in counts.items():
+        remaining = totals[token] - count
+        if remaining:
+            totals[token] = remaining
+        else:
+            del totals[token]
+
+
+class TrendingTweets:
+    '''
+    Class for keeping sliding-window entity and n-gram counts over a
+    stream of tweets.
+
+    Methods:
+        add(tweet, timestamp): count a tweet
+        advance(timestamp): move the clock forward
+        find_top_k_entities(entity_desc, window, k): list of entities
+        find_min_count_entities(entity_desc, window, min_count): set of
+          entities
+        find_top_k_ngrams(n, case_sensitive, window, k): list of n-grams
+        find_min_count_ngrams(n, case_sensitive, window, min_count): set
+          of n-grams
+    '''
+
+    def __init__(self, entity_descs=(), ngram_specs=(),
+                 windows=(300, 900, 3600), bucket_seconds=60):
+        '''
+        Initialize the counters.
+
+        Args:
+            entity_descs: triples such as ("hashtags", "text", True)
+            ngram_specs: (n, case_sensitive) pairs
+            windows: window lengths, in seconds
+            bucket_seconds: (int) the width of a bucket, in seconds
+        '''
+
+        self._entities = {tuple(desc): SlidingWindowCounter(windows,
+                                                            bucket_seconds)
+                          for desc in entity_descs}
+        self._ngrams = {tuple(spec): SlidingWindowCounter(windows,
+                                                          bucket_seconds)
+                        for spec in ngram_specs}
+
+    def add(self, tweet, timestamp=None):
+        '''
+        Count the entities and n-grams of a tweet.
+
+        Args:
+            tweet: a tweet
+            timestamp: (float) seconds since the epoch (by default, the
+              tweet's created_at time)
+        '''
+        if timestamp is None:
+            timestamp = tweet_timestamp(tweet)
+        for desc, counter in self._entities.items():
+            counts = {}
+            update_entity_counts(counts, tweet, desc)
+            counter.add_counts(counts, timestamp)
+        for (n, case_sensitive), counter in self._ngrams.items():
+            counts = {}
+            update_ngram_counts(counts, tweet, n, case_sensitive)
+            counter.add_counts(counts, timestamp)
+
+    def advance(self, timestamp):
+        '''
+        Move every clock forward to a timestamp.
+
+        Args:
+            timestamp: (float) seconds since the epoch
+        '''
+        for counter in [*self._entities.values(), *self._ngrams.values()]:
+            counter.advance(timestamp)
+
+    def _entity_counter(self, entity_desc):
+        '''The counter for a registered entity descriptor'''
+        desc = tuple(entity_desc)
+        if desc not in self._entities:
+            raise ValueError("Entity {} is not being counted".format(desc))
+        return self._entities[desc]
+
+    def _ngram_counter(self, n, case_sensitive):
+        '''The counter for a registered n-gram spec'''
+        if (n, case_sensitive) not in self._ngrams:
+            raise ValueError("{}-grams (case_sensitive={}) are not being "
+                             "counted".format(n, case_sensitive))
+        return self._ngrams[(n, case_sensitive)]
+
+    def find_top_k_entities(self, entity_desc, window, k):
+        '''
+        Find the k most frequently occuring entities in a window.
+
+        Returns: list of entities
+        '''
+        return self._entity_counter(entity_desc).find_top_k(window, k)
+
+    def find_min_count_entities(self, entity_desc, window, min_count):
+        '''
+        Find the entities that occur at least min_count times in a window.
+
+        Returns: set of entities
+        '''
+        return self._entity_counter(entity_desc).find_min_count(window,
+                                                                min_count)
+
+    def find_top_k_ngrams(self, n, case_sensitive, window, k):
+        '''
+        Find the k most frequently occurring n-grams in a window.
+
+        Returns: list of n-grams
+        '''
+        return self._ngram_counter(n, case_sensitive).find_top_k(window, k)
+
+    def find_min_count_ngrams(self, n, case_sensitive, window, min_count):
+        '''
+        Find the n-grams that occur at least min_count times in a window.
+
+        Returns: set of n-grams
+        '''
+        return self._ngram_counter(n, case_sensitive).find_min_count(
+            window, min_count)
@@ -0,0 +1,206 @@
+"""
+CS 121: Analyzing Election Tweets
+
+Yujing Sun
+
+Tweet loader module
+
+Stream tweets out of large JSON-array or JSON-lines dumps through a
+memory map, keeping only the fields the analyses read.
+"""
+
+import codecs
+import json
+import mmap
+import re
+
+# Bytes decoded at a time when streaming a JSON array.
+CHUNK_SIZE = 1 << 20
+
+WHITESPACE = " \t\n\r"
+SKIP_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# The rest of a number or literal (true, false, null) token.
+TOKEN_TAIL = re.compile(r'[^ \t\n\r,:\[\]{}"]*')
+
+
+class Projection:
+    '''
+    Class for representing the fields of a tweet that an analysis needs.
+    Calling a projection on a tweet returns a compact copy holding only
+    those fields, in the same layout as the original tweet, so it can
+    be passed to combine_tweets, pre_process, etc.
+
+    Attributes:
+        text: (bool) keep tweet['abridged_text']
+        entities: dictionary that maps entity keys (e.g. "hashtags") to
+          the set of fields to keep (e.g. {"text"})
+    '''
+
+    def __init__(self, entity_descs=(), text=True):
+        '''
+        Initialize the projection.
+
+        Args:
+            entity_descs: triples such as ("hashtags", "text", True)
+            text: (bool) keep the text of the tweet
+        '''
+
+        self.text = text
+        self.entities = {}
+        for key, field, _ in entity_descs:
+            self.entities.setdefault(key, set()).add(field)
+
+    def __call__(self, tweet):
+        '''
+        Project a tweet.
+
+        Args:
+            tweet: a tweet
+
+        Returns: a tweet with only the projected fields
+        '''
+        record = {}
+        if self.text:
+            record['abridged_text'] = tweet['abridged_text']
+        if self.entities:
+            entities = tweet['entities']
+            record['entities'] = {
+                key: [{f: m[f] for f in fields} for m in entities[key]]
+                for key, fields in self.entities.items()}
+        return record
+
+
+def _iter_json_lines(mm):
+    '''
+    Decode one JSON value per line of a memory-mapped file.
+    '''
+    start = 0
+    end = len(mm)
+    while start < end:
+        stop = mm.find(b"\n", start)
+        if stop == -1:
+            stop = end
+        line = mm[start:stop]
+        if line.strip():
+            yield json.loads(line)
+        start = stop + 1
+
+
+def _reaches_end(buf, pos):
+    '''
+    Does the number or literal token at buf[pos] run to the end of buf
+    (so that the next chunk may continue it)?
+    '''
+    return TOKEN_TAIL.match(buf, pos).end() == len(buf)
+
+
+def _is_truncated(err, buf):
+    '''
+    Was a decoding error caused by the value running past the end of
+    buf, rather than by malformed JSON?
+    '''
+    return (err.msg.startswith("Unterminated string")
+            or _reaches_end(buf, err.pos))
+
+
+def _iter_json_array(mm):
+    '''
+    Decode the elements of a JSON array in a memory-mapped file one at
+    a time, without decoding the whole array at once.
+    '''
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    size = len(mm)
+    offset = 0
+
+    def read_more():
+        nonlocal offset
+        chunk = mm[offset:offset + CHUNK_SIZE]
+        offset += len(chunk)
+        return utf8.decode(chunk, final=offset >= size)
+
+    buf = read_more().lstrip(WHITESPACE + "\ufeff")
+    if not buf.startswith("["):
+        raise ValueError("Expected a JSON array")
+    pos = 1
+    expect_value = True
+    while True:
+        pos = SKIP_WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if offset >= size:
+                raise ValueError("Unterminated JSON array")
+            buf = read_more()
+            pos = 0
+            continue
+        if buf[pos] == "]":
+            return
+        if not expect_value:
+            if buf[pos] != ",":
+                raise ValueError("Expected ',' or ']' in JSON array")
+            pos += 1
+            expect_value = True
+            continue
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as err:
+            if offset >= size or not _is_truncated(err, buf):
+                raise
+            buf = buf[pos:] + read_more()
+            pos = 0
+            continue
+        if (offset < size and not isinstance(value, (dict, list, str))
+                and _reaches_end(buf, end)):
+            # A number such as 1.5e3 may continue in the next chunk.
+            buf = buf[pos:] + read_more()
+            pos = 0
+            continue
+        yield value
+        pos = end
+        expect_value = False
+
+
+def iter_tweets(filename, projection=None):
+    '''
+    Stream tweets from a file holding either a JSON array of tweets or
+    JSON lines.  The file is memory-mapped and decoded one tweet at a
+    time.
+
+    Inputs:
+        filename: (string) the name of the file
+        projection: (Projection) the fields to keep (None keeps the
+          whole tweet)
+
+    Returns: generator of tweets
+    '''
+    with open(filename, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
+            return
+        with mm:
+            pos = 3 if mm[:3] == codecs.BOM_UTF8 else 0
+            while pos < len(mm) and mm[pos:pos + 1] in b" \t\r\n":
+                pos += 1
+            if mm[pos:pos + 1] == b"[":
+                values = _iter_json_array(mm)
+            else:
+                values = _iter_json_lines(mm)
+            for tweet in values:
+                yield tweet if projection is None else projection(tweet)
+
+
+def load_tweets(filename, entity_descs=(), text=True):
+    '''
+    Load the fields of each tweet needed by the given analyses.
+
+    Inputs:
+        filename: (string) the name of the file
+        entity_descs: triples such as ("hashtags", "text", True) for the
+          entity analyses that will be run
+        text: (bool) keep the text of each tweet (needed by the n-gram
+          analyses)
+
+    Returns: list of tweets
+    '''
+    return list(iter_tweets(filename, Projection(entity_descs, text)))
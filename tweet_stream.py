@@ -0,0 +1,134 @@
+"""
+CS 121: Analyzing Election Tweets
+
+Yujing Sun
+
+Streaming module
+
+Incrementally count entities and n-grams as tweets arrive, without
+holding on to the tweets themselves.
+"""
+
+import json
+
+from analyze import update_entity_counts, update_ngram_counts
+from basic_algorithms import find_top_k_counts, find_min_count_counts
+
+
+def read_json_lines(filename):
+    '''
+    Read tweets one at a time from a JSON-lines file (one tweet per
+    line).  Blank lines are skipped.
+
+    Inputs:
+        filename: (string) the name of the file
+
+    Returns: generator of tweets
+    '''
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class TweetCounter:
+    '''
+    Class for keeping running entity and n-gram counts over a stream
+    of tweets.
+
+    Attributes:
+        num_tweets: (int) the number of tweets seen so far
+
+    Methods:
+        add(tweet): count a single tweet
+        update(tweets): count every tweet in an iterable
+        find_top_k_entities(entity_desc, k): list of entities
+        find_min_count_entities(entity_desc, min_count): set of entities
+        find_top_k_ngrams(n, case_sensitive, k): list of n-grams
+        find_min_count_ngrams(n, case_sensitive, min_count): set of n-grams
+    '''
+
+    def __init__(self, entity_descs=(), ngram_specs=()):
+        '''
+        Initialize the counter.
+
+        Args:
+            entity_descs: triples such as ("hashtags", "text", True)
+              naming the entities to count
+            ngram_specs: (n, case_sensitive) pairs naming the n-grams
+              to count
+        '''
+
+        self.num_tweets = 0
+        self._entity_counts = {tuple(desc): {} for desc in entity_descs}
+        self._ngram_counts = {tuple(spec): {} for spec in ngram_specs}
+
+    def add(self, tweet):
+        '''
+        Count the entities and n-grams of a single tweet.
+
+        Args:
+            tweet: a tweet
+        '''
+        for desc, counts in self._entity_counts.items():
+            update_entity_counts(counts, tweet, desc)
+        for (n, case_sensitive), counts in self._ngram_counts.items():
+            update_ngram_counts(counts, tweet, n, case_sensitive)
+        self.num_tweets += 1
+
+    def update(self, tweets):
+        '''
+        Count every tweet in an iterable (e.g. read_json_lines(...)).
+
+        Args:
+            tweets: an iterable of tweets
+        '''
+        for tweet in tweets:
+            self.add(tweet)
+
+    def _entities(self, entity_desc):
+        '''Counts for a registered entity descriptor'''
+        desc = tuple(entity_desc)
+        if desc not in self._entity_counts:
+            raise ValueError("Entity {} is not being counted".format(desc))
+        return self._entity_counts[desc]
+
+    def _ngrams(self, n, case_sensitive):
+        '''Counts for a registered n-gram spec'''
+        if (n, case_sensitive) not in self._ngram_counts:
+            raise ValueError("{}-grams (case_sensitive={}) are not being "
+                             "counted".format(n, case_sensitive))
+        return self._ngram_counts[(n, case_sensitive)]
+
+    def find_top_k_entities(self, entity_desc, k):
+        '''
+        Find the k most frequently occuring entities seen so far.
+
+        Returns: list of entities
+        '''
+        return find_top_k_counts(self._entities(entity_desc), k)
+
+    def find_min_count_entities(self, entity_desc, min_count):
+        '''
+        Find the entities seen at least min_count times so far.
+
+        Returns: set of entities
+        '''
+        return find_min_count_counts(self._entities(entity_desc), min_count)
+
+    def find_top_k_ngrams(self, n, case_sensitive, k):
+        '''
+        Find the k most frequently occurring n-grams seen so far.
+
+        Returns: list of n-grams
+        '''
+        return find_top_k_counts(self._ngrams(n, case_sensitive), k)
+
+    def find_min_count_ngrams(self, n, case_sensitive, min_count):
+        '''
+        Find the n-grams seen at least min_count times so far.
+
+        Returns: set of n-grams
+        '''
+        return find_min_count_counts(self._ngrams(n, case_sensitive),
+                                     min_count)